@@ -10,10 +10,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 import streamlit as st
-from PIL import Image
 import warnings
 
-from src.core.config import STREAMLIT_CONFIG
+from src.core.config import STREAMLIT_CONFIG, METRICS_CONFIG
 from src.models.recommendation_system import ChanelRecommendationSystem
 from src.ui.styles import MAIN_CSS
 from src.ui.components import (
@@ -22,7 +21,12 @@ from src.ui.components import (
     show_search_button,
     show_loading,
     show_error,
-    create_sidebar_info
+    create_sidebar_info,
+    display_loading_status,
+    display_resource_stats,
+    display_cache_stats,
+    display_metrics_panel,
+    display_catalog_admin
 )
 
 warnings.filterwarnings('ignore')
@@ -38,8 +42,10 @@ def main():
     st.markdown(MAIN_CSS, unsafe_allow_html=True)
     
     # Initialisation du système de recommandation
+    # (les modèles sont partagés entre sessions via le registre du processus et
+    # se chargent en arrière-plan : la page s'affiche sans les attendre)
     if 'recommendation_system' not in st.session_state:
-        with st.spinner('🔄 Chargement des modèles...'):
+        with st.spinner('🔄 Initialisation...'):
             try:
                 st.session_state.recommendation_system = ChanelRecommendationSystem()
             except Exception as e:
@@ -47,12 +53,21 @@ def main():
                 st.stop()
     
     # Interface utilisateur
-    search_params = create_search_interface()
+    search_params = create_search_interface(st.session_state.recommendation_system.get_filter_options())
     create_sidebar_info()
+    display_loading_status(st.session_state.recommendation_system.get_loading_status())
+    display_resource_stats(st.session_state.recommendation_system.get_load_stats())
+    display_cache_stats(st.session_state.recommendation_system.get_cache_stats())
+    display_catalog_admin(st.session_state.recommendation_system)
+    if METRICS_CONFIG["panel"]:
+        display_metrics_panel(st.session_state.recommendation_system.get_metrics())
     
     # Traitement de la recherche
     if show_search_button():
+        st.session_state.pop('similar_to', None)
         process_search(search_params)
+    elif 'similar_to' in st.session_state:
+        process_similar(search_params)
 
 
 def process_search(params):
@@ -68,12 +83,12 @@ def process_search(params):
     try:
         with st.spinner('🔄 Recherche en cours...'):
             if search_mode == "Recherche par image":
-                if not params['uploaded_image']:
+                if not params['query_image']:
                     show_error("Veuillez uploader une image.")
                     return
                 
-                image = Image.open(params['uploaded_image'])
-                results = recommendation_system.search_by_image(image, params['top_k'])
+                results = recommendation_system.search_by_image(params['query_image'], params['top_k'],
+                                                                params['filters'], params['visual_backends'])
                 display_search_results(results, recommendation_system, "Résultats par image")
             
             elif search_mode == "Recherche par texte":
@@ -81,21 +96,24 @@ def process_search(params):
                     show_error("Veuillez saisir une description.")
                     return
                 
-                results = recommendation_system.search_by_text(params['query_text'], params['top_k'])
+                results = recommendation_system.search_by_text(params['query_text'], params['top_k'],
+                                                               params['filters'], params['text_encoder'])
                 display_search_results(results, recommendation_system, "Résultats par texte")
             
             else:  # Recherche combinée
-                if not params['uploaded_image'] or not params['query_text'].strip():
+                if not params['query_image'] or not params['query_text'].strip():
                     show_error("Veuillez fournir une image ET une description.")
                     return
                 
-                image = Image.open(params['uploaded_image'])
                 results = recommendation_system.combined_search(
-                    image, 
+                    params['query_image'], 
                     params['query_text'],
                     params['weight_image'],
                     params['weight_text'],
-                    params['top_k']
+                    params['top_k'],
+                    params['filters'],
+                    params['visual_backends'],
+                    fusion=params['fusion']
                 )
                 display_search_results(results, recommendation_system, "Résultats combinés")
     
@@ -103,5 +121,26 @@ def process_search(params):
         show_error(f"Erreur lors de la recherche: {e}")
 
 
+def process_similar(params):
+    """
+    Affiche les produits similaires au produit choisi ("Produits similaires")
+    
+    Args:
+        params: Dictionnaire contenant les paramètres de recherche
+    """
+    recommendation_system = st.session_state.recommendation_system
+    product_idx = st.session_state.similar_to
+    mode = {"Recherche par image": 'image', "Recherche par texte": 'text'}.get(params['search_mode'], 'combined')
+    
+    try:
+        results = recommendation_system.similar_products(
+            product_idx, params['top_k'], mode, params['weight_image'], params['filters']
+        )
+        title = recommendation_system.get_product_info(product_idx).get('title', 'ce produit')
+        display_search_results(results, recommendation_system, f"Produits similaires à {title}", key_prefix="similar")
+    except Exception as e:
+        show_error(f"Erreur lors de la recherche de produits similaires: {e}")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,123 @@
+"""
+Lancement de l'API : python -m src.api [--workers N]
+
+Avec plusieurs processus (--workers, API_WORKERS), uvicorn répartit les
+connexions du port entre N processus indépendants : ni GIL ni pool de threads
+PyTorch partagés entre requêtes concurrentes. Les artefacts du catalogue sont
+préparés une fois (fichiers .npy normalisés, index, informations produits)
+puis projetés en mémoire par chaque processus : une seule copie physique des
+embeddings, des index sauvegardés et des colonnes produits (cache de pages).
+Les threads de calcul (PyTorch, BLAS, parcours par blocs) de chaque processus
+sont bornés à cœurs / N pour ne pas dépasser le nombre de cœurs.
+
+Les poids des modèles restent propres à chaque processus (chargés par le
+registre de chaque processus). Les mesures aussi : chacun écrit son état dans
+METRICS_MULTIPROC_DIR (répertoire temporaire par défaut) et GET /metrics, quel
+que soit le processus qui répond, retourne les totaux de l'API.
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+from typing import Dict, Optional
+
+
+def worker_environment(workers: int, cores: Optional[int] = None) -> Dict[str, str]:
+    """
+    Variables d'environnement des processus de l'API
+
+    Les variables déjà définies sont conservées.
+
+    Args:
+        workers: Nombre de processus
+        cores: Cœurs disponibles (défaut: os.cpu_count())
+
+    Returns:
+        Variables à ajouter à l'environnement (vide pour un seul processus)
+    """
+    if workers <= 1:
+        return {}
+    cores = cores or os.cpu_count() or 1
+    threads = str(max(1, cores // workers))
+    settings = {
+        # Artefacts projetés en mémoire : partagés entre processus
+        'EMBEDDINGS_MMAP': '1',
+        'PRODUCT_STORE_MMAP': '1',
+        # Les sous-matrices par catégorie seraient une copie privée des embeddings par processus
+        'FILTER_SUBINDEXES': '0',
+        # Threads de calcul de chaque processus
+        'TORCH_NUM_THREADS': threads,
+        'OMP_NUM_THREADS': threads,
+        'OPENBLAS_NUM_THREADS': threads,
+        'MKL_NUM_THREADS': threads,
+        'SEARCH_THREADS': threads
+    }
+    return {name: value for name, value in settings.items() if name not in os.environ}
+
+
+def metrics_directory() -> str:
+    """
+    Répertoire des états des processus pour GET /metrics (METRICS_MULTIPROC_DIR)
+
+    Les états d'une exécution précédente sont supprimés : les compteurs
+    repartent de zéro avec l'API.
+    """
+    directory = os.environ.get('METRICS_MULTIPROC_DIR') or tempfile.mkdtemp(prefix='chanel-metrics-')
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(('.json', '.tmp')):
+            os.remove(os.path.join(directory, name))
+    return directory
+
+
+def prepare_catalog(models_dir: Optional[str] = None):
+    """
+    Prépare les artefacts partagés de la version courante du catalogue
+
+    Écrit les .npy normalisés, les index et le fichier des informations
+    produits avant le démarrage des processus, qui n'ont plus qu'à les
+    projeter en mémoire (sans les reconstruire chacun de leur côté).
+    """
+    from ..core.config import VISUAL_SEARCH_CONFIG, get_models_directory
+    from ..models.catalog import load_snapshot
+
+    snapshot = load_snapshot(models_dir or get_models_directory())
+    for backend in VISUAL_SEARCH_CONFIG["families"]:
+        try:
+            snapshot.visual_family(backend)
+        except ValueError:
+            continue  # famille absente de cette version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de recherche")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('API_WORKERS', '1')),
+                        help="Processus de l'API (défaut: API_WORKERS)")
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    args = parser.parse_args()
+
+    # Avant tout import de la configuration : elle est lue à l'import, ici et dans chaque processus
+    os.environ.update(worker_environment(args.workers))
+    if args.workers > 1:
+        os.environ['METRICS_MULTIPROC_DIR'] = metrics_directory()
+
+    import uvicorn
+
+    from ..core.config import API_CONFIG
+
+    if args.workers > 1:
+        # Dans un processus séparé : le superviseur ne garde ni embeddings ni index en mémoire
+        preparation = multiprocessing.get_context('spawn').Process(target=prepare_catalog)
+        preparation.start()
+        preparation.join()
+        if preparation.exitcode != 0:
+            print("Préparation du catalogue impossible : chaque processus chargera ses artefacts")
+
+    uvicorn.run("src.api.app:app", host=args.host or API_CONFIG["host"], port=args.port or API_CONFIG["port"],
+                workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
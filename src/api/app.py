@@ -0,0 +1,365 @@
+"""
+API HTTP de recherche (sans interface Streamlit)
+
+Expose la recherche par image, par texte, combinée et la fiche produit pour
+le backend e-commerce. Les recherches avec image acceptent un ou plusieurs
+backends visuels (`visual_backends` : clip, resnet, vit, cnn ; fusion
+tardive). Les modèles et embeddings proviennent du même registre que
+l'application Streamlit. Les requêtes concurrentes sont regroupées par
+MicroBatcher et l'inférence s'exécute dans un pool de threads borné. La
+recherche combinée accepte une stratégie de fusion des scores (`fusion` :
+weighted, zscore, minmax, rrf). La
+recherche par texte peut passer par la tour textuelle de CLIP et interroger
+directement les embeddings visuels (`text_encoder` : text, clip). Les
+durées par étape et les compteurs sont exposés au format Prometheus
+(GET /metrics) ; avec plusieurs processus (METRICS_MULTIPROC_DIR), ils sont
+additionnés sur tous les processus.
+
+Lancement :
+    python -m src.api
+    uvicorn src.api.app:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from ..core.config import API_CONFIG, METRICS_CONFIG
+from ..models.filters import SearchFilter
+from ..models.fusion import ScoreFusion
+from ..models.images import QueryImage
+from ..models.metrics import get_metrics
+from ..models.recommendation_system import ChanelRecommendationSystem
+from ..models.text_encoders import resolve_text_encoder
+from ..models.visual_encoders import resolve_visual_backends
+from .batcher import MicroBatcher
+
+
+class InvalidImageError(ValueError):
+    """Fichier envoyé illisible comme image"""
+
+
+class TextSearchRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    top_k: int = Field(10, ge=1, le=API_CONFIG["max_top_k"])
+    categories: Optional[List[str]] = None
+    min_price: Optional[float] = Field(None, ge=0)
+    max_price: Optional[float] = Field(None, ge=0)
+    text_encoder: Optional[str] = None
+
+
+def decode_image(data: bytes) -> QueryImage:
+    """Décode une image envoyée (résolution réduite, orientation EXIF, RGB)"""
+    try:
+        return QueryImage.from_bytes(data)
+    except Exception as e:
+        raise InvalidImageError(f"Image illisible: {e}")
+
+
+def _jsonable(value: Any) -> Any:
+    """Valeur sérialisable en JSON (scalaires NumPy, NaN -> None)"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _visual_backends(names: Optional[List[str]]) -> Optional[Tuple[str, ...]]:
+    """
+    Backends visuels demandés (None = backend par défaut)
+
+    Raises:
+        HTTPException 422: backend inconnu
+    """
+    if not names:
+        return None
+    try:
+        return resolve_visual_backends(names)[0]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _fusion(strategy: Optional[str]) -> Optional[str]:
+    """
+    Stratégie de fusion demandée (None = FUSION_CONFIG)
+
+    Raises:
+        HTTPException 422: stratégie inconnue
+    """
+    if not strategy:
+        return None
+    try:
+        return ScoreFusion.create(strategy).strategy
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _text_encoder(encoder: Optional[str]) -> Optional[str]:
+    """
+    Encodeur de texte demandé (None = TEXT_SEARCH_CONFIG)
+
+    Raises:
+        HTTPException 422: encodeur inconnu
+    """
+    if not encoder:
+        return None
+    try:
+        return resolve_text_encoder(encoder)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _groups(rows: List[int], key) -> List[Tuple[Any, List[int]]]:
+    """Regroupe des positions par clé, dans l'ordre d'arrivée"""
+    groups: Dict[Any, List[int]] = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return list(groups.items())
+
+
+class SearchService:
+    """
+    Lots de recherche exécutés dans le pool d'inférence
+
+    Chaque méthode reçoit les requêtes d'un lot et retourne un résultat (ou une
+    exception) par requête. Les requêtes sont regroupées par paramètres
+    partagés (filtre, poids) ; le top-k est calculé une fois au maximum demandé
+    dans le sous-lot puis tronqué pour chaque requête.
+    """
+
+    def __init__(self, system: ChanelRecommendationSystem):
+        self.system = system
+
+    def search_texts(self, items: List[Tuple[str, int, Optional[SearchFilter], Optional[str]]]) -> List[Any]:
+        outputs: List[Any] = [None] * len(items)
+        for (search_filter, text_encoder), rows in _groups(range(len(items)), lambda i: (items[i][2], items[i][3])):
+            top_k = max(items[i][1] for i in rows)
+            results = self.system.search_by_texts([items[i][0] for i in rows], top_k, filters=search_filter,
+                                                  text_encoder=text_encoder)
+            for i, result in zip(rows, results):
+                outputs[i] = result[:items[i][1]]
+        return outputs
+
+    def search_images(self, items: List[Tuple[bytes, int, Optional[SearchFilter], Optional[Tuple[str, ...]]]]
+                      ) -> List[Any]:
+        outputs: List[Any] = [None] * len(items)
+        images = {}
+        for i, item in enumerate(items):
+            try:
+                images[i] = decode_image(item[0])
+            except InvalidImageError as e:
+                outputs[i] = e
+
+        for (search_filter, visual_backends), rows in _groups(list(images), lambda i: (items[i][2], items[i][3])):
+            top_k = max(items[i][1] for i in rows)
+            try:
+                results = self.system.search_by_images([images[i] for i in rows], top_k, filters=search_filter,
+                                                       visual_backends=visual_backends)
+            except ValueError as e:
+                # Backend visuel indisponible : seul ce sous-lot échoue
+                for i in rows:
+                    outputs[i] = e
+                continue
+            for i, result in zip(rows, results):
+                outputs[i] = result[:items[i][1]]
+        return outputs
+
+    def combined_searches(self, items: List[Tuple[bytes, str, float, float, int, Optional[SearchFilter],
+                                                  Optional[Tuple[str, ...]], Optional[str]]]) -> List[Any]:
+        outputs: List[Any] = [None] * len(items)
+        images = {}
+        for i, item in enumerate(items):
+            try:
+                images[i] = decode_image(item[0])
+            except InvalidImageError as e:
+                outputs[i] = e
+
+        # Les poids, le filtre, les backends visuels et la fusion s'appliquent à tout un lot :
+        # un sous-lot par combinaison
+        for (weight_image, weight_text, search_filter, visual_backends, fusion), rows in _groups(
+                list(images), lambda i: (items[i][2], items[i][3], items[i][5], items[i][6], items[i][7])):
+            top_k = max(items[i][4] for i in rows)
+            try:
+                results = self.system.combined_searches(
+                    [images[i] for i in rows], [items[i][1] for i in rows],
+                    weight_image, weight_text, top_k, filters=search_filter, visual_backends=visual_backends,
+                    fusion=fusion
+                )
+            except ValueError as e:
+                for i in rows:
+                    outputs[i] = e
+                continue
+            for i, result in zip(rows, results):
+                outputs[i] = result[:items[i][4]]
+        return outputs
+
+    def product(self, index: int) -> Dict:
+        return {key: _jsonable(value) for key, value in self.system.get_product_info(index).items()}
+
+    def format_results(self, results: List[Tuple[int, float]]) -> List[Dict]:
+        products = self.system.get_products_info([index for index, _ in results])
+        return [{'index': int(index), 'score': float(score),
+                 'product': {key: _jsonable(value) for key, value in info.items()}}
+                for (index, score), info in zip(results, products)]
+
+
+def create_app(system: Optional[ChanelRecommendationSystem] = None) -> FastAPI:
+    """
+    Crée l'application FastAPI
+
+    Args:
+        system: Système de recommandation déjà chargé (par défaut, chargé au démarrage)
+
+    Returns:
+        Application ASGI
+    """
+    executor = ThreadPoolExecutor(max_workers=API_CONFIG["inference_workers"], thread_name_prefix="inference")
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        loop = asyncio.get_running_loop()
+        # Chargement des modèles hors de la boucle d'événements
+        loaded = system or await loop.run_in_executor(executor, ChanelRecommendationSystem)
+        service = SearchService(loaded)
+        batch_options = dict(executor=executor, max_batch_size=API_CONFIG["max_batch_size"],
+                             max_wait_ms=API_CONFIG["max_wait_ms"])
+        app.state.service = service
+        app.state.batchers = {
+            'text': MicroBatcher(service.search_texts, name='text', **batch_options),
+            'image': MicroBatcher(service.search_images, name='image', **batch_options),
+            'combined': MicroBatcher(service.combined_searches, name='combined', **batch_options)
+        }
+        for batcher in app.state.batchers.values():
+            batcher.start()
+        get_metrics().add_collector('batching', lambda: [
+            sample for name, batcher in app.state.batchers.items() for sample in (
+                ('batches_total', {'mode': name}, batcher.batches),
+                ('batch_items_total', {'mode': name}, batcher.items)
+            )
+        ])
+        # Plusieurs processus : état de ce processus exporté pour GET /metrics de tous
+        metrics_dir = METRICS_CONFIG["multiprocess_dir"]
+        stop_export = get_metrics().start_export(metrics_dir, METRICS_CONFIG["multiprocess_interval_s"]) \
+            if metrics_dir else None
+        yield
+        for batcher in app.state.batchers.values():
+            await batcher.stop()
+        if stop_export is not None:
+            stop_export.set()
+        executor.shutdown(wait=False)
+
+    app = FastAPI(title="Chanel Product Recommendation API", lifespan=lifespan)
+
+    async def run_search(request: Request, mode: str, item: tuple) -> Dict:
+        service: SearchService = request.app.state.service
+        try:
+            results = await request.app.state.batchers[mode].submit(item)
+        except InvalidImageError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ValueError as e:
+            # Modèle ou embeddings indisponibles
+            raise HTTPException(status_code=503, detail=str(e))
+        return {
+            'mode': mode,
+            'catalog_version': service.system.get_catalog_status().get('version'),
+            'results': service.format_results(results)
+        }
+
+    @app.get("/health")
+    async def health(request: Request):
+        service: Optional[SearchService] = getattr(request.app.state, 'service', None)
+        if service is None:
+            return {'status': 'loading'}
+        return {
+            'status': 'ok',
+            # Processus qui a répondu : batching et cache ci-dessous lui sont propres
+            'worker': os.getpid(),
+            'catalog': service.system.get_catalog_status(),
+            'loading': service.system.get_loading_status(),
+            'batching': {name: batcher.stats() for name, batcher in request.app.state.batchers.items()},
+            'cache': service.system.get_cache_stats()
+        }
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        # Format texte d'exposition Prometheus, totaux de tous les processus de l'API
+        metrics_dir = METRICS_CONFIG["multiprocess_dir"]
+        text = get_metrics().render_multiprocess(metrics_dir) if metrics_dir else get_metrics().render_prometheus()
+        return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+    @app.get("/filters")
+    async def filters(request: Request):
+        return request.app.state.service.system.get_filter_options()
+
+    @app.post("/search/text")
+    async def search_text(request: Request, body: TextSearchRequest):
+        search_filter = SearchFilter.create(body.categories, body.min_price, body.max_price)
+        item = (body.query, body.top_k, search_filter, _text_encoder(body.text_encoder))
+        return await run_search(request, 'text', item)
+
+    @app.post("/search/image")
+    async def search_image(request: Request, image: UploadFile = File(...),
+                           top_k: int = Form(10, ge=1, le=API_CONFIG["max_top_k"]),
+                           categories: Optional[List[str]] = Form(None),
+                           min_price: Optional[float] = Form(None, ge=0),
+                           max_price: Optional[float] = Form(None, ge=0),
+                           visual_backends: Optional[List[str]] = Form(None)):
+        search_filter = SearchFilter.create(categories, min_price, max_price)
+        item = (await image.read(), top_k, search_filter, _visual_backends(visual_backends))
+        return await run_search(request, 'image', item)
+
+    @app.post("/search/combined")
+    async def search_combined(request: Request, image: UploadFile = File(...),
+                              query: str = Form(..., min_length=1),
+                              weight_image: float = Form(0.5, ge=0.0, le=1.0),
+                              weight_text: float = Form(0.5, ge=0.0, le=1.0),
+                              top_k: int = Form(10, ge=1, le=API_CONFIG["max_top_k"]),
+                              categories: Optional[List[str]] = Form(None),
+                              min_price: Optional[float] = Form(None, ge=0),
+                              max_price: Optional[float] = Form(None, ge=0),
+                              visual_backends: Optional[List[str]] = Form(None),
+                              fusion: Optional[str] = Form(None)):
+        search_filter = SearchFilter.create(categories, min_price, max_price)
+        item = (await image.read(), query, round(weight_image, 4), round(weight_text, 4), top_k, search_filter,
+                _visual_backends(visual_backends), _fusion(fusion))
+        return await run_search(request, 'combined', item)
+
+    @app.get("/products/{index}")
+    async def product(request: Request, index: int):
+        info = request.app.state.service.product(index) if index >= 0 else {}
+        if not info:
+            raise HTTPException(status_code=404, detail=f"Produit {index} introuvable")
+        return {'index': index, **info}
+
+    @app.get("/products/{index}/similar")
+    async def similar(request: Request, index: int,
+                      top_k: int = Query(10, ge=1, le=API_CONFIG["max_top_k"]),
+                      mode: str = Query('image', pattern='^(image|text|combined)$'),
+                      weight_image: float = Query(0.5, ge=0.0, le=1.0),
+                      categories: Optional[List[str]] = Query(None),
+                      min_price: Optional[float] = Query(None, ge=0),
+                      max_price: Optional[float] = Query(None, ge=0)):
+        service: SearchService = request.app.state.service
+        search_filter = SearchFilter.create(categories, min_price, max_price)
+        try:
+            # Embeddings stockés : pas d'encodeur, mais une recherche éventuelle hors de la boucle
+            results = await asyncio.get_running_loop().run_in_executor(
+                executor, service.system.similar_products, index, top_k, mode, weight_image, search_filter
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        return {'mode': mode, 'index': index, 'results': service.format_results(results)}
+
+    return app
+
+
+app = create_app()
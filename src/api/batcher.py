@@ -0,0 +1,121 @@
+"""
+Regroupement des requêtes concurrentes (micro-batching)
+
+Les requêtes arrivant pendant une courte fenêtre sont regroupées et passent
+ensemble dans les encodeurs : un lot de 16 images coûte bien moins que 16
+passages séparés dans CLIP. Le traitement du lot s'exécute dans un pool de
+threads borné, la boucle d'événements n'est jamais bloquée.
+"""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """
+    File d'attente asynchrone qui traite les éléments par lots
+
+    La fonction de traitement reçoit une liste d'éléments et retourne une liste
+    de résultats de même longueur ; un résultat qui est une exception est levé
+    uniquement pour la requête correspondante.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], executor: Executor,
+                 max_batch_size: int = 32, max_wait_ms: float = 10.0, name: str = "batcher"):
+        """
+        Args:
+            process_batch: Fonction (synchrone) de traitement d'un lot
+            executor: Pool de threads dans lequel le lot est traité
+            max_batch_size: Taille maximale d'un lot
+            max_wait_ms: Attente maximale après la première requête d'un lot
+            name: Nom (statistiques)
+        """
+        self.process_batch = process_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+
+    def start(self):
+        """Démarre la boucle de regroupement (dans la boucle d'événements courante)"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        """Arrête la boucle de regroupement"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Ajoute un élément au prochain lot et attend son résultat
+
+        Args:
+            item: Élément à traiter
+
+        Returns:
+            Résultat correspondant à l'élément
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        """Attend une première requête puis regroupe celles qui arrivent pendant la fenêtre"""
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Une requête abandonnée (client déconnecté) n'est pas calculée
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch,
+                                                     [item for item, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        """Nombre de lots traités et taille moyenne des lots"""
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'pending': self._queue.qsize() if self._queue is not None else 0
+        }
@@ -3,6 +3,7 @@ Configuration de l'application Chanel
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Configuration des chemins
@@ -25,10 +26,38 @@ MODEL_CONFIG = {
     "visual_models": {
         "clip": "ViT-B/32",
         "resnet": "resnet50",
-        "vit": "vit_base_patch16_224"
+        "vit": "vit_base_patch16_224",
+        "cnn": "cnn_embedding_model.h5"   # modèle Keras du répertoire des modèles
     }
 }
 
+# Configuration de la recherche visuelle multi-modèles
+VISUAL_SEARCH_CONFIG = {
+    # Backend visuel -> matrice de embeddings_visuels.npz (encodeur de MODEL_CONFIG["visual_models"])
+    "families": {
+        "clip": "clip_embeddings",
+        "resnet": "resnet_embeddings",
+        "vit": "vit_embeddings",
+        "cnn": "cnn_embeddings"
+    },
+    # Backend utilisé quand la requête n'en précise pas
+    "default": os.environ.get('VISUAL_SEARCH_BACKEND', 'clip'),
+    # Poids relatifs de la fusion tardive (renormalisés sur les backends choisis)
+    "fusion_weights": {
+        "clip": 2.0,
+        "vit": 1.0,
+        "resnet": 1.0,
+        "cnn": 0.5
+    }
+}
+
+# Configuration de la recherche par texte
+TEXT_SEARCH_CONFIG = {
+    # "text" (modèle textuel, embeddings des titres) ou "clip" (tour textuelle de CLIP,
+    # embeddings visuels clip_embeddings : recherche texte -> image sans modèle textuel)
+    "encoder": os.environ.get('TEXT_SEARCH_ENCODER', 'text')
+}
+
 # Configuration Streamlit
 STREAMLIT_CONFIG = {
     "page_title": "Chanel Product Recommendation Platform",
@@ -37,6 +66,18 @@ STREAMLIT_CONFIG = {
     "initial_sidebar_state": "expanded"
 }
 
+# Configuration des vignettes des cartes produits
+THUMBNAIL_CONFIG = {
+    "size": 150,                # largeur des images dans les cartes
+    "max_workers": 8,           # téléchargements simultanés
+    "timeout": 5,
+    "memory_entries": 512,
+    "max_disk_mb": 200,
+    "cache_dir": os.environ.get(
+        'THUMBNAIL_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'chanel_thumbnails')
+    )
+}
+
 # Configuration des embeddings
 EMBEDDING_CONFIG = {
     "visual_embeddings": {
@@ -48,9 +89,197 @@ EMBEDDING_CONFIG = {
     "textual_embeddings": {
         "title_embeddings_basic": 384,
         "title_embeddings_improved": 768
+    },
+    # Index de recherche : "flat" (exact), "stream" (exact, par blocs, pour EMBEDDINGS_MMAP=1),
+    # "ivf" (NumPy), "hnsw" (hnswlib),
+    # ou codes compacts re-classés en pleine précision : "fp16", "int8", "pq", "pca"
+    "index": {
+        "backend": os.environ.get('SEARCH_INDEX_BACKEND', 'flat'),
+        # Sauvegarde de l'index à côté des embeddings pour éviter de le reconstruire
+        "persist": True,
+        # Backend propre à une famille d'embeddings (sinon "backend")
+        "family_backends": {
+            "cnn_embeddings": "stream"  # 186 624 dimensions : exact, lu par blocs
+        },
+        "stream": {
+            "block_memory_mb": 64,  # lignes lues par bloc (mémoire résidente par thread)
+            # threads de parcours (None = nombre de cœurs, 1 = séquentiel)
+            "workers": int(os.environ['SEARCH_THREADS']) if os.environ.get('SEARCH_THREADS') else None
+        },
+        "ivf": {
+            "nlist": None,          # None = 4 * sqrt(n_produits)
+            "nprobe": 8,            # groupes parcourus par requête (rappel / latence)
+            "train_iters": 10,
+            "train_sample": 50000
+        },
+        "hnsw": {
+            "M": 32,
+            "ef_construction": 200,
+            "ef_search": 64         # largeur de recherche (rappel / latence)
+        },
+        # rerank : liste courte re-classée en pleine précision = rerank * top_k (0 = aucun)
+        "fp16": {
+            "rerank": 2
+        },
+        "int8": {
+            "rerank": 4
+        },
+        "pq": {
+            "n_subspaces": 64,      # octets par produit
+            "n_centroids": 256,
+            "train_iters": 10,
+            "train_sample": 20000,
+            "rerank": 10
+        },
+        "pca": {
+            "n_components": 256,    # dimensions conservées (float16)
+            "train_sample": 10000,  # taille de la matrice de Gram (s x s)
+            "rerank": 10
+        }
     }
 }
 
+# Configuration des traitements par lot
+BATCH_CONFIG = {
+    "image_batch_size": 32,     # images par passage dans CLIP
+    "text_batch_size": 64,      # textes par passage dans le modèle textuel
+    "query_block_size": 256     # requêtes par produit matrice-matrice
+}
+
+# Configuration du cache des requêtes
+CACHE_CONFIG = {
+    "enabled": os.environ.get('QUERY_CACHE', '1') == '1',
+    "embedding_max_entries": 2048,
+    "result_max_entries": 1024,
+    "ttl_seconds": 24 * 3600,
+    # Niveau disque persistant entre redémarrages (None = mémoire seule)
+    "disk_dir": os.environ.get('QUERY_CACHE_DIR') or None
+}
+
+# Configuration du rechargement à chaud du catalogue
+CATALOG_CONFIG = {
+    # Surveillance du fichier CURRENT (nouvelle version publiée par l'indexation)
+    "watch": os.environ.get('CATALOG_WATCH', '0') == '1',
+    "watch_interval": float(os.environ.get('CATALOG_WATCH_INTERVAL', '30')),
+    # Bouton de rechargement manuel dans la barre latérale
+    "admin": os.environ.get('ADMIN_MODE', '0') == '1'
+}
+
+# Configuration du stockage des embeddings
+EMBEDDING_STORE_CONFIG = {
+    # Projection mémoire d'un .npy normalisé (partagé entre processus)
+    "mmap": os.environ.get('EMBEDDINGS_MMAP', '0') == '1',
+    # Répertoire des .npy (par défaut, celui des archives .npz)
+    "sidecar_dir": os.environ.get('EMBEDDINGS_SIDECAR_DIR') or None,
+    # Taille des blocs de lignes lus en flux (écriture du .npy, similarités
+    # d'une matrice projetée) : borne la mémoire résidente, pas la taille du catalogue
+    "block_memory_mb": float(os.environ.get('EMBEDDINGS_BLOCK_MB', '64'))
+}
+
+# Configuration de l'API HTTP (src/api)
+API_CONFIG = {
+    "host": os.environ.get('API_HOST', '0.0.0.0'),
+    "port": int(os.environ.get('API_PORT', '8000')),
+    # Regroupement des requêtes concurrentes avant passage dans les encodeurs
+    "max_batch_size": 32,
+    "max_wait_ms": 10,
+    # Threads d'inférence (la boucle d'événements n'exécute jamais les modèles)
+    "inference_workers": int(os.environ.get('API_INFERENCE_WORKERS', '2')),
+    "max_top_k": 100
+}
+
+# Configuration du chargement des composants
+LOADING_CONFIG = {
+    # Composants chargés en arrière-plan dès le démarrage ("catalog", "text", "clip",
+    # "clip_text" (tour textuelle de CLIP), et les autres backends visuels : "resnet", "vit", "cnn") ;
+    # les autres sont chargés à la première recherche qui en a besoin
+    "preload": [name.strip() for name in os.environ.get('PRELOAD_MODELS', 'catalog,text,clip').split(',')
+                if name.strip()],
+    "workers": 3                # chargements simultanés
+}
+
+# Configuration des recherches filtrées (catégorie, prix)
+FILTER_CONFIG = {
+    # Sous-matrice contiguë par catégorie, construite au chargement du catalogue
+    # (≈ une copie des embeddings en mémoire, pas de copie de lignes par requête).
+    # Par défaut (None), seulement pour les matrices chargées en mémoire : une
+    # matrice projetée (EMBEDDINGS_MMAP=1) est parcourue par blocs de lignes
+    "category_subindexes": {'1': True, '0': False}.get(os.environ.get('FILTER_SUBINDEXES', ''))
+}
+
+# Configuration des produits similaires (table des voisins précalculée)
+NEIGHBOR_CONFIG = {
+    "n_neighbors": 50,          # voisins stockés par produit
+    "block_memory_mb": 256,     # mémoire des scores d'un bloc de lignes (par thread)
+    "workers": None             # threads de calcul (None = nombre de cœurs)
+}
+
+# Configuration des résultats précalculés des requêtes fréquentes (tools/precompute_results)
+PRECOMPUTED_CONFIG = {
+    "top_k": 50,                # produits stockés par requête
+    "max_queries": 10000,       # requêtes les plus fréquentes du journal
+    "encoders": ["text"]        # encodeurs précalculés ("text", "clip")
+}
+
+# Configuration du stockage des informations produits
+PRODUCT_STORE_CONFIG = {
+    # Sauvegarde binaire à côté du CSV (évite l'analyse du CSV au démarrage)
+    "persist": os.environ.get('PRODUCT_STORE_CACHE', '1') == '1',
+    # Répertoire du fichier binaire (par défaut, celui du CSV)
+    "cache_dir": os.environ.get('PRODUCT_STORE_DIR') or None,
+    # Projection mémoire du fichier binaire (partagé entre processus, chaînes décodées à la demande)
+    "mmap": os.environ.get('PRODUCT_STORE_MMAP', '0') == '1'
+}
+
+# Configuration du décodage des images de requête
+IMAGE_CONFIG = {
+    # Petit côté minimal conservé au décodage (2 x l'entrée de CLIP, 224 px) :
+    # les photos plus grandes sont décodées / réduites d'un facteur entier
+    "decode_min_side": 448,
+    "preview_size": 300         # côté maximal de l'aperçu affiché
+}
+
+# Configuration de l'inférence CPU des encodeurs de requêtes (ignorée sur GPU)
+INFERENCE_CONFIG = {
+    # "eager" (PyTorch float32), "int8" (quantification dynamique des couches linéaires),
+    # "torchscript" (CLIP uniquement), "compile" (torch.compile) ou "onnx" (onnxruntime)
+    "clip_backend": os.environ.get('CLIP_INFERENCE_BACKEND', 'eager'),
+    "text_backend": os.environ.get('TEXT_INFERENCE_BACKEND', 'eager'),
+    # Threads intra-opération / inter-opérations (None = valeur par défaut de PyTorch)
+    "intra_op_threads": int(os.environ['TORCH_NUM_THREADS']) if os.environ.get('TORCH_NUM_THREADS') else None,
+    "inter_op_threads": int(os.environ['TORCH_INTEROP_THREADS']) if os.environ.get('TORCH_INTEROP_THREADS') else None,
+    # Similarité cosinus minimale avec le modèle de référence ; en dessous, retour à "eager"
+    "cosine_tolerance": float(os.environ.get('INFERENCE_COSINE_TOLERANCE', '0.99')),
+    # Répertoire des modèles ONNX exportés (par défaut, <répertoire des modèles>/onnx)
+    "onnx_dir": os.environ.get('ONNX_MODELS_DIR') or None
+}
+
+# Configuration de la fusion des scores image / texte (recherche combinée)
+FUSION_CONFIG = {
+    # "weighted" (somme brute des cosinus), "zscore" / "minmax" (scores de chaque
+    # modalité normalisés sur les candidats) ou "rrf" (fusion par rangs réciproques)
+    "strategy": os.environ.get('FUSION_STRATEGY', 'minmax'),
+    # Candidats par modalité (top-N de chaque index, seule leur union est rescorée) ;
+    # 0 = tout le catalogue dans chaque modalité
+    "candidates": int(os.environ.get('FUSION_CANDIDATES', '200')),
+    "rrf_k": 60                 # constante de lissage des rangs réciproques
+}
+
+# Configuration des mesures du chemin de recherche (durées par étape, compteurs)
+METRICS_CONFIG = {
+    # Désactivées, les spans se réduisent à un context manager vide
+    "enabled": os.environ.get('METRICS', '1') == '1',
+    # Panneau de débogage dans la barre latérale Streamlit
+    "panel": os.environ.get('METRICS_PANEL', '0') == '1',
+    "prefix": "chanel",         # préfixe des métriques exportées (GET /metrics)
+    # Bornes des histogrammes de durée (secondes)
+    "buckets": (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    # API à plusieurs processus : chaque processus y écrit son état, GET /metrics
+    # additionne tous les processus (défini par python -m src.api --workers N)
+    "multiprocess_dir": os.environ.get('METRICS_MULTIPROC_DIR') or None,
+    "multiprocess_interval_s": float(os.environ.get('METRICS_MULTIPROC_INTERVAL', '5'))
+}
+
 def get_models_directory():
     """Retourne le répertoire des modèles selon l'environnement"""
     if os.path.exists(DOCKER_MODELS_PATH):
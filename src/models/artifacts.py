@@ -0,0 +1,150 @@
+"""
+Artefacts versionnés du catalogue (dataset + embeddings)
+
+Disposition dans le répertoire des modèles :
+
+    versions/<version>/df_clean_indexed.csv
+    versions/<version>/embeddings_visuels.npz
+    versions/<version>/embeddings_textuels.npz
+    versions/<version>/manifest.json
+    CURRENT                       # nom de la version active
+
+Sans fichier CURRENT, les fichiers à la racine du répertoire des modèles sont
+utilisés (disposition historique).
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+CURRENT_FILE = 'CURRENT'
+VERSIONS_DIR = 'versions'
+MANIFEST_FILE = 'manifest.json'
+CATALOG_FILE = 'df_clean_indexed.csv'
+VISUAL_FILE = 'embeddings_visuels.npz'
+TEXTUAL_FILE = 'embeddings_textuels.npz'
+
+
+def current_version(models_dir: str) -> Optional[str]:
+    """
+    Version active du catalogue
+
+    Returns:
+        Nom de la version, ou None (disposition historique)
+    """
+    try:
+        with open(os.path.join(models_dir, CURRENT_FILE)) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    if version and os.path.isdir(os.path.join(models_dir, VERSIONS_DIR, version)):
+        return version
+    return None
+
+
+def version_dir(models_dir: str, version: str) -> str:
+    """Répertoire d'une version"""
+    return os.path.join(models_dir, VERSIONS_DIR, version)
+
+
+def resolve_artifact_dir(models_dir: str, version: Optional[str] = None) -> str:
+    """
+    Répertoire contenant le dataset et les embeddings à charger
+
+    Args:
+        models_dir: Répertoire des modèles
+        version: Version demandée (par défaut, la version active)
+    """
+    version = version or current_version(models_dir)
+    return version_dir(models_dir, version) if version else models_dir
+
+
+def read_manifest(artifact_dir: str) -> Optional[Dict]:
+    """Manifeste d'une version (None pour la disposition historique)"""
+    try:
+        with open(os.path.join(artifact_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_versions(models_dir: str) -> List[str]:
+    """Versions publiées, de la plus ancienne à la plus récente"""
+    versions_root = os.path.join(models_dir, VERSIONS_DIR)
+    if not os.path.isdir(versions_root):
+        return []
+    return sorted(
+        name for name in os.listdir(versions_root)
+        if not name.startswith('.') and os.path.isdir(os.path.join(versions_root, name))
+    )
+
+
+def new_version_id() -> str:
+    """Identifiant de version triable chronologiquement"""
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%fZ}-{uuid.uuid4().hex[:6]}"
+
+
+def _write_text_atomic(path: str, text: str):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def publish_version(models_dir: str, write_artifacts: Callable[[str], Dict],
+                    version: Optional[str] = None, activate: bool = True) -> str:
+    """
+    Écrit une nouvelle version puis l'active de façon atomique
+
+    Les fichiers sont écrits dans un répertoire temporaire, renommé en
+    versions/<version> une fois complet ; CURRENT est ensuite remplacé par
+    os.replace. Un lecteur voit donc soit l'ancienne version, soit la nouvelle.
+
+    Args:
+        models_dir: Répertoire des modèles
+        write_artifacts: Fonction qui écrit les fichiers dans le répertoire
+            fourni et retourne le contenu du manifeste
+        version: Nom de la version (par défaut, généré)
+        activate: Mettre à jour CURRENT
+
+    Returns:
+        Nom de la version publiée
+    """
+    version = version or new_version_id()
+    versions_root = os.path.join(models_dir, VERSIONS_DIR)
+    os.makedirs(versions_root, exist_ok=True)
+
+    staging_dir = tempfile.mkdtemp(prefix=f".{version}-", dir=versions_root)
+    try:
+        manifest = write_artifacts(staging_dir)
+        manifest = {'version': version, 'created_at': datetime.now(timezone.utc).isoformat(), **manifest}
+        with open(os.path.join(staging_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging_dir, version_dir(models_dir, version))
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    if activate:
+        _write_text_atomic(os.path.join(models_dir, CURRENT_FILE), version + '\n')
+    return version
+
+
+def prune_versions(models_dir: str, keep: int = 3) -> List[str]:
+    """
+    Supprime les anciennes versions (la version active est toujours conservée)
+
+    Returns:
+        Versions supprimées
+    """
+    active = current_version(models_dir)
+    removed = []
+    for version in list_versions(models_dir)[:-keep] if keep > 0 else list_versions(models_dir):
+        if version != active:
+            shutil.rmtree(version_dir(models_dir, version), ignore_errors=True)
+            removed.append(version)
+    return removed
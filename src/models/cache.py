@@ -0,0 +1,288 @@
+"""
+Caches des requêtes : embeddings de requête et résultats top-k
+
+Cache mémoire LRU borné avec expiration (TTL), doublé d'un niveau disque
+optionnel qui survit aux redémarrages.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+from PIL import Image
+
+
+_MISSING = object()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalise une requête textuelle pour la clé de cache
+
+    ("  Sac à main  NOIR " et "sac à main noir" partagent la même entrée)
+    """
+    text = unicodedata.normalize('NFC', text)
+    return ' '.join(text.lower().split())
+
+
+def image_digest(image: Image.Image) -> str:
+    """
+    Empreinte du contenu d'une image décodée (pixels, taille et mode)
+
+    Args:
+        image: Image PIL
+
+    Returns:
+        Empreinte hexadécimale
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Cache LRU thread-safe avec expiration et niveau disque optionnel
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None,
+                 disk_dir: Optional[str] = None):
+        """
+        Args:
+            max_entries: Nombre maximal d'entrées en mémoire
+            ttl_seconds: Durée de vie d'une entrée (None = pas d'expiration)
+            disk_dir: Répertoire du niveau disque (None = mémoire seule)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Calculs en cours par clé : les requêtes simultanées sur une même clé attendent le premier
+        self._inflight: Dict[Hashable, Future] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _is_expired(self, timestamp: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - timestamp > self.ttl_seconds
+
+    def _disk_path(self, key: Hashable) -> str:
+        name = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.disk_dir, name[:2], f"{name}.pkl")
+
+    def _disk_get(self, key: Hashable) -> Any:
+        path = self._disk_path(key)
+        try:
+            if self._is_expired(os.path.getmtime(path)):
+                os.remove(path)
+                return _MISSING
+            with open(path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return _MISSING
+        # Protection contre les collisions de noms de fichier
+        return value if stored_key == key else _MISSING
+
+    def _disk_put(self, key: Hashable, value: Any):
+        path = self._disk_path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # Le niveau disque est une optimisation : une erreur d'écriture n'est pas bloquante
+
+    def _memory_put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Retourne la valeur associée à la clé (mémoire, puis disque)
+
+        Args:
+            key: Clé hashable (tuple de chaînes et de nombres)
+            default: Valeur retournée en cas d'absence
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, timestamp = entry
+                if not self._is_expired(timestamp):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.disk_dir:
+            value = self._disk_get(key)
+            if value is not _MISSING:
+                self._memory_put(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any):
+        """Enregistre une valeur (mémoire et, si configuré, disque)"""
+        self._memory_put(key, value)
+        if self.disk_dir:
+            self._disk_put(key, value)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Retourne la valeur en cache ou la calcule puis l'enregistre
+
+        Un seul calcul par clé à la fois : les appels simultanés sur une clé
+        absente attendent le résultat (ou l'exception) du premier.
+
+        Args:
+            key: Clé hashable
+            compute: Fonction sans argument appelée en cas d'absence
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            # Calculée entre-temps par un autre thread
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_expired(entry[1]):
+                return entry[0]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        self.put(key, value)
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        """Vide le niveau mémoire (le niveau disque est conservé)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Compteurs de succès / échecs"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'entries': len(self),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0
+        }
+
+
+class QueryCache:
+    """
+    Caches des embeddings de requête et des résultats top-k
+
+    Les clés incluent le nom du modèle d'encodage : changer de modèle ne
+    réutilise jamais un embedding calculé par un autre.
+    """
+
+    def __init__(self, embedding_max_entries: int = 2048, result_max_entries: int = 1024,
+                 ttl_seconds: Optional[float] = None, disk_dir: Optional[str] = None):
+        """
+        Args:
+            embedding_max_entries: Taille du cache d'embeddings
+            result_max_entries: Taille du cache de résultats
+            ttl_seconds: Durée de vie des entrées
+            disk_dir: Répertoire du niveau disque (None = mémoire seule)
+        """
+        self.embeddings = LRUCache(
+            embedding_max_entries, ttl_seconds,
+            os.path.join(disk_dir, 'embeddings') if disk_dir else None
+        )
+        self.results = LRUCache(
+            result_max_entries, ttl_seconds,
+            os.path.join(disk_dir, 'results') if disk_dir else None
+        )
+
+    @staticmethod
+    def text_key(model_name: str, text: str) -> tuple:
+        """Clé d'un embedding textuel"""
+        return ('text', model_name, normalize_text(text))
+
+    @staticmethod
+    def image_key(model_name: str, digest: str) -> tuple:
+        """Clé d'un embedding d'image (digest = image_digest(image))"""
+        return ('image', model_name, digest)
+
+    def get_embedding(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        """Embedding de requête en cache, calculé si nécessaire (lecture seule)"""
+        def compute_read_only():
+            embedding = compute()
+            embedding.setflags(write=False)
+            return embedding
+        return self.embeddings.get_or_compute(key, compute_read_only)
+
+    def get_results(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        """Résultats top-k en cache, calculés si nécessaire (copie de la liste)"""
+        return list(self.results.get_or_compute(key, lambda: tuple(compute())))
+
+    def lookup_embeddings(self, keys: Sequence[tuple]) -> List[Optional[Any]]:
+        """Embeddings en cache d'un lot de requêtes (None pour chaque absence)"""
+        return [self.embeddings.get(key) for key in keys]
+
+    def put_embedding(self, key: tuple, embedding: Any) -> Any:
+        """Enregistre l'embedding d'une requête (copie en lecture seule, détachée de la matrice du lot)"""
+        embedding = embedding.copy()
+        embedding.setflags(write=False)
+        self.embeddings.put(key, embedding)
+        return embedding
+
+    def lookup_results(self, keys: Sequence[tuple]) -> List[Optional[list]]:
+        """Résultats top-k en cache d'un lot de requêtes (copies, None pour chaque absence)"""
+        return [None if found is None else list(found) for found in (self.results.get(key) for key in keys)]
+
+    def put_results(self, key: tuple, results: Sequence):
+        """Enregistre les résultats top-k d'une requête"""
+        self.results.put(key, tuple(results))
+
+    def clear(self):
+        """Vide les niveaux mémoire"""
+        self.embeddings.clear()
+        self.results.clear()
+
+    def stats(self) -> Dict:
+        """Compteurs des deux caches"""
+        return {'embeddings': self.embeddings.stats(), 'results': self.results.stats()}
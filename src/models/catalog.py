@@ -0,0 +1,260 @@
+"""
+Version chargée du catalogue et rechargement à chaud
+
+Un CatalogSnapshot regroupe tout ce qui dépend d'une version des artefacts
+(informations produits, matrices d'embeddings, index). Il est immuable : le CatalogManager
+en construit un nouveau à côté de l'actuel, le valide, puis remplace la
+référence en une seule affectation. Une recherche en cours garde la
+référence qu'elle a lue et se termine sur l'ancienne version. Les modèles
+(CLIP, modèle textuel) ne sont jamais rechargés.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..core.config import FILTER_CONFIG
+from .artifacts import CATALOG_FILE, VISUAL_FILE, TEXTUAL_FILE, current_version, resolve_artifact_dir
+from .filters import FilterIndex
+from .precomputed import PRECOMPUTED_FILE
+from .visual_encoders import visual_family
+from .registry import (
+    get_registry, load_product_store, load_embedding_store, load_vector_index, load_neighbor_table,
+    load_precomputed_results
+)
+
+LEGACY_VERSION = 'legacy'
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Une version du catalogue, prête pour la recherche"""
+    version: str
+    artifact_dir: str
+    products: Any
+    visual_embeddings: Any = None
+    textual_embeddings: Any = None
+    visual_index: Any = None
+    textual_index: Any = None
+    filters: Optional[FilterIndex] = None
+    # Voisins précalculés par famille d'embeddings (tools/build_neighbors)
+    neighbors: Dict[str, Any] = field(default_factory=dict)
+    # Résultats précalculés des requêtes textuelles fréquentes (tools/precompute_results)
+    precomputed: Any = None
+    loaded_at: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.products) if self.products is not None else 0
+
+    def visual_family(self, backend: str) -> Tuple[Any, Any]:
+        """
+        Embeddings et index d'un backend visuel de cette version
+
+        CLIP est chargé avec la version ; les autres familles (resnet, vit, cnn)
+        à leur première recherche, puis partagées via le registre (oubliées avec
+        la version).
+
+        Args:
+            backend: "clip", "resnet", "vit" ou "cnn"
+
+        Returns:
+            Tuple (EmbeddingStore, VectorIndex)
+
+        Raises:
+            ValueError: backend inconnu, famille absente ou incohérente avec le dataset
+        """
+        key = visual_family(backend)
+        if key == 'clip_embeddings':
+            if self.visual_embeddings is None:
+                raise ValueError("Embeddings visuels CLIP non disponibles")
+            return self.visual_embeddings, self.visual_index
+
+        visual_path = os.path.join(self.artifact_dir, VISUAL_FILE)
+        store = load_embedding_store(visual_path, key)
+        if store is None:
+            raise ValueError(f"Embeddings visuels {key} absents de la version {self.version}")
+        if len(store) != len(self):
+            raise ValueError(f"{key}: {len(store)} lignes pour {len(self)} produits (version {self.version})")
+        return store, load_vector_index(store, visual_path)
+
+
+def load_snapshot(models_dir: str, version: Optional[str] = None) -> CatalogSnapshot:
+    """
+    Charge une version du catalogue et vérifie sa cohérence
+
+    Args:
+        models_dir: Répertoire des modèles
+        version: Version à charger (par défaut, la version active)
+
+    Returns:
+        CatalogSnapshot validé
+
+    Raises:
+        FileNotFoundError: dataset absent
+        ValueError: nombre de lignes incohérent entre dataset et embeddings
+    """
+    version = version or current_version(models_dir)
+    artifact_dir = resolve_artifact_dir(models_dir, version)
+
+    products = load_product_store(artifact_dir)
+    if products is None:
+        raise FileNotFoundError(f"Fichier dataset non trouvé: {os.path.join(artifact_dir, CATALOG_FILE)}")
+
+    visual_path = os.path.join(artifact_dir, VISUAL_FILE)
+    visual_embeddings = load_embedding_store(visual_path, 'clip_embeddings')
+
+    # Embeddings textuels : version améliorée d'abord, puis basique
+    textual_path = os.path.join(artifact_dir, TEXTUAL_FILE)
+    textual_embeddings = load_embedding_store(textual_path, 'title_embeddings_improved')
+    if textual_embeddings is None:
+        textual_embeddings = load_embedding_store(textual_path, 'title_embeddings_basic')
+
+    for store in (visual_embeddings, textual_embeddings):
+        if store is not None and len(store) != len(products):
+            raise ValueError(f"{store.name}: {len(store)} lignes pour {len(products)} produits "
+                             f"(version {version or LEGACY_VERSION})")
+
+    neighbors = {}
+    for store in (visual_embeddings, textual_embeddings):
+        table = load_neighbor_table(artifact_dir, store.name) if store is not None else None
+        if table is not None:
+            if len(table) != len(products):
+                raise ValueError(f"Voisins {store.name}: {len(table)} lignes pour {len(products)} produits "
+                                 f"(version {version or LEGACY_VERSION})")
+            neighbors[store.name] = table
+
+    # Lignes par catégorie / par prix et sous-matrices des catégories
+    filters = FilterIndex(products, FILTER_CONFIG["category_subindexes"])
+    filters.prebuild([visual_embeddings, textual_embeddings])
+
+    return CatalogSnapshot(
+        version=version or LEGACY_VERSION,
+        artifact_dir=artifact_dir,
+        products=products,
+        visual_embeddings=visual_embeddings,
+        textual_embeddings=textual_embeddings,
+        visual_index=load_vector_index(visual_embeddings, visual_path) if visual_embeddings is not None else None,
+        textual_index=load_vector_index(textual_embeddings, textual_path) if textual_embeddings is not None else None,
+        filters=filters,
+        neighbors=neighbors,
+        precomputed=load_precomputed_results(artifact_dir, version or LEGACY_VERSION),
+        loaded_at=time.time()
+    )
+
+
+def _evict_version(artifact_dir: str):
+    """Retire du registre les ressources chargées depuis une version des artefacts"""
+    paths = [os.path.join(artifact_dir, name)
+             for name in (CATALOG_FILE, VISUAL_FILE, TEXTUAL_FILE, 'neighbors.', PRECOMPUTED_FILE)]
+    get_registry().evict(lambda key: any(path in key for path in paths))
+
+
+class CatalogManager:
+    """
+    Détient la version courante du catalogue et la remplace à chaud
+    """
+
+    def __init__(self, models_dir: str):
+        self.models_dir = models_dir
+        self._current: Optional[CatalogSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+        self.last_error: Optional[str] = None
+        self._rejected: set = set()
+
+    @property
+    def current(self) -> CatalogSnapshot:
+        """Version courante (chargée au premier accès)"""
+        snapshot = self._current
+        if snapshot is None:
+            with self._reload_lock:
+                if self._current is None:
+                    self._current = load_snapshot(self.models_dir)
+                snapshot = self._current
+        return snapshot
+
+    def peek(self) -> Optional[CatalogSnapshot]:
+        """Version courante si elle est déjà chargée (n'attend pas, ne charge pas)"""
+        return self._current
+
+    def add_listener(self, listener: Callable[[CatalogSnapshot], None]):
+        """Fonction appelée avec la nouvelle version après chaque bascule"""
+        self._listeners.append(listener)
+
+    def reload(self, version: Optional[str] = None) -> bool:
+        """
+        Charge une version à côté de l'actuelle puis bascule dessus
+
+        Args:
+            version: Version à charger (par défaut, celle désignée par CURRENT)
+
+        Returns:
+            True si la version courante a changé
+        """
+        with self._reload_lock:
+            target = version or current_version(self.models_dir) or LEGACY_VERSION
+            previous = self._current
+            if previous is not None and previous.version == target:
+                return False
+
+            try:
+                snapshot = load_snapshot(self.models_dir, None if target == LEGACY_VERSION else target)
+            except Exception as e:
+                # La version courante reste en service ; la version rejetée est oubliée
+                self.last_error = f"{target}: {e}"
+                self._rejected.add(target)
+                if target != LEGACY_VERSION and (previous is None or previous.version != target):
+                    _evict_version(resolve_artifact_dir(self.models_dir, target))
+                raise
+
+            self._current = snapshot
+            self.last_error = None
+            self._rejected.discard(target)
+
+        if previous is not None and previous.artifact_dir != snapshot.artifact_dir:
+            # Le registre oublie l'ancienne version ; la mémoire est libérée quand
+            # plus aucune recherche en cours ne référence l'ancien snapshot
+            _evict_version(previous.artifact_dir)
+
+        for listener in self._listeners:
+            listener(snapshot)
+        return True
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            # Une version refusée n'est pas retentée automatiquement (reload() explicite possible)
+            if (current_version(self.models_dir) or LEGACY_VERSION) in self._rejected:
+                continue
+            try:
+                self.reload()
+            except Exception:
+                pass  # last_error est renseigné
+
+    def start_watcher(self, interval: float = 30.0):
+        """Surveille le fichier CURRENT et recharge quand il change"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,),
+                                         name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        """Arrête la surveillance"""
+        self._stop.set()
+
+    def status(self) -> Dict:
+        """Version courante, version disponible sur disque et dernière erreur"""
+        snapshot = self._current
+        return {
+            'version': snapshot.version if snapshot else None,
+            'n_products': len(snapshot) if snapshot else 0,
+            'loaded_at': snapshot.loaded_at if snapshot else None,
+            'available_version': current_version(self.models_dir) or LEGACY_VERSION,
+            'watching': self._watcher is not None and self._watcher.is_alive(),
+            'last_error': self.last_error
+        }
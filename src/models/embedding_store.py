@@ -0,0 +1,267 @@
+"""
+Stockage des matrices d'embeddings pré-calculées
+
+Chaque matrice est lue une seule fois depuis son archive .npz, convertie en
+float32 contigu et normalisée L2 au chargement. La similarité cosinus d'une
+requête devient alors un simple produit matrice-vecteur.
+
+En mode projection mémoire, le .npy normalisé est écrit par blocs de lignes
+et les similarités sont calculées par blocs (streaming.py) : la mémoire
+résidente ne dépend pas de la taille du catalogue.
+"""
+
+import os
+import struct
+import tempfile
+import zipfile
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .streaming import RowBlocks, block_rows_for, streaming_scores
+
+
+def l2_normalize(vectors: np.ndarray, axis: int = -1) -> np.ndarray:
+    """
+    Normalise des vecteurs (norme L2 = 1), en float32
+
+    Args:
+        vectors: Vecteur (d,) ou matrice (n, d)
+        axis: Axe de normalisation
+
+    Returns:
+        Copie normalisée ; les vecteurs nuls restent nuls
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=axis, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def list_npz_keys(npz_path: str) -> List[str]:
+    """
+    Liste les matrices d'une archive .npz sans les décompresser
+
+    Returns:
+        Noms des matrices, ou liste vide si le fichier est absent
+    """
+    if not os.path.exists(npz_path):
+        return []
+    with np.load(npz_path, allow_pickle=False) as npz:
+        return list(npz.files)
+
+
+def load_npz(npz_path: str, mmap: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Charge toutes les matrices d'une archive .npz
+
+    Args:
+        npz_path: Chemin de l'archive
+        mmap: Si True, les matrices stockées sans compression (np.savez) sont
+            projetées en mémoire en lecture seule, directement dans l'archive :
+            plusieurs processus partagent la même copie physique. Les matrices
+            compressées, scalaires ou vides sont lues normalement.
+
+    Returns:
+        Dictionnaire {nom: matrice}
+    """
+    if not mmap:
+        with np.load(npz_path, allow_pickle=False) as npz:
+            return {key: npz[key] for key in npz.files}
+
+    arrays = {}
+    with zipfile.ZipFile(npz_path) as archive, open(npz_path, 'rb') as f:
+        for info in archive.infolist():
+            key = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[key] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+            # En-tête local du membre (30 octets + nom + champ extra), puis en-tête .npy
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                           else np.lib.format.read_array_header_2_0)
+            shape, fortran_order, dtype = read_header(f)
+            if dtype.hasobject:
+                raise ValueError(f"{npz_path}: matrice d'objets {key} non supportée")
+            if not shape or 0 in shape:
+                with archive.open(info) as member:
+                    arrays[key] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+            arrays[key] = np.memmap(npz_path, dtype=dtype, mode='r', shape=shape, offset=f.tell(),
+                                    order='F' if fortran_order else 'C')
+    return arrays
+
+
+def sidecar_path(npz_path: str, key: str, sidecar_dir: Optional[str] = None) -> str:
+    """
+    Chemin du fichier .npy non compressé associé à une matrice d'une archive .npz
+
+    Args:
+        npz_path: Archive d'origine
+        key: Nom de la matrice dans l'archive
+        sidecar_dir: Répertoire des fichiers .npy (par défaut, celui de l'archive)
+    """
+    base = os.path.splitext(os.path.basename(npz_path))[0]
+    directory = sidecar_dir or os.path.dirname(npz_path)
+    return os.path.join(directory, f"{base}.{key}.npy")
+
+
+def _write_npy_atomic(path: str, matrix: np.ndarray):
+    """Écrit un .npy via un fichier temporaire pour ne jamais exposer un fichier partiel"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npy.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_normalized_npy(npz_path: str, key: str, npy_path: str, block_memory_mb: float = 64):
+    """
+    Écrit la matrice normalisée d'une archive .npz dans un .npy, bloc de lignes par bloc
+
+    La matrice est lue en flux dans l'archive (compressée ou non) et écrite dans
+    une projection mémoire du fichier temporaire : jamais entièrement en mémoire.
+    Les matrices en ordre Fortran sont chargées d'un bloc.
+    """
+    directory = os.path.dirname(npy_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    with zipfile.ZipFile(npz_path) as archive, archive.open(f"{key}.npy") as member:
+        version = np.lib.format.read_magic(member)
+        read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                       else np.lib.format.read_array_header_2_0)
+        shape, fortran_order, dtype = read_header(member)
+        if fortran_order or len(shape) != 2 or dtype.hasobject:
+            with np.load(npz_path, allow_pickle=False) as npz:
+                _write_npy_atomic(npy_path, np.ascontiguousarray(l2_normalize(npz[key])))
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npy.tmp')
+        os.close(fd)
+        try:
+            output = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=shape)
+            block_rows = block_rows_for(shape[1], block_memory_mb, dtype.itemsize)
+            for start in range(0, shape[0], block_rows):
+                rows = min(block_rows, shape[0] - start)
+                data = member.read(rows * shape[1] * dtype.itemsize)
+                output[start:start + rows] = l2_normalize(np.frombuffer(data, dtype=dtype).reshape(rows, shape[1]))
+            output.flush()
+            del output
+            os.replace(tmp_path, npy_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class EmbeddingStore:
+    """
+    Matrice d'embeddings normalisée, prête pour la recherche par produit scalaire
+    """
+
+    def __init__(self, matrix: np.ndarray, name: str = "", normalized: bool = False,
+                 block_memory_mb: float = 64):
+        """
+        Args:
+            matrix: Matrice (n_produits, dimension)
+            name: Nom de la matrice (ex: "clip_embeddings")
+            normalized: True si les lignes sont déjà en float32 de norme 1
+            block_memory_mb: Taille des blocs lus en flux si la matrice est projetée en mémoire
+        """
+        if matrix.ndim != 2:
+            raise ValueError(f"Matrice d'embeddings 2D attendue, reçu {matrix.shape}")
+
+        if not normalized:
+            matrix = np.ascontiguousarray(l2_normalize(matrix))
+        if matrix.flags.writeable:
+            matrix.setflags(write=False)
+
+        self.name = name
+        self.matrix = matrix
+        self.blocks = RowBlocks(matrix, block_rows_for(matrix.shape[1], block_memory_mb))
+
+    @classmethod
+    def from_npz(cls, npz_path: str, key: str, mmap: bool = False,
+                 sidecar_dir: Optional[str] = None, block_memory_mb: float = 64) -> "EmbeddingStore":
+        """
+        Charge une matrice d'une archive .npz
+
+        Args:
+            npz_path: Chemin de l'archive
+            key: Nom de la matrice
+            mmap: Si True, la matrice normalisée est écrite une fois dans un
+                fichier .npy puis projetée en mémoire : plusieurs processus
+                partagent alors la même copie physique via le cache de pages
+            sidecar_dir: Répertoire des fichiers .npy
+            block_memory_mb: Taille des blocs de lignes (écriture du .npy, similarités en flux)
+
+        Returns:
+            EmbeddingStore prêt à l'emploi
+        """
+        if mmap:
+            npy_path = sidecar_path(npz_path, key, sidecar_dir)
+            is_fresh = (os.path.exists(npy_path)
+                        and os.path.getmtime(npy_path) >= os.path.getmtime(npz_path))
+            if not is_fresh:
+                _write_normalized_npy(npz_path, key, npy_path, block_memory_mb)
+            return cls.from_npy(npy_path, name=key, block_memory_mb=block_memory_mb)
+
+        with np.load(npz_path, allow_pickle=False) as npz:
+            return cls(npz[key], name=key)
+
+    @classmethod
+    def from_npy(cls, npy_path: str, name: str = "", block_memory_mb: float = 64) -> "EmbeddingStore":
+        """
+        Projette en mémoire (lecture seule) un .npy déjà normalisé
+
+        Args:
+            npy_path: Fichier .npy float32 normalisé
+            name: Nom de la matrice
+            block_memory_mb: Taille des blocs lus en flux par similarities()
+        """
+        matrix = np.load(npy_path, mmap_mode='r')
+        if matrix.dtype != np.float32:
+            raise ValueError(f"{npy_path}: float32 attendu, reçu {matrix.dtype}")
+        return cls(matrix, name=name or os.path.basename(npy_path), normalized=True,
+                   block_memory_mb=block_memory_mb)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        """Dimension des embeddings"""
+        return self.matrix.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Taille de la matrice en octets"""
+        return self.matrix.nbytes
+
+    def similarities(self, query: np.ndarray) -> np.ndarray:
+        """
+        Similarités cosinus entre une requête et tous les produits
+
+        Args:
+            query: Embedding de la requête (d,), normalisé ou non
+
+        Returns:
+            Tableau (n_produits,) de similarités
+        """
+        query = l2_normalize(np.ravel(query))
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Dimension de requête {query.shape[0]} != {self.dim} ({self.name})")
+        if self.blocks.streamed:
+            # Matrice projetée : lecture par blocs, pages rendues au noyau après chaque bloc
+            return streaming_scores(self.blocks, query[None, :])[0]
+        return self.matrix @ query
@@ -0,0 +1,264 @@
+"""
+Filtres de recherche par catégorie et par prix
+
+Les lignes de chaque catégorie et l'ordre des prix sont calculés au chargement
+d'une version du catalogue. Une recherche filtrée ne calcule les similarités
+que sur les lignes retenues et retourne donc toujours un top-k complet
+(au lieu de filtrer après coup un top-k global). Optionnellement, chaque
+catégorie dispose de sa propre sous-matrice contiguë par famille d'embeddings.
+Les lignes retenues d'une matrice projetée en mémoire sont lues bloc par bloc
+(pages rendues au noyau après chaque bloc), sans copie résidente.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embedding_store import l2_normalize
+from .ranking import top_k_indices, top_k_indices_batch
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """Critères de filtrage d'une recherche (None = pas de contrainte)"""
+    categories: Optional[Tuple[str, ...]] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+    @classmethod
+    def create(cls, categories: Optional[Sequence[str]] = None, min_price: Optional[float] = None,
+               max_price: Optional[float] = None) -> Optional["SearchFilter"]:
+        """
+        Construit un filtre normalisé
+
+        Returns:
+            SearchFilter, ou None si aucun critère n'est donné
+        """
+        categories = tuple(sorted(set(categories))) if categories else None
+        if categories is None and min_price is None and max_price is None:
+            return None
+        return cls(categories,
+                   float(min_price) if min_price is not None else None,
+                   float(max_price) if max_price is not None else None)
+
+    @property
+    def has_price(self) -> bool:
+        return self.min_price is not None or self.max_price is not None
+
+    def key(self) -> tuple:
+        """Clé de cache"""
+        return (self.categories, self.min_price, self.max_price)
+
+
+class FilterIndex:
+    """
+    Lignes précalculées par catégorie et par prix pour une version du catalogue
+    """
+
+    def __init__(self, products, category_subindexes: Optional[bool] = None):
+        """
+        Args:
+            products: ProductStore de la version
+            category_subindexes: Construire une sous-matrice contiguë par
+                catégorie et par famille d'embeddings (mémoire ≈ une copie de
+                chaque matrice, similarités sans copie par requête) ; None :
+                seulement pour les matrices qui ne sont pas projetées en mémoire
+        """
+        self.n_products = len(products)
+        self.category_subindexes = category_subindexes
+
+        self.category_rows: Dict[str, np.ndarray] = {}
+        if products.category_codes is not None:
+            codes = products.category_codes
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(products.categories) + 1))
+            for code, label in enumerate(products.categories):
+                rows = order[bounds[code]:bounds[code + 1]]
+                if len(rows):
+                    self.category_rows[label] = rows
+
+        # Produits triés par prix (les prix manquants, NaN, sont en fin et jamais retenus)
+        self.prices = products.prices
+        if self.prices is not None:
+            self.price_order = np.argsort(self.prices, kind='stable')
+            self.sorted_prices = self.prices[self.price_order]
+        else:
+            self.price_order = self.sorted_prices = None
+
+        self._submatrices: Dict[Tuple[str, str], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def categories(self):
+        """Catégories disponibles"""
+        return sorted(self.category_rows)
+
+    @property
+    def price_range(self) -> Optional[Tuple[float, float]]:
+        """Prix minimal et maximal du catalogue"""
+        if self.sorted_prices is None:
+            return None
+        known = self.sorted_prices[~np.isnan(self.sorted_prices)]
+        return (float(known[0]), float(known[-1])) if len(known) else None
+
+    def _price_mask(self, rows: np.ndarray, search_filter: SearchFilter) -> np.ndarray:
+        prices = self.prices[rows]
+        mask = ~np.isnan(prices)
+        if search_filter.min_price is not None:
+            mask &= prices >= search_filter.min_price
+        if search_filter.max_price is not None:
+            mask &= prices <= search_filter.max_price
+        return mask
+
+    def _price_rows(self, search_filter: SearchFilter) -> np.ndarray:
+        """Lignes dans la fourchette de prix (deux recherches dichotomiques)"""
+        known = len(self.sorted_prices) - int(np.isnan(self.sorted_prices).sum())
+        start = 0 if search_filter.min_price is None else \
+            int(np.searchsorted(self.sorted_prices[:known], search_filter.min_price, side='left'))
+        end = known if search_filter.max_price is None else \
+            int(np.searchsorted(self.sorted_prices[:known], search_filter.max_price, side='right'))
+        return np.sort(self.price_order[start:max(start, end)])
+
+    def rows(self, search_filter: Optional[SearchFilter]) -> Optional[np.ndarray]:
+        """
+        Lignes du catalogue satisfaisant le filtre
+
+        Returns:
+            Indices triés, ou None si le filtre ne contraint rien
+        """
+        if search_filter is None:
+            return None
+        if search_filter.has_price and self.prices is None:
+            raise ValueError("Filtre de prix indisponible : prix non numériques dans le dataset")
+        if search_filter.categories is None:
+            return self._price_rows(search_filter) if search_filter.has_price else None
+
+        parts = [self.category_rows.get(category, np.empty(0, dtype=np.int64))
+                 for category in search_filter.categories]
+        # Catégorie répétée : chaque produit une seule fois
+        rows = np.unique(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+        if search_filter.has_price:
+            rows = rows[self._price_mask(rows, search_filter)]
+        return rows
+
+    def _submatrix(self, store, category: str) -> np.ndarray:
+        """Sous-matrice contiguë d'une catégorie (construite au premier usage par famille)"""
+        key = (store.name, category)
+        matrix = self._submatrices.get(key)
+        if matrix is None:
+            with self._lock:
+                matrix = self._submatrices.get(key)
+                if matrix is None:
+                    matrix = np.ascontiguousarray(store.matrix[self.category_rows[category]])
+                    matrix.setflags(write=False)
+                    self._submatrices[key] = matrix
+        return matrix
+
+    def uses_subindexes(self, store) -> bool:
+        """Sous-matrices par catégorie pour cette famille (jamais de copie d'une matrice projetée par défaut)"""
+        if self.category_subindexes is None:
+            return not store.blocks.streamed
+        return self.category_subindexes
+
+    def prebuild(self, stores: Sequence):
+        """Construit les sous-matrices de toutes les catégories pour les familles données"""
+        for store in stores:
+            if store is not None and self.uses_subindexes(store):
+                for category in self.category_rows:
+                    self._submatrix(store, category)
+
+    @staticmethod
+    def _streamed_scores(store, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Similarités avec des lignes triées d'une matrice projetée, bloc de lignes par bloc
+
+        Seules les pages des lignes retenues sont lues, puis rendues au noyau :
+        la mémoire résidente reste bornée par la taille d'un bloc.
+        """
+        blocks = store.blocks
+        scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+        bounds = np.searchsorted(rows, np.arange(0, len(blocks) + blocks.block_rows, blocks.block_rows))
+        for block, (start, end) in enumerate(blocks.ranges()):
+            first, last = bounds[block], bounds[block + 1]
+            if first == last:
+                continue
+            scores[:, first:last] = queries @ blocks.read(start, end)[rows[first:last] - start].T
+            blocks.release(start, end)
+        return scores
+
+    def candidate_scores(self, store, queries: np.ndarray,
+                         search_filter: SearchFilter) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Similarités des requêtes avec les seules lignes retenues par le filtre
+
+        Args:
+            store: EmbeddingStore interrogé
+            queries: Requête (d,) ou matrice de requêtes (q, d)
+            search_filter: Filtre à appliquer
+
+        Returns:
+            Tuple (lignes retenues (m,), scores (m,) ou (q, m)) ; les lignes sont
+            toujours triées, quel que soit le chemin : les scores de plusieurs
+            familles pour un même filtre sont alignés position par position
+        """
+        single = np.ndim(queries) == 1
+        queries = l2_normalize(np.atleast_2d(queries))
+
+        if search_filter.categories is not None and self.uses_subindexes(store):
+            # Une sous-matrice contiguë par catégorie : pas de copie de lignes par requête
+            rows_parts, score_parts = [], []
+            for category in dict.fromkeys(search_filter.categories):
+                if category not in self.category_rows:
+                    continue
+                rows = self.category_rows[category]
+                scores = queries @ self._submatrix(store, category).T
+                if search_filter.has_price:
+                    mask = self._price_mask(rows, search_filter)
+                    rows, scores = rows[mask], scores[:, mask]
+                rows_parts.append(rows)
+                score_parts.append(scores)
+            if len(rows_parts) > 1:
+                # Même ordre (trié) que rows() : une permutation pour les lignes et les scores
+                rows = np.concatenate(rows_parts)
+                order = np.argsort(rows, kind='stable')
+                rows, scores = rows[order], np.concatenate(score_parts, axis=1)[:, order]
+            elif rows_parts:
+                rows, scores = rows_parts[0], score_parts[0]
+            else:
+                rows = np.empty(0, dtype=np.int64)
+                scores = np.empty((len(queries), 0), dtype=np.float32)
+        else:
+            rows = self.rows(search_filter)
+            if rows is None:
+                rows = np.arange(self.n_products)
+            if store.blocks.streamed:
+                scores = self._streamed_scores(store, queries, rows)
+            else:
+                scores = queries @ store.matrix[rows].T
+
+        return rows, (scores[0] if single else scores)
+
+    def search(self, store, query: np.ndarray, search_filter: SearchFilter,
+               top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k exact restreint aux lignes du filtre
+
+        Returns:
+            Tuple (indices produits, scores) triés par score décroissant
+        """
+        rows, scores = self.candidate_scores(store, query, search_filter)
+        selected = top_k_indices(scores, top_k)
+        return rows[selected], scores[selected]
+
+    def search_batch(self, store, queries: np.ndarray, search_filter: SearchFilter, top_k: int):
+        """
+        Version par lot de search
+
+        Returns:
+            Liste de tuples (indices produits, scores), un par requête
+        """
+        rows, scores = self.candidate_scores(store, queries, search_filter)
+        selected = top_k_indices_batch(scores, top_k)
+        return [(rows[sel], row_scores[sel]) for sel, row_scores in zip(selected, scores)]
@@ -0,0 +1,230 @@
+"""
+Fusion des scores de plusieurs modalités (image, texte, backends visuels)
+
+Les similarités cosinus de deux espaces d'embeddings (CLIP 512-d, mpnet 768-d)
+n'ont pas la même distribution : additionnées telles quelles, un même poids
+n'a pas le même effet selon la requête. Chaque modalité est donc normalisée
+avant la somme pondérée ("zscore", "minmax"), ou remplacée par son rang
+(fusion par rangs réciproques, "rrf"). "weighted" conserve la somme brute.
+
+Fusion sur ensemble de candidats : les top-N de chaque modalité (via son index,
+ou le filtre) forment l'ensemble candidat ; seuls ces produits sont rescorés
+exactement dans chaque modalité, normalisés sur cet ensemble puis fusionnés.
+Le coût reste proche d'une recherche mono-modale au lieu de classer tout le
+catalogue pour chaque modalité.
+"""
+
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import FUSION_CONFIG
+from .embedding_store import l2_normalize
+from .filters import FilterIndex, SearchFilter
+from .metrics import span
+from .ranking import fuse_scores, top_k_indices, top_k_indices_batch
+
+FUSION_STRATEGIES = ("weighted", "zscore", "minmax", "rrf")
+
+
+def normalize_scores(scores: np.ndarray, method: str) -> np.ndarray:
+    """
+    Normalise des scores le long du dernier axe (ensemble candidat ou catalogue)
+
+    Des scores constants ne portent aucune information de classement : ils
+    reçoivent la valeur neutre (0 en z-score, 0.5 en min-max).
+
+    Args:
+        scores: Tableau (m,) ou (q, m)
+        method: "zscore", "minmax", ou "weighted" (scores inchangés)
+
+    Returns:
+        Scores normalisés float32, de même forme
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    if method == "weighted" or scores.shape[-1] == 0:
+        return scores
+    if method == "zscore":
+        centered = scores - scores.mean(axis=-1, keepdims=True)
+        std = centered.std(axis=-1, keepdims=True)
+        return np.divide(centered, std, out=np.zeros_like(centered), where=std > 0)
+    if method == "minmax":
+        low = scores.min(axis=-1, keepdims=True)
+        spread = scores.max(axis=-1, keepdims=True) - low
+        return np.divide(scores - low, spread, out=np.full_like(scores, 0.5), where=spread > 0)
+    raise ValueError(f"Normalisation inconnue: {method}")
+
+
+def reciprocal_ranks(scores: np.ndarray, k: int = 60) -> np.ndarray:
+    """
+    Scores de rang réciproque 1 / (k + rang), rang 1 = meilleur score (dernier axe)
+
+    Args:
+        scores: Tableau (m,) ou (q, m)
+        k: Constante de lissage (60 dans la formulation d'origine)
+    """
+    order = np.argsort(-scores, axis=-1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, scores.shape[-1] + 1), axis=-1)
+    return (1.0 / (k + ranks)).astype(np.float32)
+
+
+@dataclass(frozen=True)
+class Modality:
+    """Une modalité fusionnée : embeddings (EmbeddingStore), index (VectorIndex) et poids"""
+    store: Any
+    index: Any
+    weight: float
+
+
+@dataclass(frozen=True)
+class ScoreFusion:
+    """Stratégie de fusion des scores de plusieurs modalités"""
+    strategy: str = "minmax"
+    candidates: int = 200
+    rrf_k: int = 60
+
+    @classmethod
+    def create(cls, strategy: Optional[str] = None, candidates: Optional[int] = None) -> "ScoreFusion":
+        """
+        Stratégie de FUSION_CONFIG, éventuellement remplacée
+
+        Args:
+            strategy: "weighted", "zscore", "minmax" ou "rrf" (défaut: FUSION_CONFIG["strategy"])
+            candidates: Candidats par modalité (0 = tout le catalogue ; défaut: FUSION_CONFIG)
+
+        Raises:
+            ValueError: stratégie inconnue
+        """
+        strategy = strategy or FUSION_CONFIG["strategy"]
+        if strategy not in FUSION_STRATEGIES:
+            raise ValueError(f"Stratégie de fusion inconnue: {strategy} (disponibles: {list(FUSION_STRATEGIES)})")
+        candidates = FUSION_CONFIG["candidates"] if candidates is None else candidates
+        return cls(strategy, max(0, int(candidates)), FUSION_CONFIG["rrf_k"])
+
+    def key(self) -> tuple:
+        """Clé de cache"""
+        return (self.strategy, self.candidates, self.rrf_k if self.strategy == "rrf" else None)
+
+    def fuse(self, score_arrays: Sequence[np.ndarray], weights: Sequence[float]) -> np.ndarray:
+        """
+        Fusionne des scores alignés (mêmes produits), un tableau (m,) ou (q, m) par modalité
+
+        Returns:
+            Scores fusionnés float32, de même forme
+        """
+        if self.strategy == "rrf":
+            parts = [reciprocal_ranks(scores, self.rrf_k) for scores in score_arrays]
+        else:
+            parts = [normalize_scores(scores, self.strategy) for scores in score_arrays]
+        return fuse_scores(parts, weights)
+
+    def _candidate_rows(self, modalities: Sequence[Modality], queries: Sequence[np.ndarray], top_k: int,
+                        filter_index: Optional[FilterIndex], search_filter: Optional[SearchFilter]) -> np.ndarray:
+        """Union triée des top-N de chaque modalité pour une requête"""
+        top_n = max(self.candidates, top_k)
+        parts = []
+        with span('fusion_candidates'):
+            for modality, query in zip(modalities, queries):
+                if search_filter is not None:
+                    rows, _ = filter_index.search(modality.store, query, search_filter, top_n)
+                else:
+                    rows, _ = modality.index.search(query, top_n)
+                parts.append(np.asarray(rows, dtype=np.int64))
+        rows = np.unique(np.concatenate(parts))
+        return rows[rows >= 0]
+
+    def _rank_rows(self, modalities: Sequence[Modality], queries: Sequence[np.ndarray], rows: np.ndarray,
+                   top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rescore exact des lignes candidates dans chaque modalité, fusion puis top-k"""
+        with span('fusion_rescore'):
+            parts = [modality.store.matrix[rows] @ l2_normalize(np.ravel(query))
+                     for modality, query in zip(modalities, queries)]
+            fused = self.fuse(parts, [modality.weight for modality in modalities])
+            selected = top_k_indices(fused, top_k)
+            return rows[selected], fused[selected]
+
+    def search(self, modalities: Sequence[Modality], queries: Sequence[np.ndarray], top_k: int,
+               filter_index: Optional[FilterIndex] = None,
+               search_filter: Optional[SearchFilter] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k fusionné pour une requête (un embedding par modalité)
+
+        Args:
+            modalities: Modalités à fusionner
+            queries: Embedding (d,) de la requête dans chaque modalité
+            top_k: Nombre de produits à retourner
+            filter_index: Filtres de la version du catalogue (si search_filter est donné)
+            search_filter: Catégories / fourchette de prix
+
+        Returns:
+            Tuple (indices produits, scores fusionnés) triés par score décroissant
+        """
+        if self.candidates > 0:
+            rows = self._candidate_rows(modalities, queries, top_k, filter_index, search_filter)
+            return self._rank_rows(modalities, queries, rows, top_k)
+
+        # Tout le catalogue (ou toutes les lignes du filtre) dans chaque modalité
+        rows, parts = None, []
+        with span('similarity'):
+            for modality, query in zip(modalities, queries):
+                if search_filter is not None:
+                    rows, scores = filter_index.candidate_scores(modality.store, query, search_filter)
+                else:
+                    scores = modality.store.similarities(query)
+                parts.append(scores)
+            fused = self.fuse(parts, [modality.weight for modality in modalities])
+        with span('top_k'):
+            selected = top_k_indices(fused, top_k)
+            return (rows[selected] if rows is not None else selected), fused[selected]
+
+    def search_batch(self, modalities: Sequence[Modality], queries: Sequence[np.ndarray], top_k: int,
+                     filter_index: Optional[FilterIndex] = None, search_filter: Optional[SearchFilter] = None,
+                     block_size: int = 256) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Version par lot de search
+
+        Args:
+            queries: Matrice (q, d) de requêtes de chaque modalité (mêmes lignes)
+            block_size: Requêtes par bloc sans ensemble candidat (borne la matrice de scores)
+
+        Returns:
+            Un tuple (indices produits, scores fusionnés) par requête
+        """
+        queries = [l2_normalize(np.atleast_2d(query)) for query in queries]
+        n_queries = queries[0].shape[0]
+        weights = [modality.weight for modality in modalities]
+
+        if self.candidates > 0:
+            top_n = max(self.candidates, top_k)
+            candidates = []
+            with span('fusion_candidates'):
+                for modality, query in zip(modalities, queries):
+                    if search_filter is not None:
+                        candidates.append(filter_index.search_batch(modality.store, query, search_filter, top_n))
+                    else:
+                        candidates.append(modality.index.search_batch(query, top_n))
+            results = []
+            for i in range(n_queries):
+                rows = np.unique(np.concatenate([np.asarray(found[i][0], dtype=np.int64) for found in candidates]))
+                results.append(self._rank_rows(modalities, [query[i] for query in queries], rows[rows >= 0], top_k))
+            return results
+
+        results = []
+        for start in range(0, n_queries, block_size):
+            block = slice(start, start + block_size)
+            rows, parts = None, []
+            with span('similarity'):
+                for modality, query in zip(modalities, queries):
+                    if search_filter is not None:
+                        rows, scores = filter_index.candidate_scores(modality.store, query[block], search_filter)
+                    else:
+                        scores = query[block] @ modality.store.matrix.T
+                    parts.append(scores)
+                fused = self.fuse(parts, weights)
+            with span('top_k'):
+                selected = top_k_indices_batch(fused, top_k)
+                results.extend(((sel if rows is None else rows[sel]), row_scores[sel])
+                               for sel, row_scores in zip(selected, fused))
+        return results
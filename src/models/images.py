@@ -0,0 +1,149 @@
+"""
+Décodage et préprocessing des images de requête
+
+Chaque image envoyée est décodée une seule fois : décodage JPEG à résolution
+réduite (draft) quand l'image est bien plus grande que l'entrée de CLIP,
+orientation EXIF appliquée, transparence aplatie sur fond blanc. Le résultat
+(QueryImage) porte son empreinte, son aperçu et son tenseur préprocessé,
+réutilisés par l'aperçu, la recherche par image et la recherche combinée.
+"""
+
+import threading
+from io import BytesIO
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple, Union
+
+from PIL import Image, ImageOps
+
+from ..core.config import IMAGE_CONFIG
+from .cache import image_digest
+from .metrics import span
+
+
+def prepare_image(image: Image.Image, min_side: Optional[int] = None) -> Image.Image:
+    """
+    Réduit une image décodée et la convertit en RGB
+
+    La réduction (facteur entier) garde un petit côté >= min_side ; les
+    images avec transparence sont posées sur fond blanc.
+
+    Args:
+        image: Image PIL chargée
+        min_side: Petit côté minimal conservé (défaut: IMAGE_CONFIG["decode_min_side"])
+
+    Returns:
+        Image RGB (l'image d'origine si elle est déjà RGB et assez petite)
+    """
+    min_side = min_side or IMAGE_CONFIG["decode_min_side"]
+    if image.mode in ('LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+
+    factor = min(image.size) // min_side
+    if factor >= 2:
+        image = image.reduce(factor)
+
+    if image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image
+
+
+def decode_image(data: Union[bytes, BinaryIO], min_side: Optional[int] = None) -> Image.Image:
+    """
+    Décode une image encodée (JPEG, PNG...) en RGB à la résolution utile
+
+    Args:
+        data: Contenu encodé (octets ou fichier)
+        min_side: Petit côté minimal conservé (défaut: IMAGE_CONFIG["decode_min_side"])
+
+    Returns:
+        Image PIL RGB
+    """
+    min_side = min_side or IMAGE_CONFIG["decode_min_side"]
+    with span('decode_image'):
+        image = Image.open(BytesIO(data) if isinstance(data, (bytes, bytearray)) else data)
+        # JPEG : décodage direct à 1/2, 1/4 ou 1/8 de la résolution, les deux côtés restant >= min_side
+        image.draft('RGB', (min_side, min_side))
+        # Orientation EXIF appliquée sur place (pas de copie)
+        ImageOps.exif_transpose(image, in_place=True)
+        image.load()  # erreurs de décodage levées ici
+        return prepare_image(image, min_side)
+
+
+class QueryImage:
+    """
+    Image de requête décodée une fois, avec empreinte, aperçu et tenseurs mis en cache
+    """
+
+    def __init__(self, image: Image.Image, digest: Optional[str] = None):
+        """
+        Args:
+            image: Image RGB préparée (prepare_image / decode_image)
+            digest: Empreinte si déjà calculée
+        """
+        self.image = image
+        self._digest = digest
+        self._previews: Dict[int, Image.Image] = {}
+        self._tensors: Dict[int, Tuple[Callable, Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, BinaryIO]) -> "QueryImage":
+        """Décode une image envoyée"""
+        return cls(decode_image(data))
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.size
+
+    @property
+    def digest(self) -> str:
+        """Empreinte du contenu (clé des caches d'embeddings et de résultats)"""
+        if self._digest is None:
+            self._digest = image_digest(self.image)
+        return self._digest
+
+    def preview(self, size: Optional[int] = None) -> Image.Image:
+        """Aperçu réduit pour l'affichage (côté maximal size, défaut: IMAGE_CONFIG["preview_size"])"""
+        size = size or IMAGE_CONFIG["preview_size"]
+        with self._lock:
+            preview = self._previews.get(size)
+            if preview is None:
+                preview = self.image.copy()
+                preview.thumbnail((size, size))
+                self._previews[size] = preview
+        return preview
+
+    def tensor(self, preprocess: Callable):
+        """
+        Image préprocessée pour un modèle (calculée une fois par fonction de préprocessing)
+
+        Args:
+            preprocess: Préprocessing du modèle (ex: celui de CLIP)
+        """
+        with self._lock:
+            cached = self._tensors.get(id(preprocess))
+            # La fonction est conservée avec le tenseur : son id ne peut pas être réutilisé
+            if cached is None or cached[0] is not preprocess:
+                with span('preprocess'):
+                    cached = (preprocess, preprocess(self.image))
+                self._tensors[id(preprocess)] = cached
+        return cached[1]
+
+
+# Image acceptée par les méthodes de recherche
+ImageInput = Union[Image.Image, QueryImage]
+
+
+def as_query_image(image: ImageInput) -> QueryImage:
+    """
+    QueryImage d'une image déjà décodée (retournée telle quelle si c'en est déjà une)
+
+    L'orientation EXIF n'est appliquée qu'au décodage (decode_image) : une image
+    PIL fournie par l'appelant est supposée déjà orientée.
+    """
+    if isinstance(image, QueryImage):
+        return image
+    return QueryImage(prepare_image(image))
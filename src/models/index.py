@@ -0,0 +1,720 @@
+"""
+Index de recherche des plus proches voisins
+
+Backends disponibles :
+- "flat" : recherche exacte (produit scalaire sur toute la matrice)
+- "stream" : recherche exacte par blocs de lignes d'une matrice projetée en
+  mémoire, top-k courant, blocs répartis sur des threads (streaming.py)
+- "ivf"  : index à listes inversées (k-means sphérique en NumPy), approximatif
+- "hnsw" : graphe HNSW via la bibliothèque optionnelle hnswlib, approximatif
+- "fp16", "int8", "pq", "pca" : parcours des codes compacts (quantization.py)
+  puis re-classement d'une liste courte en pleine précision, approximatif
+
+Tous les index travaillent sur des embeddings normalisés L2 : le score
+retourné est la similarité cosinus.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .embedding_store import l2_normalize, load_npz
+from .quantization import CODECS, create_codec
+from .ranking import top_k_indices, top_k_indices_batch
+from .streaming import RowBlocks, block_rows_for, streaming_top_k
+
+# Taille du tampon float32 des codes décodés (QuantizedIndex) : tient dans le cache L2
+DECODE_BLOCK_BYTES = 1024 ** 2
+
+
+class VectorIndex:
+    """Interface commune des index"""
+
+    kind = "base"
+    # Paramètres de requête, modifiables sans reconstruire un index sauvegardé
+    query_params: Tuple[str, ...] = ()
+
+    def __init__(self, matrix: np.ndarray):
+        """
+        Args:
+            matrix: Matrice (n, d) float32 normalisée (partagée, non copiée)
+        """
+        self.matrix = matrix
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def build(self) -> "VectorIndex":
+        """Construit les structures de l'index"""
+        return self
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Recherche les top_k plus proches voisins d'une requête
+
+        Args:
+            query: Embedding (d,) de la requête
+            top_k: Nombre de voisins
+
+        Returns:
+            Tuple (indices, scores) triés par score décroissant
+        """
+        raise NotImplementedError
+
+    def search_batch(self, queries: np.ndarray, top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Recherche pour un lot de requêtes
+
+        Args:
+            queries: Matrice (q, d) de requêtes
+            top_k: Nombre de voisins par requête
+
+        Returns:
+            Un tuple (indices, scores) par requête
+        """
+        return [self.search(query, top_k) for query in queries]
+
+    def save(self, path: str):
+        """Sauvegarde l'index sur disque"""
+        raise NotImplementedError
+
+    def params(self) -> Dict:
+        """Paramètres de l'index (pour les rapports)"""
+        return {}
+
+
+class FlatIndex(VectorIndex):
+    """Recherche exacte par force brute"""
+
+    kind = "flat"
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.matrix @ l2_normalize(np.ravel(query))
+        indices = top_k_indices(scores, top_k)
+        return indices, scores[indices]
+
+    def search_batch(self, queries: np.ndarray, top_k: int,
+                     block_size: int = 256) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Recherche exacte par lot : un produit matrice-matrice par bloc de requêtes
+
+        Args:
+            queries: Matrice (q, d) de requêtes
+            top_k: Nombre de voisins par requête
+            block_size: Requêtes par bloc (borne la matrice de scores à block_size x n)
+        """
+        queries = l2_normalize(np.atleast_2d(queries))
+        results = []
+        for start in range(0, queries.shape[0], block_size):
+            scores = queries[start:start + block_size] @ self.matrix.T
+            indices = top_k_indices_batch(scores, top_k)
+            top_scores = np.take_along_axis(scores, indices, axis=1)
+            results.extend(zip(indices, top_scores))
+        return results
+
+    def save(self, path: str):
+        # Rien à sauvegarder : la matrice suffit
+        pass
+
+
+class StreamingIndex(VectorIndex):
+    """
+    Recherche exacte en flux pour les catalogues plus grands que la mémoire
+
+    La matrice (idéalement projetée en mémoire, EMBEDDINGS_MMAP=1) est lue par
+    blocs de block_memory_mb ; chaque bloc donne son top-k, fusionné dans un
+    top-k courant. Avec plusieurs threads, au plus `workers` blocs sont lus en
+    même temps : la mémoire résidente est bornée par workers x block_memory_mb.
+    """
+
+    kind = "stream"
+
+    def __init__(self, matrix: np.ndarray, block_memory_mb: float = 64, workers: Optional[int] = None):
+        """
+        Args:
+            matrix: Matrice (n, d) float32 normalisée
+            block_memory_mb: Taille d'un bloc de lignes
+            workers: Threads de parcours (None = nombre de cœurs, 1 = séquentiel)
+        """
+        super().__init__(matrix)
+        self.block_memory_mb = block_memory_mb
+        self.workers = workers or os.cpu_count() or 1
+        self.blocks = RowBlocks(matrix, block_rows_for(matrix.shape[1], block_memory_mb))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self) -> Optional[ThreadPoolExecutor]:
+        """Pool de threads partagé par les recherches (créé au premier usage)"""
+        if self.workers <= 1:
+            return None
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stream-index")
+        return self._executor
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        indices, scores = streaming_top_k(self.blocks, l2_normalize(np.ravel(query))[None, :], top_k,
+                                          executor=self._pool(), max_in_flight=self.workers)
+        return indices[0], scores[0]
+
+    def search_batch(self, queries: np.ndarray, top_k: int,
+                     block_size: int = 256) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Recherche par lot : chaque bloc de la matrice est lu une fois par bloc de requêtes
+
+        Args:
+            queries: Matrice (q, d) de requêtes
+            top_k: Nombre de voisins par requête
+            block_size: Requêtes par parcours de la matrice
+        """
+        queries = l2_normalize(np.atleast_2d(queries))
+        results = []
+        for start in range(0, queries.shape[0], block_size):
+            indices, scores = streaming_top_k(self.blocks, queries[start:start + block_size], top_k,
+                                              executor=self._pool(), max_in_flight=self.workers)
+            results.extend(zip(indices, scores))
+        return results
+
+    def save(self, path: str):
+        # Rien à sauvegarder : la matrice suffit
+        pass
+
+    def params(self) -> Dict:
+        return {'block_memory_mb': self.block_memory_mb, 'workers': self.workers,
+                'block_rows': self.blocks.block_rows, 'streamed': self.blocks.streamed}
+
+
+class IVFIndex(VectorIndex):
+    """
+    Index à listes inversées (IVF)
+
+    Les produits sont répartis en nlist groupes par k-means sphérique ; une
+    requête ne parcourt que les nprobe groupes dont le centroïde est le plus
+    proche. nprobe règle le compromis rappel / latence.
+    """
+
+    kind = "ivf"
+    query_params = ('nprobe',)
+
+    def __init__(self, matrix: np.ndarray, nlist: Optional[int] = None, nprobe: int = 8,
+                 train_iters: int = 10, train_sample: int = 50000, seed: int = 0):
+        """
+        Args:
+            matrix: Matrice (n, d) float32 normalisée
+            nlist: Nombre de groupes (par défaut 4 * sqrt(n))
+            nprobe: Nombre de groupes parcourus par requête
+            train_iters: Itérations du k-means
+            train_sample: Nombre maximal de vecteurs utilisés pour l'entraînement
+            seed: Graine aléatoire
+        """
+        super().__init__(matrix)
+        n = matrix.shape[0]
+        self.nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.train_sample = train_sample
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.list_ids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+        """Groupe le plus proche de chaque vecteur, calculé par blocs"""
+        assignments = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], block_rows):
+            block = vectors[start:start + block_rows]
+            assignments[start:start + block_rows] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def _train(self, sample: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """k-means sphérique sur un échantillon"""
+        centroids = sample[rng.choice(sample.shape[0], self.nlist, replace=False)].copy()
+
+        for _ in range(self.train_iters):
+            assignments = self._assign(sample, centroids)
+            order = np.argsort(assignments, kind='stable')
+            counts = np.bincount(assignments, minlength=self.nlist)
+            non_empty = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[non_empty]
+
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            centroids[non_empty] = sums
+
+            # Réinitialiser les groupes vides sur des vecteurs aléatoires
+            empty = np.flatnonzero(counts == 0)
+            if empty.size:
+                centroids[empty] = sample[rng.choice(sample.shape[0], empty.size, replace=False)]
+
+            centroids = l2_normalize(centroids)
+
+        return centroids
+
+    def build(self) -> "IVFIndex":
+        rng = np.random.default_rng(self.seed)
+        n = self.matrix.shape[0]
+
+        if n > self.train_sample:
+            sample = np.asarray(self.matrix[np.sort(rng.choice(n, self.train_sample, replace=False))])
+        else:
+            sample = np.asarray(self.matrix)
+
+        self.centroids = np.ascontiguousarray(self._train(sample, rng), dtype=np.float32)
+
+        assignments = self._assign(self.matrix, self.centroids)
+        self.list_ids = np.argsort(assignments, kind='stable').astype(np.int32)
+        counts = np.bincount(assignments, minlength=self.nlist)
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        return self
+
+    def search(self, query: np.ndarray, top_k: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self.centroids is None:
+            raise ValueError("Index IVF non construit")
+
+        query = l2_normalize(np.ravel(query))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        probed = top_k_indices(self.centroids @ query, nprobe)
+        candidates = np.concatenate([
+            self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probed
+        ])
+        if candidates.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        candidates.sort()  # accès mémoire croissant dans la matrice
+        scores = self.matrix[candidates] @ query
+        best = top_k_indices(scores, top_k)
+        return candidates[best].astype(np.int64), scores[best]
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            centroids=self.centroids,
+            list_ids=self.list_ids,
+            list_offsets=self.list_offsets,
+            meta=np.array(json.dumps({'kind': self.kind, 'n': len(self), 'dim': self.dim, **self.params()}))
+        )
+
+    @classmethod
+    def load(cls, path: str, matrix: np.ndarray, nprobe: Optional[int] = None, mmap: bool = False) -> "IVFIndex":
+        data = load_npz(path, mmap)
+        meta = json.loads(str(data['meta']))
+        _check_shape(meta, matrix, path)
+        index = cls(matrix, nlist=meta['nlist'], nprobe=nprobe or meta['nprobe'],
+                    train_iters=meta['train_iters'], train_sample=meta['train_sample'],
+                    seed=meta['seed'])
+        index.centroids = data['centroids']
+        index.list_ids = data['list_ids']
+        index.list_offsets = data['list_offsets']
+        return index
+
+    def params(self) -> Dict:
+        return {
+            'nlist': self.nlist,
+            'nprobe': self.nprobe,
+            'train_iters': self.train_iters,
+            'train_sample': self.train_sample,
+            'seed': self.seed
+        }
+
+
+class HNSWIndex(VectorIndex):
+    """
+    Graphe HNSW (bibliothèque optionnelle hnswlib)
+
+    ef_search règle le compromis rappel / latence à la requête ; M et
+    ef_construction règlent la qualité du graphe à la construction.
+    """
+
+    kind = "hnsw"
+    query_params = ('ef_search',)
+
+    def __init__(self, matrix: np.ndarray, M: int = 32, ef_construction: int = 200,
+                 ef_search: int = 64, num_threads: int = -1):
+        super().__init__(matrix)
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.num_threads = num_threads
+        self._index = None
+
+    @staticmethod
+    def _hnswlib():
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("Le backend 'hnsw' nécessite hnswlib (pip install hnswlib)") from e
+        return hnswlib
+
+    def build(self) -> "HNSWIndex":
+        hnswlib = self._hnswlib()
+        self._index = hnswlib.Index(space='ip', dim=self.dim)
+        self._index.init_index(max_elements=len(self), ef_construction=self.ef_construction, M=self.M)
+        self._index.add_items(np.asarray(self.matrix), np.arange(len(self)), num_threads=self.num_threads)
+        self._index.set_ef(self.ef_search)
+        return self
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._index is None:
+            raise ValueError("Index HNSW non construit")
+
+        top_k = min(top_k, len(self))
+        if top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # ef est fixé une fois (build / load) : l'index est partagé entre threads et
+        # hnswlib explore déjà max(ef, k) candidats quand top_k dépasse ef_search
+        labels, distances = self._index.knn_query(l2_normalize(np.ravel(query)), k=top_k)
+        # Espace 'ip' : distance = 1 - produit scalaire
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+    def save(self, path: str):
+        self._index.save_index(path)
+        with open(path + '.json', 'w') as f:
+            json.dump({'kind': self.kind, 'n': len(self), 'dim': self.dim, **self.params()}, f)
+
+    @classmethod
+    def load(cls, path: str, matrix: np.ndarray, ef_search: Optional[int] = None) -> "HNSWIndex":
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        _check_shape(meta, matrix, path)
+
+        index = cls(matrix, M=meta['M'], ef_construction=meta['ef_construction'],
+                    ef_search=ef_search or meta['ef_search'])
+        index._index = cls._hnswlib().Index(space='ip', dim=index.dim)
+        index._index.load_index(path, max_elements=len(index))
+        index._index.set_ef(index.ef_search)
+        return index
+
+    def params(self) -> Dict:
+        return {'M': self.M, 'ef_construction': self.ef_construction, 'ef_search': self.ef_search}
+
+
+class QuantizedIndex(VectorIndex):
+    """
+    Index à deux passages sur des codes compacts
+
+    Le premier passage estime les scores de tout le catalogue à partir des
+    codes (fp16, int8, pq ou pca) ; le second re-classe les rerank * top_k
+    meilleurs candidats avec la matrice en pleine précision. Avec des
+    embeddings projetés en mémoire (EMBEDDINGS_MMAP=1), seules les lignes de
+    la liste courte sont lues : les codes sont la seule copie résidente.
+    rerank = 0 retourne directement les scores approchés.
+    """
+
+    query_params = ('rerank',)
+
+    def __init__(self, matrix: np.ndarray, codec: str, rerank: int = 4, train_sample: int = 20000,
+                 block_memory_mb: float = 64, seed: int = 0, **codec_params):
+        """
+        Args:
+            matrix: Matrice (n, d) float32 normalisée
+            codec: "fp16", "int8", "pq" ou "pca"
+            rerank: Taille de la liste courte en multiple de top_k (0 = pas de re-classement)
+            train_sample: Nombre maximal de vecteurs utilisés pour l'apprentissage du codec
+            block_memory_mb: Mémoire des vecteurs décodés d'un bloc (encodage et premier passage)
+            seed: Graine aléatoire
+            **codec_params: Paramètres propres au codec
+        """
+        super().__init__(matrix)
+        self.codec = create_codec(codec, **codec_params)
+        self.kind = self.codec.kind
+        self.rerank = rerank
+        self.train_sample = train_sample
+        self.block_memory_mb = block_memory_mb
+        self.seed = seed
+        self.codes: Optional[np.ndarray] = None
+
+    @property
+    def block_rows(self) -> int:
+        """Lignes par bloc : borne la mémoire des vecteurs float32 temporaires"""
+        return max(1, int(self.block_memory_mb * 1024 ** 2 // (4 * self.dim)))
+
+    @property
+    def decode_rows(self) -> int:
+        """Lignes décodées à la fois (codecs décodables) : le tampon float32 reste dans le cache du processeur"""
+        return max(1, min(self.block_rows, DECODE_BLOCK_BYTES // (4 * self.dim)))
+
+    @property
+    def nbytes(self) -> int:
+        """Mémoire des codes et des tableaux appris (octets)"""
+        return self.codes.nbytes + sum(array.nbytes for array in self.codec.state().values())
+
+    def build(self) -> "QuantizedIndex":
+        rng = np.random.default_rng(self.seed)
+        n = len(self)
+        if n > self.train_sample:
+            sample = np.asarray(self.matrix[np.sort(rng.choice(n, self.train_sample, replace=False))])
+        else:
+            sample = np.asarray(self.matrix)
+        self.codec.train(sample, rng)
+
+        first = self.codec.encode(self.matrix[:min(n, self.block_rows)])
+        self.codes = np.empty((n,) + first.shape[1:], dtype=first.dtype)
+        self.codes[:len(first)] = first
+        for start in range(len(first), n, self.block_rows):
+            self.codes[start:start + self.block_rows] = self.codec.encode(self.matrix[start:start + self.block_rows])
+        return self
+
+    def approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Scores approchés (q, n) de requêtes normalisées, calculés par blocs de codes"""
+        prepared = self.codec.prepare(queries)
+        scores = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        if self.codec.decodable:
+            # Chaque bloc est décodé une seule fois pour toutes les requêtes, dans le même tampon
+            rows = self.decode_rows
+            buffer = np.empty((rows, self.dim), dtype=np.float32)
+            for start in range(0, len(self), rows):
+                codes = self.codes[start:start + rows]
+                decoded = self.codec.decode(codes, buffer[:len(codes)])
+                scores[:, start:start + len(codes)] = prepared @ decoded.T
+            return scores
+        for start in range(0, len(self), self.block_rows):
+            scores[:, start:start + self.block_rows] = self.codec.scores(
+                self.codes[start:start + self.block_rows], prepared)
+        return scores
+
+    def _rerank(self, query: np.ndarray, approximate: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Liste courte sur les scores approchés, puis scores exacts sur la matrice"""
+        if self.rerank <= 0:
+            indices = top_k_indices(approximate, top_k)
+            return indices, approximate[indices]
+
+        shortlist = top_k_indices(approximate, max(top_k, self.rerank * top_k))
+        shortlist.sort()  # accès mémoire croissant dans la matrice
+        scores = self.matrix[shortlist] @ query
+        best = top_k_indices(scores, top_k)
+        return shortlist[best].astype(np.int64), scores[best]
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.codes is None:
+            raise ValueError(f"Index {self.kind} non construit")
+
+        query = l2_normalize(np.ravel(query))
+        return self._rerank(query, self.approximate_scores(query[None, :])[0], top_k)
+
+    def search_batch(self, queries: np.ndarray, top_k: int,
+                     block_size: int = 256) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if self.codes is None:
+            raise ValueError(f"Index {self.kind} non construit")
+
+        queries = l2_normalize(np.atleast_2d(queries))
+        results = []
+        for start in range(0, queries.shape[0], block_size):
+            block = queries[start:start + block_size]
+            approximate = self.approximate_scores(block)
+            results.extend(self._rerank(query, scores, top_k) for query, scores in zip(block, approximate))
+        return results
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            codes=self.codes,
+            meta=np.array(json.dumps({'kind': self.kind, 'n': len(self), 'dim': self.dim, **self.params()})),
+            **{f"codec.{name}": array for name, array in self.codec.state().items()}
+        )
+
+    @classmethod
+    def load(cls, path: str, matrix: np.ndarray, rerank: Optional[int] = None,
+             mmap: bool = False) -> "QuantizedIndex":
+        data = load_npz(path, mmap)
+        meta = json.loads(str(data['meta']))
+        _check_shape(meta, matrix, path)
+        params = {key: value for key, value in meta.items() if key not in ('kind', 'n', 'dim')}
+        if rerank is not None:
+            params['rerank'] = rerank
+        index = cls(matrix, meta['kind'], **params)
+        index.codec.load_state({name[len('codec.'):]: array
+                                for name, array in data.items() if name.startswith('codec.')})
+        index.codes = data['codes']
+        return index
+
+    def params(self) -> Dict:
+        return {
+            'rerank': self.rerank,
+            'train_sample': self.train_sample,
+            'block_memory_mb': self.block_memory_mb,
+            'seed': self.seed,
+            **self.codec.params()
+        }
+
+
+def _quantized_backend(codec: str):
+    """Constructeur d'un QuantizedIndex pour un codec donné (même signature que les autres backends)"""
+    def factory(matrix: np.ndarray, **params) -> QuantizedIndex:
+        return QuantizedIndex(matrix, codec, **params)
+    return factory
+
+
+INDEX_BACKENDS = {
+    FlatIndex.kind: FlatIndex,
+    StreamingIndex.kind: StreamingIndex,
+    IVFIndex.kind: IVFIndex,
+    HNSWIndex.kind: HNSWIndex,
+    **{codec: _quantized_backend(codec) for codec in CODECS}
+}
+
+
+def _check_shape(meta: Dict, matrix: np.ndarray, path: str):
+    """Vérifie qu'un index sauvegardé correspond à la matrice fournie"""
+    if meta['n'] != matrix.shape[0] or meta['dim'] != matrix.shape[1]:
+        raise ValueError(f"Index {path} construit pour ({meta['n']}, {meta['dim']}), "
+                         f"matrice fournie {matrix.shape}")
+
+
+def _same_build_params(index: VectorIndex, expected: VectorIndex) -> bool:
+    """Indique si un index chargé a été construit avec les paramètres demandés (hors paramètres de requête)"""
+    def build_params(candidate: VectorIndex) -> Dict:
+        return {key: value for key, value in candidate.params().items() if key not in candidate.query_params}
+    return index.kind == expected.kind and build_params(index) == build_params(expected)
+
+
+def create_index(backend: str, matrix: np.ndarray, **params) -> VectorIndex:
+    """
+    Crée un index (non construit)
+
+    Args:
+        backend: "flat", "stream", "ivf", "hnsw", "fp16", "int8", "pq" ou "pca"
+        matrix: Matrice (n, d) float32 normalisée
+        **params: Paramètres propres au backend
+
+    Returns:
+        Instance de l'index
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Backend d'index inconnu: {backend} (disponibles: {list(INDEX_BACKENDS)})")
+    return INDEX_BACKENDS[backend](matrix, **params)
+
+
+def index_path(base_path: str, backend: str) -> str:
+    """Chemin de sauvegarde d'un index à partir d'un chemin de base (sans extension)"""
+    if backend == IVFIndex.kind or backend in CODECS:
+        return f"{base_path}.{backend}.npz"
+    return f"{base_path}.{backend}.bin"
+
+
+def build_or_load_index(backend: str, matrix: np.ndarray, base_path: Optional[str] = None,
+                        source_mtime: Optional[float] = None, mmap: bool = False, **params) -> VectorIndex:
+    """
+    Charge un index sauvegardé s'il est à jour, sinon le construit et le sauvegarde
+
+    Args:
+        backend: "flat", "stream", "ivf", "hnsw", "fp16", "int8", "pq" ou "pca"
+        matrix: Matrice (n, d) float32 normalisée
+        base_path: Chemin de base de la sauvegarde (None = pas de persistance)
+        source_mtime: Date de modification des embeddings ; un index plus ancien est reconstruit
+        mmap: Projeter en mémoire les tableaux d'un index sauvegardé (IVF, codes compacts)
+            au lieu de les copier dans chaque processus
+        **params: Paramètres propres au backend
+
+    Returns:
+        Index prêt à l'emploi
+    """
+    if backend == FlatIndex.kind:
+        return FlatIndex(matrix)
+    if backend == StreamingIndex.kind:
+        return StreamingIndex(matrix, **params)
+
+    path = index_path(base_path, backend) if base_path else None
+    if path and os.path.exists(path) and (source_mtime is None or os.path.getmtime(path) >= source_mtime):
+        try:
+            if backend == IVFIndex.kind:
+                index = IVFIndex.load(path, matrix, nprobe=params.get('nprobe'), mmap=mmap)
+            elif backend in CODECS:
+                index = QuantizedIndex.load(path, matrix, rerank=params.get('rerank'), mmap=mmap)
+            else:
+                index = HNSWIndex.load(path, matrix, ef_search=params.get('ef_search'))
+            # nlist, M, ef_construction, codec... changés depuis la sauvegarde : reconstruction
+            if not _same_build_params(index, create_index(backend, matrix, **params)):
+                raise ValueError(f"Index {path} construit avec d'autres paramètres")
+            return index
+        except (ValueError, KeyError, OSError):
+            pass  # Index incompatible ou corrompu : reconstruction
+
+    index = create_index(backend, matrix, **params).build()
+    if path:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        index.save(path)
+    return index
+
+
+def recall_at_k(index: VectorIndex, exact: VectorIndex, queries: np.ndarray, top_k: int = 10) -> Dict:
+    """
+    Compare un index approximatif à la recherche exacte
+
+    Args:
+        index: Index évalué
+        exact: Index de référence (FlatIndex)
+        queries: Matrice (q, d) de requêtes
+        top_k: Profondeur de la comparaison
+
+    Returns:
+        Dictionnaire avec le rappel@k moyen et les latences moyennes (ms)
+    """
+    recalls = []
+    index_time = 0.0
+    exact_time = 0.0
+
+    for query in queries:
+        start = time.perf_counter()
+        truth, _ = exact.search(query, top_k)
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        found, _ = index.search(query, top_k)
+        index_time += time.perf_counter() - start
+
+        if truth.size:
+            recalls.append(len(np.intersect1d(truth, found)) / truth.size)
+
+    n_queries = max(1, len(queries))
+    return {
+        'backend': index.kind,
+        'params': index.params(),
+        'top_k': top_k,
+        'n_queries': len(queries),
+        'recall_at_k': float(np.mean(recalls)) if recalls else 0.0,
+        'latency_ms': 1000 * index_time / n_queries,
+        'exact_latency_ms': 1000 * exact_time / n_queries
+    }
+
+
+def sample_queries(matrix: np.ndarray, n_queries: int = 100, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """
+    Requêtes synthétiques : produits du catalogue légèrement perturbés
+
+    Args:
+        matrix: Matrice (n, d) normalisée
+        n_queries: Nombre de requêtes
+        noise: Écart-type du bruit gaussien ajouté
+        seed: Graine aléatoire
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(matrix.shape[0], min(n_queries, matrix.shape[0]), replace=False)
+    queries = np.asarray(matrix[np.sort(rows)]) + rng.normal(0, noise, (len(rows), matrix.shape[1]))
+    return l2_normalize(queries)
+
+
+if __name__ == "__main__":
+    # Rappel@k d'un backend approximatif : python -m src.models.index <archive.npz> <clé> [backend]
+    import sys
+    from .embedding_store import EmbeddingStore
+
+    npz_path, key = sys.argv[1], sys.argv[2]
+    backend = sys.argv[3] if len(sys.argv) > 3 else "ivf"
+
+    store = EmbeddingStore.from_npz(npz_path, key)
+    start = time.perf_counter()
+    approx = create_index(backend, store.matrix).build()
+    build_time = time.perf_counter() - start
+
+    report = recall_at_k(approx, FlatIndex(store.matrix), sample_queries(store.matrix))
+    report['build_time_s'] = build_time
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,359 @@
+"""
+Inférence CPU optimisée des encodeurs de requêtes (CLIP image, modèle textuel)
+
+Backends (INFERENCE_CONFIG, ignorés sur GPU) :
+- "eager"       : modèle PyTorch float32 d'origine
+- "int8"        : quantification dynamique int8 des couches linéaires
+- "torchscript" : tour visuelle de CLIP tracée, figée et optimisée pour l'inférence
+- "compile"     : torch.compile
+- "onnx"        : export ONNX exécuté par onnxruntime (dépendance optionnelle)
+
+Chaque encodeur optimisé est comparé au modèle de référence sur un petit lot
+de validation : si la conversion échoue ou si la similarité cosinus descend
+sous la tolérance, le modèle de référence est conservé.
+
+Comparaison de tous les backends sur la machine courante :
+    python -m src.models.inference
+"""
+
+import os
+import threading
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from ..core.config import get_models_directory, INFERENCE_CONFIG, MODEL_CONFIG
+from .metrics import count
+
+CLIP_BACKENDS = ("eager", "int8", "torchscript", "compile", "onnx")
+TEXT_BACKENDS = ("eager", "int8", "compile", "onnx")
+
+# Lot de validation du modèle textuel : requêtes typiques du catalogue
+VALIDATION_TEXTS = [
+    "sac à main en cuir noir matelassé",
+    "parfum N°5 eau de parfum 100 ml",
+    "rouge à lèvres rouge intense",
+    "veste en tweed rose et blanche",
+    "lunettes de soleil oversize",
+    "ballerines bicolores beige et noir",
+    "quilted leather shoulder bag with gold chain",
+    "boucles d'oreilles perles"
+]
+
+_reports: Dict[str, Dict] = {}
+_reports_lock = threading.Lock()
+_threads_configured = False
+
+
+def inference_reports() -> List[Dict]:
+    """
+    Backend retenu et validation de chaque encodeur chargé
+
+    Returns:
+        Liste de dictionnaires (encodeur, modèle, backend demandé / retenu,
+        similarité cosinus minimale et moyenne, latences en ms, erreur)
+    """
+    with _reports_lock:
+        return [dict(report) for report in _reports.values()]
+
+
+def _record(report: Dict):
+    with _reports_lock:
+        _reports[report['encoder']] = report
+    if report['backend'] != report['requested']:
+        count('model_fallbacks_total', encoder=report['encoder'], kind='inference_backend')
+
+
+def configure_threads():
+    """Applique les nombres de threads de INFERENCE_CONFIG à PyTorch (une fois par processus)"""
+    global _threads_configured
+    if _threads_configured:
+        return
+    import torch
+
+    if INFERENCE_CONFIG["intra_op_threads"]:
+        torch.set_num_threads(INFERENCE_CONFIG["intra_op_threads"])
+    if INFERENCE_CONFIG["inter_op_threads"]:
+        try:
+            torch.set_num_interop_threads(INFERENCE_CONFIG["inter_op_threads"])
+        except RuntimeError:
+            pass  # déjà fixé : PyTorch n'accepte ce réglage qu'avant le premier calcul parallèle
+    _threads_configured = True
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict:
+    """
+    Similarité cosinus ligne à ligne entre deux matrices d'embeddings
+
+    Returns:
+        Dictionnaire {min_cosine, mean_cosine}
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    if reference.shape != candidate.shape:
+        raise ValueError(f"Formes différentes: {reference.shape} != {candidate.shape}")
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosines = (reference * candidate).sum(axis=1) / np.maximum(norms, 1e-12)
+    return {'min_cosine': float(cosines.min()), 'mean_cosine': float(cosines.mean())}
+
+
+def validation_images(n: int = 4, size: int = 256, seed: int = 0) -> List[Image.Image]:
+    """Images de validation déterministes (dégradés et bruit), sans accès réseau"""
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 255, size, dtype=np.float32)
+    images = []
+    for i in range(n):
+        gradient = np.stack([np.add.outer(ramp, ramp) / 2, np.tile(ramp, (size, 1)).T,
+                             np.full((size, size), 255.0 * i / max(1, n - 1))], axis=-1)
+        noise = rng.normal(0, 40, (size, size, 3))
+        images.append(Image.fromarray(np.clip(gradient + noise, 0, 255).astype(np.uint8), 'RGB'))
+    return images
+
+
+def _latency_ms(function: Callable[[], Any], repeats: int = 5) -> float:
+    """Latence médiane d'un appel (ms), après un appel de chauffe"""
+    function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return 1000 * float(np.median(timings))
+
+
+def _onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("Le backend 'onnx' nécessite onnxruntime (pip install onnxruntime)") from e
+    return onnxruntime
+
+
+def _session_options(onnxruntime):
+    options = onnxruntime.SessionOptions()
+    if INFERENCE_CONFIG["intra_op_threads"]:
+        options.intra_op_num_threads = INFERENCE_CONFIG["intra_op_threads"]
+    if INFERENCE_CONFIG["inter_op_threads"]:
+        options.inter_op_num_threads = INFERENCE_CONFIG["inter_op_threads"]
+    return options
+
+
+def onnx_path(model_name: str) -> str:
+    """Fichier ONNX exporté d'un modèle (nom de modèle rendu compatible avec un nom de fichier)"""
+    directory = INFERENCE_CONFIG["onnx_dir"] or os.path.join(get_models_directory(), "onnx")
+    safe_name = "".join(c if c.isalnum() or c in '-_.' else '-' for c in model_name)
+    return os.path.join(directory, safe_name)
+
+
+class ImageEncoder:
+    """
+    Encodeur d'images : lot préprocessé (tenseur (b, 3, h, w)) -> embeddings float32
+    """
+
+    def __init__(self, forward: Callable, backend: str, device: str):
+        """
+        Args:
+            forward: Fonction tenseur -> embeddings (tenseur ou tableau)
+            backend: Backend d'inférence
+            device: Device PyTorch des entrées
+        """
+        self.forward = forward
+        self.backend = backend
+        self.device = device
+
+    def encode(self, batch) -> np.ndarray:
+        """
+        Args:
+            batch: Tenseur (b, 3, h, w) préprocessé
+
+        Returns:
+            Matrice (b, dimension) float32
+        """
+        import torch
+
+        with torch.no_grad():
+            output = self.forward(batch.to(self.device))
+        if isinstance(output, torch.Tensor):
+            output = output.float().cpu().numpy()
+        return np.asarray(output, dtype=np.float32)
+
+
+def _clip_forward(visual, backend: str, example, model_name: str) -> Callable:
+    """Fonction d'inférence optimisée de la tour visuelle de CLIP"""
+    import torch
+
+    if backend == "int8":
+        return torch.ao.quantization.quantize_dynamic(visual, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "torchscript":
+        with torch.no_grad():
+            return torch.jit.optimize_for_inference(torch.jit.trace(visual.eval(), example))
+    if backend == "compile":
+        return torch.compile(visual)
+    if backend == "onnx":
+        onnxruntime = _onnxruntime()
+        path = onnx_path(f"clip-{model_name}") + ".onnx"
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            torch.onnx.export(visual, example, tmp_path, input_names=['pixels'], output_names=['embedding'],
+                              dynamic_axes={'pixels': {0: 'batch'}, 'embedding': {0: 'batch'}}, opset_version=17)
+            os.replace(tmp_path, path)
+        session = onnxruntime.InferenceSession(path, _session_options(onnxruntime),
+                                               providers=['CPUExecutionProvider'])
+        return lambda batch: session.run(None, {'pixels': batch.cpu().numpy()})[0]
+    raise ValueError(f"Backend d'inférence inconnu pour CLIP: {backend} (disponibles: {list(CLIP_BACKENDS)})")
+
+
+def build_clip_encoder(model, preprocess, device: str, model_name: str,
+                       backend: Optional[str] = None) -> ImageEncoder:
+    """
+    Encodeur d'images CLIP avec le backend configuré, validé contre le modèle d'origine
+
+    Args:
+        model: Modèle CLIP chargé (référence)
+        preprocess: Préprocessing CLIP (pour le lot de validation)
+        device: Device PyTorch
+        model_name: Nom du modèle CLIP (ex: "ViT-B/32")
+        backend: Backend (défaut: INFERENCE_CONFIG["clip_backend"])
+
+    Returns:
+        ImageEncoder (celui de référence si le backend n'est pas retenu)
+    """
+    import torch
+
+    backend = backend or INFERENCE_CONFIG["clip_backend"]
+    reference = ImageEncoder(model.encode_image, "eager", device)
+    report = {'encoder': 'clip', 'model': model_name, 'requested': backend, 'backend': 'eager'}
+    if device == "cpu":
+        configure_threads()
+    if device != "cpu" or backend == "eager":
+        _record(report)
+        return reference
+
+    batch = torch.stack([preprocess(image) for image in validation_images()])
+    expected = reference.encode(batch)
+    try:
+        # Tracé / exporté sur un lot de taille différente du lot de validation : vérifie
+        # aussi que la taille de lot reste dynamique
+        candidate = ImageEncoder(_clip_forward(model.visual, backend, batch[:2], model_name), backend, device)
+        report.update(cosine_agreement(expected, candidate.encode(batch)))
+        report['reference_ms'] = _latency_ms(lambda: reference.encode(batch[:1]))
+        report['latency_ms'] = _latency_ms(lambda: candidate.encode(batch[:1]))
+    except Exception as e:
+        report['error'] = str(e)
+        warnings.warn(f"Backend d'inférence CLIP '{backend}' indisponible, modèle d'origine utilisé: {e}")
+        _record(report)
+        return reference
+
+    if report['min_cosine'] < INFERENCE_CONFIG["cosine_tolerance"]:
+        warnings.warn(f"Backend d'inférence CLIP '{backend}' hors tolérance "
+                      f"(cosinus {report['min_cosine']:.4f}), modèle d'origine utilisé")
+        _record(report)
+        return reference
+
+    report['backend'] = backend
+    _record(report)
+    return candidate
+
+
+def _text_candidate(model, model_name: str, backend: str):
+    """Variante optimisée d'un SentenceTransformer (même interface encode)"""
+    import torch
+
+    if backend == "int8":
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "compile":
+        # Copie superficielle : les poids sont partagés, seul le transformeur est compilé
+        import copy
+        candidate = copy.copy(model)
+        candidate._modules = type(model._modules)(model._modules)
+        candidate._modules['0'] = copy.copy(model[0])
+        candidate[0]._modules = type(model[0]._modules)(model[0]._modules)
+        candidate[0].auto_model = torch.compile(model[0].auto_model, dynamic=True)
+        return candidate
+    if backend == "onnx":
+        # Backend ONNX natif de sentence-transformers (>= 3.2, avec optimum[onnxruntime])
+        from sentence_transformers import SentenceTransformer
+
+        onnxruntime = _onnxruntime()
+        model_kwargs = {'provider': 'CPUExecutionProvider', 'session_options': _session_options(onnxruntime)}
+        path = onnx_path(f"text-{model_name}")
+        if os.path.isdir(path):
+            return SentenceTransformer(path, backend='onnx', model_kwargs=model_kwargs)
+        candidate = SentenceTransformer(model_name, backend='onnx', model_kwargs=model_kwargs)
+        candidate.save(path)
+        return candidate
+    raise ValueError(f"Backend d'inférence inconnu pour le modèle textuel: {backend} "
+                     f"(disponibles: {list(TEXT_BACKENDS)})")
+
+
+def optimize_text_model(model, model_name: str, backend: Optional[str] = None):
+    """
+    Modèle textuel avec le backend configuré, validé contre le modèle d'origine
+
+    Args:
+        model: SentenceTransformer chargé (référence)
+        model_name: Nom du modèle
+        backend: Backend (défaut: INFERENCE_CONFIG["text_backend"])
+
+    Returns:
+        Modèle exposant encode() (celui d'origine si le backend n'est pas retenu)
+    """
+    backend = backend or INFERENCE_CONFIG["text_backend"]
+    report = {'encoder': 'text', 'model': model_name, 'requested': backend, 'backend': 'eager'}
+    if str(model.device) == "cpu":
+        configure_threads()
+    if str(model.device) != "cpu" or backend == "eager":
+        _record(report)
+        return model
+
+    expected = model.encode(VALIDATION_TEXTS, convert_to_numpy=True)
+    try:
+        candidate = _text_candidate(model, model_name, backend)
+        report.update(cosine_agreement(expected, candidate.encode(VALIDATION_TEXTS, convert_to_numpy=True)))
+        report['reference_ms'] = _latency_ms(lambda: model.encode(VALIDATION_TEXTS[:1]))
+        report['latency_ms'] = _latency_ms(lambda: candidate.encode(VALIDATION_TEXTS[:1]))
+    except Exception as e:
+        report['error'] = str(e)
+        warnings.warn(f"Backend d'inférence textuel '{backend}' indisponible, modèle d'origine utilisé: {e}")
+        _record(report)
+        return model
+
+    if report['min_cosine'] < INFERENCE_CONFIG["cosine_tolerance"]:
+        warnings.warn(f"Backend d'inférence textuel '{backend}' hors tolérance "
+                      f"(cosinus {report['min_cosine']:.4f}), modèle d'origine utilisé")
+        _record(report)
+        return model
+
+    report['backend'] = backend
+    _record(report)
+    return candidate
+
+
+if __name__ == "__main__":
+    # Validation et latence de chaque backend : python -m src.models.inference [clip|text]
+    import sys
+    from .registry import load_clip, load_text_model
+
+    encoders = sys.argv[1:] or ["clip", "text"]
+    rows = []
+    if "clip" in encoders:
+        clip_model, clip_preprocess = load_clip("cpu")
+        for name in CLIP_BACKENDS[1:]:
+            build_clip_encoder(clip_model, clip_preprocess, "cpu", MODEL_CONFIG["visual_models"]["clip"], name)
+            rows.extend(report for report in inference_reports() if report['encoder'] == 'clip')
+    if "text" in encoders:
+        text_model, text_model_name, _ = load_text_model()
+        if text_model is not None:
+            for name in TEXT_BACKENDS[1:]:
+                optimize_text_model(text_model, text_model_name, name)
+                rows.extend(report for report in inference_reports() if report['encoder'] == 'text')
+
+    for row in rows:
+        status = "retenu" if row['backend'] == row['requested'] else f"rejeté ({row.get('error', 'tolérance')})"
+        print(f"{row['encoder']:<5} {row['requested']:<12} cosinus min {row.get('min_cosine', float('nan')):.4f}  "
+              f"{row.get('reference_ms', float('nan')):8.2f} -> {row.get('latency_ms', float('nan')):8.2f} ms  "
+              f"{status}")
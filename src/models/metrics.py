@@ -0,0 +1,421 @@
+"""
+Mesures du chemin de recherche : durées par étape et compteurs
+
+Les étapes coûteuses d'une recherche (décodage, préprocessing, encodage,
+similarités, top-k, informations produits, vignettes) sont chronométrées par
+des spans dont les durées alimentent un histogramme par étape. Des compteurs
+(requêtes par mode, fallbacks de modèles) et des collecteurs lus à la demande
+(caches, micro-batching) complètent les histogrammes.
+
+Export au format texte Prometheus (GET /metrics de l'API) et panneau de
+débogage Streamlit optionnel (METRICS_PANEL=1). Désactivées (METRICS=0), les
+mesures se réduisent à un context manager vide partagé : ni horloge ni verrou.
+
+Avec plusieurs processus (API lancée avec --workers), chaque processus écrit
+périodiquement son état dans METRICS_MULTIPROC_DIR et GET /metrics additionne
+les états de tous les processus : une collecte Prometheus voit les totaux de
+l'API, quel que soit le processus qui répond.
+"""
+
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..core.config import METRICS_CONFIG
+
+# Type Prometheus et description de chaque métrique exportée (nom sans préfixe)
+METRIC_HELP = {
+    'stage_seconds': ('histogram', "Durée des étapes de recherche (secondes)"),
+    'queries_total': ('counter', "Recherches par mode"),
+    'model_fallbacks_total': ('counter', "Replis de modèles (modèle textuel, backend d'inférence)"),
+    'cache_lookups_total': ('counter', "Consultations des caches par résultat (hit, disk_hit, miss)"),
+    'cache_entries': ('gauge', "Entrées en mémoire par cache"),
+    'batches_total': ('counter', "Lots traités par le micro-batching de l'API"),
+    'batch_items_total': ('counter', "Requêtes traitées par le micro-batching de l'API"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+# Échantillon d'un collecteur : (métrique, étiquettes, valeur)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Histogram:
+    """
+    Histogramme de durées à bornes fixes (comptes par intervalle, somme, total)
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        # Dernier intervalle : au-delà de la plus grande borne (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """Comptes cumulés par borne (dernier élément : +Inf), comme les buckets Prometheus"""
+        total, counts = 0, []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+    def quantile(self, q: float) -> float:
+        """
+        Quantile estimé par interpolation linéaire dans l'intervalle qui le contient
+
+        Au-delà de la plus grande borne, retourne cette borne.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1] if self.buckets else 0.0
+
+
+class _Span:
+    """Chronomètre une étape (context manager), durée enregistrée même en cas d'exception"""
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics: "SearchMetrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    """Span des mesures désactivées (aucun effet)"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class SearchMetrics:
+    """
+    Histogrammes de durées par étape, compteurs et collecteurs du processus
+    """
+
+    def __init__(self, enabled: bool = True, buckets: Optional[Sequence[float]] = None,
+                 prefix: str = "chanel"):
+        """
+        Args:
+            enabled: Mesures actives (sinon span() retourne un context manager vide)
+            buckets: Bornes des histogrammes en secondes (défaut: METRICS_CONFIG)
+            prefix: Préfixe des noms de métriques exportées
+        """
+        self.enabled = enabled
+        self.buckets = tuple(buckets or METRICS_CONFIG["buckets"])
+        self.prefix = prefix
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Sample]]] = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage: str):
+        """
+        Context manager chronométrant une étape
+
+        Usage :
+            with metrics.span('encode_text'):
+                embedding = model.encode(text)
+        """
+        return _Span(self, stage) if self.enabled else _NULL_SPAN
+
+    def observe(self, stage: str, seconds: float):
+        """Enregistre la durée d'une étape"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Incrémente un compteur
+
+        Args:
+            name: Métrique (clé de METRIC_HELP, sans préfixe)
+            value: Incrément
+            labels: Étiquettes (ex: mode='image')
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add_collector(self, name: str, collect: Callable[[], Iterable[Sample]]):
+        """
+        Enregistre (ou remplace) un collecteur lu à chaque export
+
+        Args:
+            name: Nom du collecteur (un seul par nom)
+            collect: Fonction retournant des échantillons (métrique, étiquettes, valeur)
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def _collect(self) -> Dict[Tuple[str, Labels], float]:
+        """Compteurs propres + échantillons des collecteurs"""
+        with self._lock:
+            samples = dict(self._counters)
+            collectors = list(self._collectors.values())
+        for collect in collectors:
+            try:
+                for name, labels, value in collect():
+                    samples[(name, _labels(labels))] = value
+            except Exception:
+                # Un collecteur défaillant ne doit pas empêcher l'export
+                continue
+        return samples
+
+    def stages(self) -> Dict[str, Dict]:
+        """
+        Résumé des durées par étape
+
+        Returns:
+            Dictionnaire {étape: {count, total_s, mean_ms, p50_ms, p95_ms}} trié par durée totale
+        """
+        with self._lock:
+            rows = {
+                stage: {
+                    'count': histogram.count,
+                    'total_s': histogram.sum,
+                    'mean_ms': 1000 * histogram.sum / histogram.count if histogram.count else 0.0,
+                    'p50_ms': 1000 * histogram.quantile(0.5),
+                    'p95_ms': 1000 * histogram.quantile(0.95)
+                }
+                for stage, histogram in self._histograms.items()
+            }
+        return dict(sorted(rows.items(), key=lambda item: -item[1]['total_s']))
+
+    def counters(self) -> Dict[str, Dict[str, float]]:
+        """
+        Compteurs et échantillons des collecteurs
+
+        Returns:
+            Dictionnaire {métrique: {étiquettes "nom=valeur,...": valeur}}
+        """
+        counters: Dict[str, Dict[str, float]] = {}
+        for (name, labels), value in sorted(self._collect().items()):
+            counters.setdefault(name, {})[','.join(f"{key}={val}" for key, val in labels)] = value
+        return counters
+
+    def snapshot(self) -> Dict:
+        """
+        État du processus sérialisable en JSON (histogrammes, compteurs et collecteurs)
+
+        Returns:
+            Dictionnaire {buckets, histograms: {étape: [comptes, somme, total]},
+            samples: [[métrique, étiquettes, valeur]]}
+        """
+        with self._lock:
+            histograms = {stage: [list(histogram.counts), histogram.sum, histogram.count]
+                          for stage, histogram in self._histograms.items()}
+        return {
+            'buckets': list(self.buckets),
+            'histograms': histograms,
+            'samples': [[name, [list(label) for label in labels], value]
+                        for (name, labels), value in self._collect().items()]
+        }
+
+    def write_snapshot(self, directory: str):
+        """Écrit l'état du processus dans directory/<pid>.json (remplacement atomique)"""
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, os.path.join(directory, f"{os.getpid()}.json"))
+
+    def start_export(self, directory: str, interval_s: float) -> threading.Event:
+        """
+        Écrit l'état du processus toutes les interval_s secondes (thread démon)
+
+        Returns:
+            Événement à positionner pour arrêter l'export (une dernière écriture est faite)
+        """
+        stop = threading.Event()
+
+        def run():
+            while True:
+                try:
+                    self.write_snapshot(directory)
+                except OSError:
+                    pass  # Réessayé à l'intervalle suivant
+                if stop.wait(interval_s):
+                    break
+            try:
+                self.write_snapshot(directory)
+            except OSError:
+                pass
+
+        threading.Thread(target=run, name="metrics-export", daemon=True).start()
+        return stop
+
+    def render_multiprocess(self, directory: str) -> str:
+        """
+        Métriques additionnées de tous les processus ayant écrit dans directory
+
+        L'état du processus courant est réécrit avant la lecture ; celui des
+        autres date au plus de leur dernier export. Les fichiers d'un processus
+        arrêté sont conservés : les compteurs restent croissants.
+        """
+        self.write_snapshot(directory)
+        snapshots = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # fichier en cours de remplacement ou illisible
+        return self.render_prometheus(snapshots)
+
+    def render_prometheus(self, snapshots: Optional[Sequence[Dict]] = None) -> str:
+        """
+        Métriques au format texte d'exposition Prometheus (version 0.0.4)
+
+        Args:
+            snapshots: États (snapshot()) à additionner (défaut: le processus courant)
+        """
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        histograms: Dict[str, Tuple[List[int], float, int]] = {}
+        samples: Dict[Tuple[str, Labels], float] = {}
+        for snapshot in snapshots:
+            if tuple(snapshot['buckets']) == self.buckets:
+                for stage, (counts, total, count) in snapshot['histograms'].items():
+                    merged = histograms.get(stage, ([0] * len(counts), 0.0, 0))
+                    histograms[stage] = ([a + b for a, b in zip(merged[0], counts)], merged[1] + total,
+                                         merged[2] + count)
+            for name, labels, value in snapshot['samples']:
+                key = (name, tuple(tuple(label) for label in labels))
+                samples[key] = samples.get(key, 0) + value
+
+        lines = []
+
+        def header(name: str):
+            kind, description = METRIC_HELP.get(name, ('untyped', name))
+            lines.append(f"# HELP {self.prefix}_{name} {description}")
+            lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+        if histograms:
+            header('stage_seconds')
+            metric = f"{self.prefix}_stage_seconds"
+            for stage, (counts, total, count) in sorted(histograms.items()):
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), accumulate(counts)):
+                    labels = _format_labels((('stage', stage), ('le', _format_value(bound))))
+                    lines.append(f"{metric}_bucket{labels} {bucket_count}")
+                labels = _format_labels((('stage', stage),))
+                lines.append(f"{metric}_sum{labels} {_format_value(total)}")
+                lines.append(f"{metric}_count{labels} {count}")
+
+        by_name: Dict[str, List[Tuple[Labels, float]]] = {}
+        for (name, labels), value in samples.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name, samples in sorted(by_name.items()):
+            header(name)
+            for labels, value in sorted(samples):
+                lines.append(f"{self.prefix}_{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Remet à zéro les histogrammes et compteurs (les collecteurs sont conservés)"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def cache_samples(cache: str, stats: Dict) -> List[Sample]:
+    """Échantillons d'un cache à partir de ses compteurs (LRUCache.stats())"""
+    return [
+        ('cache_lookups_total', {'cache': cache, 'result': 'hit'}, stats['hits']),
+        ('cache_lookups_total', {'cache': cache, 'result': 'disk_hit'}, stats['disk_hits']),
+        ('cache_lookups_total', {'cache': cache, 'result': 'miss'}, stats['misses']),
+        ('cache_entries', {'cache': cache}, stats['entries']),
+    ]
+
+
+_metrics: Optional[SearchMetrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> SearchMetrics:
+    """Mesures partagées par toutes les sessions du processus (METRICS_CONFIG)"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = SearchMetrics(METRICS_CONFIG["enabled"], METRICS_CONFIG["buckets"],
+                                         METRICS_CONFIG["prefix"])
+    return _metrics
+
+
+def span(stage: str):
+    """Context manager chronométrant une étape dans les mesures partagées"""
+    return get_metrics().span(stage)
+
+
+def count(name: str, value: float = 1, **labels):
+    """Incrémente un compteur des mesures partagées"""
+    get_metrics().inc(name, value, **labels)
+
+
+def timed(stage: str) -> Callable:
+    """Décorateur chronométrant chaque appel d'une fonction (étape stage)"""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,137 @@
+"""
+Table des plus proches voisins de chaque produit ("produits similaires")
+
+Les voisins sont précalculés hors ligne à partir des embeddings du catalogue,
+par blocs de lignes (mémoire bornée) traités en parallèle. La table stocke les
+indices en int32 et les scores en float16 dans deux fichiers .npy projetés en
+mémoire : la recherche des voisins d'un produit est une simple lecture de ligne.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .embedding_store import _write_npy_atomic
+from .ranking import top_k_indices_batch
+
+
+def neighbors_paths(artifact_dir: str, key: str) -> Tuple[str, str]:
+    """Fichiers (indices, scores) de la table des voisins d'une famille d'embeddings"""
+    base = os.path.join(artifact_dir, f"neighbors.{key}")
+    return f"{base}.indices.npy", f"{base}.scores.npy"
+
+
+def compute_neighbors(matrix: np.ndarray, n_neighbors: int, block_memory_mb: float = 256,
+                      workers: Optional[int] = None, progress: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcule les n_neighbors plus proches voisins de chaque ligne (produit lui-même exclu)
+
+    Args:
+        matrix: Matrice (n, d) normalisée
+        n_neighbors: Voisins conservés par produit
+        block_memory_mb: Mémoire des scores d'un bloc (détermine le nombre de lignes par bloc)
+        workers: Blocs traités en parallèle (par défaut, nombre de cœurs)
+        progress: Afficher l'avancement
+
+    Returns:
+        Tuple (indices (n, k) int32, scores (n, k) float16), voisins triés par score décroissant
+    """
+    n = matrix.shape[0]
+    n_neighbors = min(n_neighbors, max(n - 1, 0))
+    indices = np.empty((n, n_neighbors), dtype=np.int32)
+    scores = np.empty((n, n_neighbors), dtype=np.float16)
+    if n_neighbors == 0:
+        return indices, scores
+
+    block_rows = max(1, int(block_memory_mb * 1024 ** 2 // (n * 4)))
+    blocks = [(start, min(start + block_rows, n)) for start in range(0, n, block_rows)]
+    workers = workers or os.cpu_count() or 1
+    start_time = time.perf_counter()
+
+    def process(block):
+        start, end = block
+        block_scores = matrix[start:end] @ matrix.T
+        # Le produit lui-même n'est jamais son propre voisin
+        block_scores[np.arange(end - start), np.arange(start, end)] = -np.inf
+        selected = top_k_indices_batch(block_scores, n_neighbors)
+        indices[start:end] = selected
+        scores[start:end] = np.take_along_axis(block_scores, selected, axis=1)
+        return end - start
+
+    # Le produit matriciel NumPy libère le GIL : les threads se répartissent les cœurs
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        done = 0
+        for rows in pool.map(process, blocks):
+            done += rows
+            if progress:
+                print(f"  {done}/{n} produits ({time.perf_counter() - start_time:.1f}s)", flush=True)
+
+    return indices, scores
+
+
+class NeighborTable:
+    """
+    Voisins précalculés : ligne i = produits les plus proches du produit i
+    """
+
+    def __init__(self, indices: np.ndarray, scores: np.ndarray, name: str = ""):
+        """
+        Args:
+            indices: Matrice (n, k) int32 des voisins
+            scores: Matrice (n, k) float16 des similarités
+            name: Famille d'embeddings (ex: "clip_embeddings")
+        """
+        if indices.shape != scores.shape:
+            raise ValueError(f"Formes incohérentes: {indices.shape} != {scores.shape}")
+        self.indices = indices
+        self.scores = scores
+        self.name = name
+
+    @classmethod
+    def load(cls, artifact_dir: str, key: str) -> Optional["NeighborTable"]:
+        """
+        Projette en mémoire la table d'une famille d'embeddings
+
+        Returns:
+            NeighborTable, ou None si la table n'a pas été calculée
+        """
+        indices_path, scores_path = neighbors_paths(artifact_dir, key)
+        if not (os.path.exists(indices_path) and os.path.exists(scores_path)):
+            return None
+        return cls(np.load(indices_path, mmap_mode='r'), np.load(scores_path, mmap_mode='r'), name=key)
+
+    def save(self, artifact_dir: str):
+        """Écrit la table (deux .npy, écriture atomique)"""
+        indices_path, scores_path = neighbors_paths(artifact_dir, self.name)
+        _write_npy_atomic(indices_path, np.ascontiguousarray(self.indices, dtype=np.int32))
+        _write_npy_atomic(scores_path, np.ascontiguousarray(self.scores, dtype=np.float16))
+
+    def __len__(self) -> int:
+        return self.indices.shape[0]
+
+    @property
+    def n_neighbors(self) -> int:
+        """Voisins stockés par produit"""
+        return self.indices.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.indices.nbytes + self.scores.nbytes
+
+    def neighbors(self, product_index: int, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Voisins d'un produit
+
+        Args:
+            product_index: Produit de référence
+            top_k: Nombre de voisins (au plus n_neighbors)
+
+        Returns:
+            Tuple (indices, scores float32)
+        """
+        top_k = min(top_k, self.n_neighbors)
+        return (np.asarray(self.indices[product_index, :top_k], dtype=np.int64),
+                np.asarray(self.scores[product_index, :top_k], dtype=np.float32))
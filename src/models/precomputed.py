@@ -0,0 +1,194 @@
+"""
+Résultats précalculés des requêtes textuelles fréquentes
+
+Une tâche hors ligne (tools/precompute_results) classe les requêtes d'un
+journal de recherche et écrit les résultats dans la version du catalogue :
+clés triées (empreinte 64 bits de l'encodeur et du texte normalisé), indices
+int32 et scores float16 dans un .npz non compressé, projeté en mémoire au
+chargement de la version. Une recherche par texte sans filtre lit sa ligne
+(recherche dichotomique) au lieu de parcourir le catalogue ; une requête
+absente passe par la recherche habituelle.
+
+Les "produits similaires" d'un produit du catalogue sont couverts par la table
+des voisins (neighbors.py), calculée par la même tâche.
+
+Le fichier est invalidé par la version des artefacts : il n'est chargé que si
+la version et l'empreinte des fichiers d'embeddings enregistrées à son calcul
+correspondent à la version chargée.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import warnings
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .artifacts import CATALOG_FILE, TEXTUAL_FILE, VISUAL_FILE
+from .cache import normalize_text
+from .embedding_store import load_npz
+
+PRECOMPUTED_FILE = 'precomputed_results.npz'
+FORMAT_VERSION = 1
+
+
+def query_key(model_name: str, text: str) -> int:
+    """
+    Clé 64 bits d'une requête textuelle
+
+    Args:
+        model_name: Encodeur de la requête (modèle textuel ou tour textuelle de CLIP)
+        text: Requête (normalisée comme les clés du cache des requêtes)
+    """
+    payload = f"{model_name}\0{normalize_text(text)}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), 'little')
+
+
+def artifact_fingerprint(artifact_dir: str) -> str:
+    """Empreinte (taille, date de modification) du dataset et des embeddings d'une version"""
+    parts = []
+    for name in (CATALOG_FILE, VISUAL_FILE, TEXTUAL_FILE):
+        path = os.path.join(artifact_dir, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f"{name}:{stat.st_size}:{int(stat.st_mtime)}")
+    return ';'.join(parts)
+
+
+class PrecomputedResults:
+    """
+    Table clé de requête -> top-k précalculé (clés triées)
+    """
+
+    def __init__(self, keys: np.ndarray, indices: np.ndarray, scores: np.ndarray, meta: Dict):
+        """
+        Args:
+            keys: Clés (m,) uint64 triées
+            indices: Matrice (m, k) int32 des produits (-1 au-delà du catalogue)
+            scores: Matrice (m, k) float16 des similarités
+            meta: Version, empreinte des artefacts, profondeur, requêtes par encodeur
+        """
+        if indices.shape != scores.shape or len(keys) != indices.shape[0]:
+            raise ValueError(f"Formes incohérentes: {keys.shape}, {indices.shape}, {scores.shape}")
+        self.keys = keys
+        self.indices = indices
+        self.scores = scores
+        self.meta = meta
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def build(cls, entries: Sequence[Tuple[int, np.ndarray, np.ndarray]], top_k: int,
+              meta: Dict) -> "PrecomputedResults":
+        """
+        Assemble la table à partir de résultats (clé, indices, scores)
+
+        Args:
+            entries: Un tuple par requête ; résultats plus courts que top_k complétés par -1
+            top_k: Profondeur stockée
+            meta: Métadonnées (version, empreinte, encodeurs)
+        """
+        by_key = {int(key): (rows, scores) for key, rows, scores in entries}
+        keys = np.array(sorted(by_key), dtype=np.uint64)
+        indices = np.full((len(keys), top_k), -1, dtype=np.int32)
+        scores = np.zeros((len(keys), top_k), dtype=np.float16)
+        for i, key in enumerate(keys.tolist()):
+            rows, row_scores = by_key[key]
+            length = min(top_k, len(rows))
+            indices[i, :length] = rows[:length]
+            scores[i, :length] = row_scores[:length]
+        return cls(keys, indices, scores, {**meta, 'top_k': top_k, 'format_version': FORMAT_VERSION})
+
+    @classmethod
+    def load(cls, artifact_dir: str, version: Optional[str] = None) -> Optional["PrecomputedResults"]:
+        """
+        Projette en mémoire les résultats précalculés d'une version
+
+        Args:
+            artifact_dir: Répertoire de la version
+            version: Version chargée (les résultats d'une autre version sont ignorés)
+
+        Returns:
+            PrecomputedResults, ou None si absents, d'un ancien format ou périmés
+        """
+        path = os.path.join(artifact_dir, PRECOMPUTED_FILE)
+        if not os.path.exists(path):
+            return None
+        arrays = load_npz(path, mmap=True)
+        meta = json.loads(str(arrays['meta']))
+        if meta.get('format_version') != FORMAT_VERSION:
+            return None
+        if (version is not None and meta.get('version') != version) \
+                or meta.get('fingerprint') != artifact_fingerprint(artifact_dir):
+            warnings.warn(f"{path}: résultats précalculés pour une autre version des artefacts, ignorés")
+            return None
+        return cls(arrays['keys'], arrays['indices'], arrays['scores'], meta)
+
+    def save(self, artifact_dir: str):
+        """Écrit la table dans la version (.npz non compressé, écriture atomique)"""
+        path = os.path.join(artifact_dir, PRECOMPUTED_FILE)
+        fd, tmp_path = tempfile.mkstemp(dir=artifact_dir, suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, keys=self.keys, indices=self.indices, scores=self.scores,
+                         meta=np.array(json.dumps(self.meta)))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def top_k(self) -> int:
+        """Profondeur stockée par requête"""
+        return self.indices.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.indices.nbytes + self.scores.nbytes
+
+    def lookup(self, model_name: str, text: str, top_k: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Résultats précalculés d'une requête
+
+        Args:
+            model_name: Encodeur de la requête
+            text: Texte de la requête
+            top_k: Nombre de produits demandés (au plus la profondeur stockée)
+
+        Returns:
+            Tuple (indices, scores float32), ou None si la requête n'a pas été précalculée
+        """
+        if top_k > self.top_k or not len(self.keys):
+            self.misses += 1
+            return None
+        key = np.uint64(query_key(model_name, text))
+        position = int(np.searchsorted(self.keys, key))
+        if position == len(self.keys) or self.keys[position] != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        rows = np.asarray(self.indices[position, :top_k], dtype=np.int64)
+        valid = rows >= 0
+        return rows[valid], np.asarray(self.scores[position, :top_k], dtype=np.float32)[valid]
+
+    def stats(self) -> Dict:
+        """Compteurs de succès / échecs (même forme que LRUCache.stats())"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'hits': self.hits,
+            'disk_hits': 0,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def lookup_batch(self, model_name: str, texts: Sequence[str],
+                     top_k: int) -> List[Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """Version par lot de lookup (None pour chaque requête absente)"""
+        return [self.lookup(model_name, text, top_k) for text in texts]
@@ -0,0 +1,292 @@
+"""
+Stockage en colonnes des informations produits
+
+Seules les colonnes affichées sont chargées (titre, prix, catégorie, image,
+code produit), chacune dans un tableau NumPy : prix en float64, catégories
+encodées en codes entiers, chaînes internées. Le stockage peut être sauvegardé
+dans un .npz binaire (sans pickle) pour éviter l'analyse du CSV au démarrage.
+
+Le .npz peut aussi être projeté en mémoire (mode multi-processus de l'API) :
+les colonnes restent dans le fichier, partagées entre processus par le cache
+de pages, et les chaînes ne sont décodées que pour les produits affichés.
+"""
+
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .embedding_store import load_npz
+
+# Colonne du dataset -> clé retournée par get_product_info
+PRODUCT_FIELDS = {
+    'title': 'title',
+    'price': 'price',
+    'category2_code': 'category',
+    'imageurl': 'image_url',
+    'product_code': 'product_code'
+}
+CATEGORY_COLUMN = 'category2_code'
+PRICE_COLUMN = 'price'
+MISSING = 'N/A'
+FORMAT_VERSION = 2
+
+
+def products_path(csv_path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Chemin du fichier binaire associé à un dataset CSV
+
+    Args:
+        csv_path: Dataset d'origine
+        cache_dir: Répertoire du fichier binaire (par défaut, celui du CSV)
+    """
+    base = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir or os.path.dirname(csv_path), f"{base}.products.npz")
+
+
+def _intern_strings(values: pd.Series) -> np.ndarray:
+    """Tableau object de chaînes internées (None pour les valeurs manquantes)"""
+    return np.array([sys.intern(str(value)) if pd.notna(value) else None for value in values], dtype=object)
+
+
+def _encode_strings(values: np.ndarray):
+    """Chaînes -> (octets UTF-8 concaténés, positions de fin, valeurs manquantes)"""
+    encoded = [value.encode('utf-8') if value is not None else b'' for value in values]
+    ends = np.cumsum([len(chunk) for chunk in encoded], dtype=np.int64)
+    missing = np.array([value is None for value in values], dtype=bool)
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), ends, missing
+
+
+class EncodedStrings:
+    """
+    Colonne de chaînes encodées (UTF-8 concaténé), décodées à la demande
+
+    Accès direct à une ligne par ses positions de début et de fin : les
+    tableaux peuvent rester projetés en mémoire.
+    """
+
+    def __init__(self, blob: np.ndarray, ends: np.ndarray, missing: np.ndarray):
+        self.blob = blob
+        self.ends = ends
+        self.missing = missing
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    @property
+    def nbytes(self) -> int:
+        return self.blob.nbytes + self.ends.nbytes + self.missing.nbytes
+
+    def __getitem__(self, rows) -> np.ndarray:
+        """Chaînes des lignes demandées (tableau object, None si manquante)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        ends = self.ends[rows].tolist()
+        starts = np.where(rows > 0, self.ends[np.maximum(rows - 1, 0)], 0).tolist()
+        missing = self.missing[rows].tolist()
+        values = np.empty(len(rows), dtype=object)
+        for i, (start, end, is_missing) in enumerate(zip(starts, ends, missing)):
+            values[i] = None if is_missing else bytes(self.blob[start:end]).decode('utf-8')
+        return values
+
+    def decode(self) -> np.ndarray:
+        """Colonne entière décodée (chaînes internées)"""
+        data = self.blob.tobytes()
+        values = np.empty(len(self.ends), dtype=object)
+        start = 0
+        for i, (end, is_missing) in enumerate(zip(self.ends.tolist(), self.missing.tolist())):
+            values[i] = None if is_missing else sys.intern(data[start:end].decode('utf-8'))
+            start = end
+        return values
+
+
+class ProductStore:
+    """
+    Informations produits en colonnes, indexées par position dans le catalogue
+    """
+
+    def __init__(self, strings: Dict[str, np.ndarray], prices: Optional[np.ndarray] = None,
+                 category_codes: Optional[np.ndarray] = None, categories: Optional[np.ndarray] = None):
+        """
+        Args:
+            strings: Colonnes textuelles {colonne: tableau object ou EncodedStrings}
+            prices: Prix float64 (NaN si manquant), None si la colonne est absente ou non numérique
+            category_codes: Codes de catégorie entiers (-1 si manquant)
+            categories: Libellés des catégories
+        """
+        self.strings = strings
+        self.prices = prices
+        self.category_codes = category_codes
+        self.categories = categories
+        lengths = {len(column) for column in self.strings.values()}
+        for column in (prices, category_codes):
+            if column is not None:
+                lengths.add(len(column))
+        if len(lengths) > 1:
+            raise ValueError(f"Colonnes de longueurs différentes: {sorted(lengths)}")
+        self._size = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "ProductStore":
+        """Construit le stockage à partir des colonnes utiles d'un DataFrame"""
+        strings, prices, codes, categories = {}, None, None, None
+        for column in PRODUCT_FIELDS:
+            if column not in df.columns:
+                continue
+            values = df[column]
+            if column == PRICE_COLUMN and pd.api.types.is_numeric_dtype(values):
+                prices = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            elif column == CATEGORY_COLUMN:
+                categorical = values.astype('category')
+                codes = categorical.cat.codes.to_numpy().astype(
+                    np.int16 if len(categorical.cat.categories) < 2 ** 15 else np.int32)
+                categories = _intern_strings(categorical.cat.categories)
+            else:
+                strings[column] = _intern_strings(values)
+        return cls(strings, prices, codes, categories)
+
+    @classmethod
+    def from_csv(cls, csv_path: str) -> "ProductStore":
+        """Lit uniquement les colonnes utiles d'un dataset CSV"""
+        df = pd.read_csv(
+            csv_path,
+            usecols=lambda column: column in PRODUCT_FIELDS,
+            dtype={CATEGORY_COLUMN: 'category', 'title': str, 'imageurl': str, 'product_code': str}
+        )
+        return cls.from_dataframe(df)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "ProductStore":
+        """
+        Charge un stockage sauvegardé par save()
+
+        Args:
+            path: Fichier .npz
+            mmap: Si True, colonnes projetées en mémoire depuis le fichier et
+                chaînes décodées à la demande (partagées entre processus)
+        """
+        arrays = load_npz(path, mmap)
+        if int(arrays['format_version']) != FORMAT_VERSION:
+            raise ValueError(f"{path}: version de format {int(arrays['format_version'])} non supportée")
+
+        def column_strings(column: str):
+            encoded = EncodedStrings(arrays[f"{column}.blob"], arrays[f"{column}.ends"],
+                                     arrays[f"{column}.missing"])
+            return encoded if mmap else encoded.decode()
+
+        strings = {column: column_strings(column) for column in PRODUCT_FIELDS if f"{column}.ends" in arrays}
+        prices = arrays.get(PRICE_COLUMN)
+        codes = arrays.get('category_codes')
+        # Libellés des catégories : peu nombreux, toujours décodés
+        categories = column_strings('categories') if 'categories.ends' in arrays else None
+        if isinstance(categories, EncodedStrings):
+            categories = categories.decode()
+        return cls(strings, prices, codes, categories)
+
+    @classmethod
+    def from_csv_cached(cls, csv_path: str, cache_dir: Optional[str] = None, mmap: bool = False) -> "ProductStore":
+        """
+        Charge le fichier binaire s'il est plus récent que le CSV, sinon lit le CSV et le sauvegarde
+
+        Args:
+            csv_path: Dataset CSV
+            cache_dir: Répertoire du fichier binaire (par défaut, celui du CSV)
+            mmap: Projeter le fichier binaire en mémoire (voir load)
+        """
+        path = products_path(csv_path, cache_dir)
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(csv_path):
+            try:
+                return cls.load(path, mmap)
+            except (OSError, ValueError, KeyError):
+                pass  # fichier illisible ou ancien format : reconstruit
+
+        store = cls.from_csv(csv_path)
+        try:
+            store.save(path)
+        except OSError:
+            return store  # répertoire en lecture seule : le CSV sera relu au prochain démarrage
+        return cls.load(path, mmap) if mmap else store
+
+    def save(self, path: str):
+        """Sauvegarde le stockage (.npz non compressé, écriture atomique)"""
+        arrays = {'format_version': np.array(FORMAT_VERSION)}
+        for column, values in self.strings.items():
+            if isinstance(values, EncodedStrings):
+                values = values.decode()
+            arrays[f"{column}.blob"], arrays[f"{column}.ends"], arrays[f"{column}.missing"] = _encode_strings(values)
+        if self.prices is not None:
+            arrays[PRICE_COLUMN] = self.prices
+        if self.category_codes is not None:
+            arrays['category_codes'] = self.category_codes
+            arrays['categories.blob'], arrays['categories.ends'], arrays['categories.missing'] = \
+                _encode_strings(self.categories)
+
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Taille approximative en mémoire (octets), chaînes comprises (projetées ou non)"""
+        total = sum(column.nbytes if isinstance(column, EncodedStrings)
+                    else column.nbytes + sum(sys.getsizeof(v) for v in set(column) if v is not None)
+                    for column in self.strings.values())
+        for column in (self.prices, self.category_codes):
+            if column is not None:
+                total += column.nbytes
+        return total
+
+    def get_products_info(self, indices: Sequence[int]) -> List[Dict]:
+        """
+        Informations d'un lot de produits
+
+        Args:
+            indices: Positions des produits dans le catalogue
+
+        Returns:
+            Un dictionnaire par index (vide si l'index est hors catalogue)
+        """
+        indices = np.asarray(indices, dtype=np.int64).ravel()
+        valid = (indices >= 0) & (indices < self._size)
+        rows = indices[valid]
+
+        # Une colonne par champ, valeurs manquantes à None
+        columns = {PRODUCT_FIELDS[column]: values[rows] for column, values in self.strings.items()}
+        if self.prices is not None:
+            columns['price'] = np.array([None if np.isnan(price) else price
+                                         for price in self.prices[rows].tolist()], dtype=object)
+        if self.category_codes is not None:
+            codes = self.category_codes[rows]
+            labels = self.categories.take(np.maximum(codes, 0), mode='clip') if len(self.categories) \
+                else np.full(len(codes), None, dtype=object)
+            labels[codes < 0] = None
+            columns['category'] = labels
+
+        defaults = {field: MISSING for field in PRODUCT_FIELDS.values()}
+        defaults['image_url'] = ''
+        fields = list(columns)
+
+        results: List[Dict] = [{} for _ in indices]
+        for position, values in zip(np.flatnonzero(valid).tolist(), zip(*columns.values()) if fields
+                                    else ((),) * len(rows)):
+            info = dict(defaults)
+            info.update((field, value) for field, value in zip(fields, values) if value is not None)
+            results[position] = info
+        return results
+
+    def get_product_info(self, index: int) -> Dict:
+        """Informations d'un produit (dictionnaire vide si l'index est hors catalogue)"""
+        return self.get_products_info([index])[0]
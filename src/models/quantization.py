@@ -0,0 +1,298 @@
+"""
+Représentations compactes des embeddings (quantification, réduction de dimension)
+
+Chaque codec encode la matrice normalisée du catalogue en codes compacts et
+estime les produits scalaires requête / produit directement sur ces codes :
+- "fp16" : demi-précision (2 octets par dimension)
+- "int8" : quantification scalaire symétrique, une échelle par dimension (1 octet)
+- "pq"   : quantification produit, un octet par sous-espace (k-means par sous-espace)
+- "pca"  : projection sur les r premières composantes principales (float16)
+
+Les scores approchés servent de premier passage ; l'index (index.QuantizedIndex)
+re-classe ensuite une liste courte avec les vecteurs en pleine précision.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class Codec:
+    """Interface commune des codecs"""
+
+    kind = "base"
+
+    def train(self, sample: np.ndarray, rng: np.random.Generator) -> "Codec":
+        """Apprend les paramètres du codec sur un échantillon (n, d) normalisé"""
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode un bloc de vecteurs (b, d) en codes (b, ...)"""
+        raise NotImplementedError
+
+    def prepare(self, queries: np.ndarray):
+        """
+        Précalculs par requête, faits une fois et réutilisés pour chaque bloc de codes
+
+        Args:
+            queries: Matrice (q, d) de requêtes normalisées
+        """
+        return queries
+
+    # Codes décodables en float32 (decode) : le premier passage décode chaque
+    # bloc une fois pour toutes les requêtes du lot, puis un produit matriciel float32
+    decodable = False
+
+    def decode(self, codes: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Décode un bloc de codes (b, d) dans un tampon float32 (b, d) réutilisé"""
+        raise NotImplementedError
+
+    def scores(self, codes: np.ndarray, prepared) -> np.ndarray:
+        """
+        Produits scalaires approchés entre des requêtes et un bloc de codes
+
+        Args:
+            codes: Codes (b, ...) d'un bloc de produits
+            prepared: Résultat de prepare() pour les requêtes
+
+        Returns:
+            Matrice (q, b) float32
+        """
+        raise NotImplementedError
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Tableaux appris, sauvegardés avec les codes"""
+        return {}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        """Restaure les tableaux appris"""
+
+    def params(self) -> Dict:
+        """Paramètres du codec (pour les rapports et la sauvegarde)"""
+        return {}
+
+
+class Float16Codec(Codec):
+    """Demi-précision : aucun apprentissage, erreur relative ~1e-3"""
+
+    kind = "fp16"
+    decodable = True
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def decode(self, codes: np.ndarray, out: np.ndarray) -> np.ndarray:
+        # Conversion en float32 : NumPy n'a pas de produit matriciel float16 optimisé
+        np.copyto(out, codes)
+        return out
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        return queries @ codes.astype(np.float32).T
+
+
+class Int8Codec(Codec):
+    """
+    Quantification scalaire symétrique sur 8 bits
+
+    Une échelle par dimension (valeur absolue maximale de l'échantillon / 127) ;
+    l'échelle est reportée sur la requête, les codes restent entiers.
+    """
+
+    kind = "int8"
+    decodable = True
+
+    def __init__(self):
+        self.scale: Optional[np.ndarray] = None
+
+    def train(self, sample: np.ndarray, rng: np.random.Generator) -> "Int8Codec":
+        scale = np.abs(sample).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        self.scale = scale.astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(np.asarray(vectors) / self.scale), -127, 127).astype(np.int8)
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        return queries * self.scale
+
+    def decode(self, codes: np.ndarray, out: np.ndarray) -> np.ndarray:
+        # L'échelle reste sur la requête (prepare) : seuls les entiers sont convertis
+        np.copyto(out, codes, casting='unsafe')
+        return out
+
+    def scores(self, codes: np.ndarray, prepared: np.ndarray) -> np.ndarray:
+        return prepared @ codes.astype(np.float32).T
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {'scale': self.scale}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        self.scale = state['scale']
+
+
+class PQCodec(Codec):
+    """
+    Quantification produit
+
+    Les dimensions sont découpées en n_subspaces sous-espaces contigus ; chaque
+    sous-vecteur est remplacé par le numéro de son centroïde le plus proche
+    (k-means à n_centroids <= 256 centroïdes). Une requête précalcule la table
+    de ses produits scalaires avec tous les centroïdes : le score d'un produit
+    est la somme de n_subspaces lectures dans cette table.
+    """
+
+    kind = "pq"
+
+    def __init__(self, n_subspaces: int = 64, n_centroids: int = 256, train_iters: int = 10):
+        if not 1 <= n_centroids <= 256:
+            raise ValueError("n_centroids doit être compris entre 1 et 256 (codes sur un octet)")
+        self.n_subspaces = n_subspaces
+        self.n_centroids = n_centroids
+        self.train_iters = train_iters
+        self.bounds: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+
+    def _kmeans(self, vectors: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """k-means euclidien d'un sous-espace ; retourne les centroïdes (n_centroids, d_sub)"""
+        k = min(self.n_centroids, vectors.shape[0])
+        centroids = vectors[rng.choice(vectors.shape[0], k, replace=False)].copy()
+        for _ in range(self.train_iters):
+            assignments = np.argmax(vectors @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+            counts = np.bincount(assignments, minlength=k)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            non_empty = counts > 0
+            centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+            # Réinitialiser les centroïdes vides sur des vecteurs aléatoires
+            empty = np.flatnonzero(~non_empty)
+            if empty.size:
+                centroids[empty] = vectors[rng.choice(vectors.shape[0], empty.size, replace=False)]
+        if k < self.n_centroids:
+            centroids = np.concatenate([centroids, np.repeat(centroids[:1], self.n_centroids - k, axis=0)])
+        return centroids
+
+    def train(self, sample: np.ndarray, rng: np.random.Generator) -> "PQCodec":
+        dim = sample.shape[1]
+        n_subspaces = min(self.n_subspaces, dim)
+        # Sous-espaces de tailles égales à une dimension près
+        self.bounds = np.linspace(0, dim, n_subspaces + 1).astype(np.int64)
+        sub_dim = int(np.max(np.diff(self.bounds)))
+        self.centroids = np.zeros((n_subspaces, self.n_centroids, sub_dim), dtype=np.float32)
+        for j, (start, end) in enumerate(zip(self.bounds[:-1], self.bounds[1:])):
+            self.centroids[j, :, :end - start] = self._kmeans(np.ascontiguousarray(sample[:, start:end]), rng)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((vectors.shape[0], len(self.bounds) - 1), dtype=np.uint8)
+        for j, (start, end) in enumerate(zip(self.bounds[:-1], self.bounds[1:])):
+            centroids = self.centroids[j, :, :end - start]
+            codes[:, j] = np.argmax(vectors[:, start:end] @ centroids.T
+                                    - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+        return codes
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        """Produits scalaires requêtes / centroïdes : (n_subspaces, q, n_centroids), contigus par sous-espace"""
+        n_subspaces, n_centroids = self.centroids.shape[:2]
+        tables = np.empty((n_subspaces, queries.shape[0], n_centroids), dtype=np.float32)
+        for j, (start, end) in enumerate(zip(self.bounds[:-1], self.bounds[1:])):
+            tables[j] = queries[:, start:end] @ self.centroids[j, :, :end - start].T
+        return tables
+
+    def scores(self, codes: np.ndarray, tables: np.ndarray) -> np.ndarray:
+        scores = np.zeros((tables.shape[1], codes.shape[0]), dtype=np.float32)
+        for j in range(codes.shape[1]):
+            scores += np.take(tables[j], codes[:, j], axis=1)
+        return scores
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {'bounds': self.bounds, 'centroids': self.centroids}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        self.bounds = state['bounds']
+        self.centroids = state['centroids']
+
+    def params(self) -> Dict:
+        return {'n_subspaces': self.n_subspaces, 'n_centroids': self.n_centroids, 'train_iters': self.train_iters}
+
+
+class PCACodec(Codec):
+    """
+    Réduction de dimension par analyse en composantes principales
+
+    x ≈ moyenne + composantesᵀ · code, donc q·x ≈ q·moyenne + (composantes · q)·code.
+    Les composantes sont les premiers vecteurs propres de la matrice de
+    covariance (d x d) de l'échantillon ; pour une dimension supérieure à la
+    taille de l'échantillon (cnn_embeddings), ils sont déduits de la matrice
+    de Gram (s x s), plus petite.
+    """
+
+    kind = "pca"
+
+    def __init__(self, n_components: int = 256):
+        self.n_components = n_components
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+
+    def train(self, sample: np.ndarray, rng: np.random.Generator) -> "PCACodec":
+        sample = np.asarray(sample, dtype=np.float32)
+        self.mean = sample.mean(axis=0)
+        centered = sample - self.mean
+        n_components = min(self.n_components, *centered.shape)
+
+        n_samples, dim = centered.shape
+        if dim <= n_samples:
+            centered = centered.astype(np.float64)
+            _, eigenvectors = np.linalg.eigh(centered.T @ centered)
+            # eigh trie les valeurs propres par ordre croissant
+            components = eigenvectors[:, ::-1][:, :n_components].T
+        else:
+            # Vecteurs propres u de X·Xᵀ -> composantes Xᵀ·u / sqrt(valeur propre)
+            eigenvalues, eigenvectors = np.linalg.eigh((centered @ centered.T).astype(np.float64))
+            order = np.argsort(eigenvalues)[::-1][:n_components]
+            eigenvalues = np.maximum(eigenvalues[order], 1e-12)
+            components = (eigenvectors[:, order] / np.sqrt(eigenvalues)).T.astype(np.float32) @ centered
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return ((np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T).astype(np.float16)
+
+    def prepare(self, queries: np.ndarray):
+        return queries @ self.components.T, queries @ self.mean
+
+    def scores(self, codes: np.ndarray, prepared) -> np.ndarray:
+        projected, offsets = prepared
+        return projected @ codes.astype(np.float32).T + offsets[:, None]
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {'mean': self.mean, 'components': self.components}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        self.mean = state['mean']
+        self.components = state['components']
+
+    def params(self) -> Dict:
+        return {'n_components': self.n_components}
+
+
+CODECS = {
+    Float16Codec.kind: Float16Codec,
+    Int8Codec.kind: Int8Codec,
+    PQCodec.kind: PQCodec,
+    PCACodec.kind: PCACodec
+}
+
+
+def create_codec(kind: str, **params) -> Codec:
+    """
+    Crée un codec (non entraîné)
+
+    Args:
+        kind: "fp16", "int8", "pq" ou "pca"
+        **params: Paramètres propres au codec
+    """
+    if kind not in CODECS:
+        raise ValueError(f"Codec inconnu: {kind} (disponibles: {list(CODECS)})")
+    return CODECS[kind](**params)
@@ -0,0 +1,127 @@
+"""
+Cœur de classement vectorisé : fusion pondérée des scores et sélection top-k
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices des top_k meilleurs scores, triés par score décroissant
+
+    Sélection en O(n) par argpartition, puis tri des seuls k candidats.
+
+    Args:
+        scores: Tableau (n,) de scores
+        top_k: Nombre d'éléments à retourner
+
+    Returns:
+        Tableau d'indices (min(top_k, n),)
+    """
+    n = scores.shape[0]
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    if top_k < n:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(n)
+
+    order = np.argsort(-scores[candidates], kind='stable')
+    return candidates[order]
+
+
+def top_k_indices_batch(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Version par lot de top_k_indices : une ligne de scores par requête
+
+    Args:
+        scores: Matrice (q, n) de scores
+        top_k: Nombre d'éléments par requête
+
+    Returns:
+        Matrice (q, min(top_k, n)) d'indices triés par score décroissant
+    """
+    n_queries, n = scores.shape
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.empty((n_queries, 0), dtype=np.int64)
+
+    if top_k < n:
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), (n_queries, n))
+
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def to_results(indices: np.ndarray, scores: np.ndarray) -> List[Tuple[int, float]]:
+    """
+    Convertit des indices et le tableau de scores complet en liste de résultats
+
+    Args:
+        indices: Indices des produits retenus
+        scores: Tableau (n,) de scores (indexé par produit)
+
+    Returns:
+        Liste de tuples (index_produit, score)
+    """
+    return [(int(idx), float(scores[idx])) for idx in indices]
+
+
+def to_pairs(indices: np.ndarray, scores: np.ndarray) -> List[Tuple[int, float]]:
+    """
+    Convertit des indices et leurs scores (alignés) en liste de résultats
+
+    Args:
+        indices: Indices des produits retenus
+        scores: Scores correspondants, dans le même ordre
+
+    Returns:
+        Liste de tuples (index_produit, score)
+    """
+    return [(int(idx), float(score)) for idx, score in zip(indices, scores)]
+
+
+def rank(scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """
+    Classe un tableau de scores et retourne les top_k résultats
+
+    Args:
+        scores: Tableau (n,) de scores
+        top_k: Nombre de produits à retourner
+
+    Returns:
+        Liste de tuples (index_produit, score) triée par score décroissant
+    """
+    return to_results(top_k_indices(scores, top_k), scores)
+
+
+def fuse_scores(score_arrays: Sequence[np.ndarray], weights: Sequence[float]) -> np.ndarray:
+    """
+    Somme pondérée de plusieurs tableaux de scores alignés sur le catalogue
+
+    Args:
+        score_arrays: Tableaux (n,) ou (q, n) de scores, un par modalité
+        weights: Poids de chaque modalité
+
+    Returns:
+        Tableau des scores fusionnés (float32), de même forme
+    """
+    if len(score_arrays) != len(weights):
+        raise ValueError("Autant de poids que de tableaux de scores sont attendus")
+    if not score_arrays:
+        raise ValueError("Au moins un tableau de scores est requis")
+
+    shape = score_arrays[0].shape
+    fused = np.zeros(shape, dtype=np.float32)
+    for scores, weight in zip(score_arrays, weights):
+        if scores.shape != shape:
+            raise ValueError(f"Tableaux de scores de tailles différentes: {scores.shape} != {shape}")
+        fused += np.float32(weight) * scores
+    return fused
@@ -2,21 +2,29 @@
 Système de recommandation principal pour les produits Chanel
 """
 
-import pandas as pd
 import numpy as np
 import pickle
-from PIL import Image
 import cv2
-from sklearn.metrics.pairwise import cosine_similarity
 import torch
-import clip
-from sentence_transformers import SentenceTransformer
-import os
-from typing import List, Tuple, Dict, Union
+from typing import Callable, List, Tuple, Dict, Union, Optional
 import warnings
-import streamlit as st
 
-from ..core.config import get_models_directory, MODEL_CONFIG, EMBEDDING_CONFIG
+from ..core.config import get_models_directory, MODEL_CONFIG, EMBEDDING_CONFIG, BATCH_CONFIG
+from .catalog import CatalogSnapshot
+from .cache import QueryCache, normalize_text
+from .embedding_store import l2_normalize
+from .filters import SearchFilter
+from .fusion import Modality, ScoreFusion
+from .images import ImageInput, QueryImage, as_query_image
+from .ranking import to_pairs, fuse_scores, top_k_indices, top_k_indices_batch
+from .registry import (
+    get_registry, load_catalog_manager, load_query_cache, load_clip_encoder, load_clip_text_encoder,
+    load_text_encoder, load_visual_encoder, index_backend, start_warmup
+)
+from .inference import inference_reports
+from .metrics import count, get_metrics, span, timed
+from .text_encoders import clip_text_model_name, resolve_text_encoder
+from .visual_encoders import cnn_preprocess, resolve_visual_backends
 
 warnings.filterwarnings('ignore')
 
@@ -26,113 +34,317 @@ class ChanelRecommendationSystem:
         """
         Système de recommandation de produits Chanel
         
+        Les modèles et embeddings proviennent du registre partagé du processus :
+        créer une instance par session ne recharge rien.
+        
         Args:
             models_dir: Répertoire contenant les modèles pré-entraînés
         """
         self.models_dir = models_dir or get_models_directory()
-        self.df = None
-        self.visual_embeddings = None
-        self.textual_embeddings = None
-        self.clip_model = None
-        self.clip_preprocess = None
-        self.text_model = None
+        # Version courante du catalogue (dataset + embeddings + index), remplaçable à chaud
+        self.catalog = None
+        self.query_cache = load_query_cache()
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._clip_bundle = None
+        self._text_bundle = None
         
         self._load_data_and_models()
     
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Version du catalogue à utiliser pour la prochaine recherche (attend le premier chargement)"""
+        if self.catalog is None:
+            return None
+        try:
+            return self.catalog.current
+        except FileNotFoundError:
+            return None
+    
+    @property
+    def products(self):
+        snapshot = self.snapshot
+        return snapshot.products if snapshot is not None else None
+    
+    @property
+    def visual_embeddings(self):
+        snapshot = self.snapshot
+        return snapshot.visual_embeddings if snapshot is not None else None
+    
+    @property
+    def textual_embeddings(self):
+        snapshot = self.snapshot
+        return snapshot.textual_embeddings if snapshot is not None else None
+    
+    @property
+    def visual_index(self):
+        snapshot = self.snapshot
+        return snapshot.visual_index if snapshot is not None else None
+    
+    @property
+    def textual_index(self):
+        snapshot = self.snapshot
+        return snapshot.textual_index if snapshot is not None else None
+    
+    @property
+    def clip_model(self):
+        """Encodeur d'images CLIP (attendu ou chargé à la première recherche par image)"""
+        return self._load_clip_model()[0]
+    
+    @property
+    def clip_preprocess(self):
+        return self._load_clip_model()[1]
+    
+    @property
+    def text_model(self):
+        """Modèle textuel (attendu ou chargé à la première recherche par texte)"""
+        return self._load_text_model()[0]
+    
+    @property
+    def text_model_name(self) -> Optional[str]:
+        return self._load_text_model()[1]
+    
     def _load_data_and_models(self):
-        """Charge les données et modèles pré-entraînés"""
+        """
+        Lance le chargement des données et modèles en arrière-plan
+        
+        Le catalogue, le modèle textuel et CLIP se chargent en parallèle ;
+        l'interface s'affiche sans les attendre. Une recherche n'attend que les
+        composants dont elle a besoin ; ceux absents de LOADING_CONFIG["preload"]
+        sont chargés à leur première utilisation.
+        """
+        self.catalog = load_catalog_manager(self.models_dir)
+        # Déjà lancés au démarrage du processus (python -m src.ui, API) : rien n'est rechargé
+        start_warmup(self.models_dir, self.device)
+    
+    def _load_clip_model(self) -> Tuple:
+        """Attend (ou lance) le chargement de CLIP ; (None, None) en cas d'échec"""
+        if self._clip_bundle is None:
+            device = self.device
+            try:
+                self._clip_bundle = get_registry().submit('clip', lambda: load_clip_encoder(device)).result()
+            except Exception as e:
+                warnings.warn(f"Impossible de charger CLIP: {e}")
+                return None, None
+        return self._clip_bundle
+    
+    def _submit_visual_encoder(self, backend: str):
+        """Lance (une fois) le chargement de l'encodeur d'un backend visuel autre que CLIP"""
+        device, models_dir = self.device, self.models_dir
+        return get_registry().submit(f'visual:{backend}', lambda: load_visual_encoder(backend, device, models_dir))
+    
+    def _load_visual_encoder(self, backend: str):
+        """Attend (ou lance) le chargement de l'encodeur d'un backend visuel autre que CLIP"""
         try:
-            # Charger le DataFrame principal
-            csv_path = os.path.join(self.models_dir, 'df_clean_indexed.csv')
-            if os.path.exists(csv_path):
-                self.df = pd.read_csv(csv_path)
-                st.success(f"✅ Dataset chargé: {len(self.df)} produits")
-            else:
-                st.error(f"❌ Fichier dataset non trouvé: {csv_path}")
-                return
-            
-            # Charger les embeddings visuels
-            visual_path = os.path.join(self.models_dir, 'embeddings_visuels.npz')
-            if os.path.exists(visual_path):
-                self.visual_embeddings = np.load(visual_path)
-                st.success("✅ Embeddings visuels chargés")
-            
-            # Charger les embeddings textuels
-            textual_path = os.path.join(self.models_dir, 'embeddings_textuels.npz')
-            if os.path.exists(textual_path):
-                self.textual_embeddings = np.load(textual_path)
-                st.success("✅ Embeddings textuels chargés")
-            
-            # Charger le modèle CLIP pour la recherche par image
-            self._load_clip_model()
-            
-            # Charger le modèle textuel pour la recherche par texte
-            self._load_text_model()
-                
+            return self._submit_visual_encoder(backend).result()
         except Exception as e:
-            st.error(f"❌ Erreur lors du chargement: {e}")
+            raise ValueError(f"Encodeur visuel {backend} non disponible: {e}")
+    
+    def _load_text_model(self) -> Tuple:
+        """Attend (ou lance) le chargement du modèle textuel (avec fallback)"""
+        if self._text_bundle is None:
+            model, model_name, failures = get_registry().submit('text_model', load_text_encoder).result()
+            if model is None:
+                return None, None
+            self._text_bundle = (model, model_name)
+        return self._text_bundle
     
-    def _load_clip_model(self):
-        """Charge le modèle CLIP"""
+    def _load_clip_text_encoder(self):
+        """Attend (ou lance) le chargement de la tour textuelle de CLIP (modèle CLIP partagé)"""
+        device = self.device
         try:
-            self.clip_model, self.clip_preprocess = clip.load("ViT-B/32", device=self.device)
-            st.success(f"✅ Modèle CLIP chargé sur {self.device}")
+            return get_registry().submit('clip_text', lambda: load_clip_text_encoder(device)).result()
         except Exception as e:
-            st.warning(f"⚠️ Impossible de charger CLIP: {e}")
+            raise ValueError(f"Tour textuelle de CLIP non disponible: {e}")
     
-    def _load_text_model(self):
-        """Charge le modèle de texte avec fallback"""
-        for model_name in MODEL_CONFIG["text_models"]:
-            try:
-                self.text_model = SentenceTransformer(model_name)
-                st.success(f"✅ Modèle textuel chargé: {model_name}")
-                break
-            except Exception as e:
-                st.warning(f"⚠️ Impossible de charger {model_name}: {e}")
-                continue
+    def get_loading_status(self) -> List[Dict]:
+        """
+        État et durée du chargement de chaque composant
         
-        if self.text_model is None:
-            st.error("❌ Aucun modèle textuel n'a pu être chargé")
+        Returns:
+            Liste de dictionnaires (composant, état: loading/ready/failed, durée en secondes, erreur)
+        """
+        rows = get_registry().task_status()
+        # Backend d'inférence retenu pour chaque encodeur (après validation)
+        backends = {report['encoder']: report['backend'] for report in inference_reports()}
+        for row in rows:
+            if row['component'] == 'text_model' and row['state'] == 'ready':
+                # Le fallback retourne les échecs au lieu de lever une exception
+                model, model_name, failures = get_registry().submit('text_model', load_text_encoder).result()
+                if model is None:
+                    row['state'] = 'failed'
+                    row['error'] = "; ".join(f"{name}: {error}" for name, error in failures)
+                else:
+                    row['component'] = f"text_model ({model_name}, {backends.get('text', 'eager')})"
+            elif row['component'] == 'clip' and row['state'] == 'ready':
+                row['component'] = f"clip ({backends.get('clip', 'eager')})"
+        return rows
+    
+    def reload_catalog(self) -> bool:
+        """
+        Bascule sur la version du catalogue désignée par CURRENT (sans recharger les modèles)
+        
+        Returns:
+            True si la version a changé
+        """
+        if self.catalog is None:
+            self.catalog = load_catalog_manager(self.models_dir)
+        return self.catalog.reload()
     
-    def preprocess_image(self, image: Image.Image) -> np.ndarray:
+    def get_catalog_status(self) -> Dict:
+        """
+        État du catalogue (version chargée, version disponible, dernière erreur)
+        """
+        return self.catalog.status() if self.catalog is not None else {}
+    
+    def get_load_stats(self) -> List[Dict]:
+        """
+        Statistiques de chargement des composants partagés
+        
+        Returns:
+            Liste de dictionnaires (composant, temps de chargement, mémoire résidente)
+        """
+        return get_registry().report()
+    
+    def preprocess_image(self, image: ImageInput) -> np.ndarray:
         """
         Préprocesse une image pour extraction d'embeddings
         
         Args:
-            image: Image PIL
+            image: Image PIL ou QueryImage
             
         Returns:
-            Image préprocessée en array numpy
+            Image (224, 224, 3) float32 dans [0, 1]
         """
-        # Redimensionner et normaliser l'image
-        image = image.convert('RGB')
-        image = image.resize((224, 224))
-        img_array = np.array(image) / 255.0
-        return img_array
+        # Image déjà réduite et en RGB : un seul redimensionnement, calcul en float32
+        # (entrée du CNN maison, backend visuel "cnn")
+        return cnn_preprocess(as_query_image(image).image)
     
-    def extract_clip_embedding(self, image: Image.Image) -> np.ndarray:
+    def extract_clip_embedding(self, image: ImageInput, digest: str = None) -> np.ndarray:
         """
-        Extrait l'embedding CLIP d'une image
+        Extrait l'embedding CLIP d'une image (mis en cache par empreinte de l'image)
         
         Args:
-            image: Image PIL
+            image: Image PIL ou QueryImage (décodée une fois, tenseur réutilisé)
+            digest: Empreinte de l'image si déjà calculée
             
         Returns:
             Embedding CLIP (512 dimensions)
         """
+        query_image = as_query_image(image)
+        
+        def compute():
+            return self.extract_clip_embeddings([query_image], batch_size=1)[0]
+        
+        if self.query_cache is None:
+            return compute()
+        
+        key = self.query_cache.image_key(MODEL_CONFIG["visual_models"]["clip"], digest or query_image.digest)
+        return self.query_cache.get_embedding(key, compute)
+    
+    def extract_clip_embeddings(self, images: List[ImageInput], batch_size: int = None) -> np.ndarray:
+        """
+        Extrait les embeddings CLIP d'une liste d'images, par lots
+        
+        Args:
+            images: Images PIL ou QueryImage
+            batch_size: Images par passage dans le modèle (défaut: BATCH_CONFIG)
+            
+        Returns:
+            Matrice (n_images, 512)
+        """
         if self.clip_model is None:
             raise ValueError("Modèle CLIP non disponible")
         
-        # Préprocessing CLIP
-        image_tensor = self.clip_preprocess(image).unsqueeze(0).to(self.device)
+        batch_size = batch_size or BATCH_CONFIG["image_batch_size"]
+        embeddings = []
+        
+        for start in range(0, len(images), batch_size):
+            # Préprocessing CLIP (mis en cache dans chaque QueryImage)
+            batch = torch.stack([as_query_image(image).tensor(self.clip_preprocess)
+                                 for image in images[start:start + batch_size]])
+            
+            # Extraction des embeddings (backend d'inférence de INFERENCE_CONFIG)
+            with span('encode_image_clip'):
+                embeddings.append(self.clip_model.encode(batch))
+        
+        if not embeddings:
+            return np.empty((0, EMBEDDING_CONFIG["visual_embeddings"]["clip_embeddings"]), dtype=np.float32)
+        return np.concatenate(embeddings)
+    
+    def extract_visual_embedding(self, image: ImageInput, backend: str, digest: str = None) -> np.ndarray:
+        """
+        Extrait l'embedding d'une image pour un backend visuel (mis en cache par empreinte de l'image)
+        
+        Args:
+            image: Image PIL ou QueryImage
+            backend: "clip", "resnet", "vit" ou "cnn"
+            digest: Empreinte de l'image si déjà calculée
+            
+        Returns:
+            Embedding de la requête dans l'espace du backend
+        """
+        if backend == 'clip':
+            return self.extract_clip_embedding(image, digest)
+        
+        query_image = as_query_image(image)
+        encoder = self._load_visual_encoder(backend)
         
-        # Extraction de l'embedding
-        with torch.no_grad():
-            embedding = self.clip_model.encode_image(image_tensor)
-            embedding = embedding.squeeze().cpu().numpy()
+        def compute():
+            return encoder.encode([query_image], batch_size=1)[0]
         
-        return embedding
+        if self.query_cache is None:
+            return compute()
+        
+        key = self.query_cache.image_key(encoder.model_name, digest or query_image.digest)
+        return self.query_cache.get_embedding(key, compute)
+    
+    def extract_visual_embeddings(self, images: List[ImageInput], backend: str,
+                                  batch_size: int = None) -> np.ndarray:
+        """
+        Extrait les embeddings d'une liste d'images pour un backend visuel, par lots
+        
+        Returns:
+            Matrice (n_images, dimension du backend)
+        """
+        if backend == 'clip':
+            return self.extract_clip_embeddings(images, batch_size)
+        return self._load_visual_encoder(backend).encode(images, batch_size)
+    
+    def _visual_scores(self, snapshot: CatalogSnapshot, backends: Tuple[str, ...], weights: Tuple[float, ...],
+                       queries: List[np.ndarray],
+                       filters: SearchFilter = None) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """
+        Similarités visuelles fusionnées (fusion tardive) de plusieurs backends
+        
+        Args:
+            snapshot: Version du catalogue
+            backends: Backends visuels
+            weights: Poids de fusion (un par backend)
+            queries: Embedding(s) de requête de chaque backend, (d,) ou (q, d)
+            filters: Filtre (seules les lignes retenues sont parcourues)
+            
+        Returns:
+            Tuple (lignes retenues ou None sans filtre, scores (m,) / (q, m) ou (n,) / (q, n))
+        """
+        rows, parts = None, []
+        with span('similarity'):
+            for backend, query in zip(backends, queries):
+                store = snapshot.visual_family(backend)[0]
+                if filters is not None:
+                    # Mêmes lignes pour toutes les familles : elles ne dépendent que du filtre
+                    rows, scores = snapshot.filters.candidate_scores(store, query, filters)
+                elif np.ndim(query) == 1:
+                    scores = store.similarities(query)
+                else:
+                    scores = l2_normalize(query) @ store.matrix.T
+                parts.append(scores)
+            return rows, fuse_scores(parts, weights)
+    
+    def _visual_key(self, backends: Tuple[str, ...], weights: Tuple[float, ...]) -> tuple:
+        """Modèles et poids visuels (clé de cache des résultats)"""
+        if len(backends) == 1:
+            return (MODEL_CONFIG["visual_models"][backends[0]],)
+        return tuple(zip((MODEL_CONFIG["visual_models"][backend] for backend in backends), weights))
     
     def extract_text_embedding(self, text: str) -> np.ndarray:
         """
@@ -142,143 +354,639 @@ class ChanelRecommendationSystem:
             text: Texte à encoder
             
         Returns:
-            Embedding textuel (768 dimensions)
+            Embedding textuel (dimension des embeddings textuels de la version)
+            
+        Raises:
+            ValueError: Modèle indisponible ou échec de l'encodage (jamais
+                d'embedding de repli : ses résultats seraient mis en cache
+                sous la clé de la vraie requête)
         """
         if self.text_model is None:
             raise ValueError("Modèle textuel non disponible")
         
-        try:
+        def compute():
             # Encoder le texte et retourner l'embedding
-            embedding = self.text_model.encode(text)
+            with span('encode_text'):
+                embedding = self.text_model.encode(text)
             if isinstance(embedding, np.ndarray) and len(embedding.shape) > 1:
                 return embedding[0]  # Si c'est un batch, prendre le premier
             return embedding
+        
+        try:
+            if self.query_cache is None:
+                return compute()
+            key = self.query_cache.text_key(self.text_model_name, text)
+            return self.query_cache.get_embedding(key, compute)
         except Exception as e:
-            st.error(f"Erreur lors de l'extraction de l'embedding : {e}")
-            # Retourner un embedding par défaut de la bonne taille
-            return np.zeros(768)  # Dimension par défaut pour all-mpnet-base-v2
+            raise ValueError(f"Erreur lors de l'extraction de l'embedding : {e}") from e
+    
+    def extract_text_embeddings(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """
+        Extrait les embeddings textuels d'une liste de textes, par lots
+        
+        Args:
+            texts: Textes à encoder
+            batch_size: Textes par passage dans le modèle (défaut: BATCH_CONFIG)
+            
+        Returns:
+            Matrice (n_textes, dimension)
+        """
+        if self.text_model is None:
+            raise ValueError("Modèle textuel non disponible")
+        
+        batch_size = batch_size or BATCH_CONFIG["text_batch_size"]
+        with span('encode_text'):
+            return np.atleast_2d(self.text_model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True))
     
-    def search_by_image(self, uploaded_image: Image.Image, top_k: int = 10) -> List[Tuple[int, float]]:
+    def extract_clip_text_embedding(self, text: str) -> np.ndarray:
+        """
+        Extrait l'embedding d'un texte par la tour textuelle de CLIP (espace des images)
+        
+        Args:
+            text: Texte à encoder
+            
+        Returns:
+            Embedding CLIP (512 dimensions)
+        """
+        encoder = self._load_clip_text_encoder()
+        
+        def compute():
+            return encoder.encode([text], batch_size=1)[0]
+        
+        if self.query_cache is None:
+            return compute()
+        key = self.query_cache.text_key(encoder.model_name, text)
+        return self.query_cache.get_embedding(key, compute)
+    
+    def extract_clip_text_embeddings(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """
+        Extrait les embeddings CLIP d'une liste de textes, par lots
+        
+        Returns:
+            Matrice (n_textes, 512)
+        """
+        return self._load_clip_text_encoder().encode(texts, batch_size)
+    
+    @timed('search_image')
+    def search_by_image(self, uploaded_image: ImageInput, top_k: int = 10,
+                        filters: SearchFilter = None, visual_backends=None,
+                        visual_weights=None) -> List[Tuple[int, float]]:
         """
         Recherche par similarité visuelle
         
+        Un seul backend interroge l'index de sa famille d'embeddings ; plusieurs
+        backends sont fusionnés (somme pondérée des similarités cosinus).
+        
         Args:
             uploaded_image: Image uploadée par l'utilisateur
             top_k: Nombre de produits à retourner
+            filters: Catégories / fourchette de prix (seules ces lignes sont parcourues)
+            visual_backends: Backend(s) visuel(s) : "clip", "resnet", "vit", "cnn"
+                (défaut: VISUAL_SEARCH_CONFIG["default"])
+            visual_weights: Poids de fusion des backends (défaut: VISUAL_SEARCH_CONFIG["fusion_weights"])
             
         Returns:
             Liste de tuples (index_produit, score_similarité)
         """
-        # Extraire l'embedding de l'image uploadée
-        query_embedding = self.extract_clip_embedding(uploaded_image)
+        count('queries_total', mode='image')
+        snapshot = self.snapshot
+        backends, weights = resolve_visual_backends(visual_backends, visual_weights)
+        if snapshot is None:
+            raise ValueError("Embeddings visuels non disponibles")
+        families = [snapshot.visual_family(backend) for backend in backends]
         
-        # Utiliser les embeddings CLIP pré-calculés
-        if self.visual_embeddings and 'clip_embeddings' in self.visual_embeddings:
-            product_embeddings = self.visual_embeddings['clip_embeddings']
-        else:
-            raise ValueError("Embeddings visuels CLIP non disponibles")
+        uploaded_image = as_query_image(uploaded_image)
+        digest = uploaded_image.digest
         
-        # Calculer les similarités
-        similarities = cosine_similarity([query_embedding], product_embeddings)[0]
+        def compute():
+            queries = [self.extract_visual_embedding(uploaded_image, backend, digest) for backend in backends]
+            if len(backends) == 1:
+                (store, index), = families
+                if filters is not None:
+                    with span('filtered_search'):
+                        return to_pairs(*snapshot.filters.search(store, queries[0], filters, top_k))
+                with span('index_search'):
+                    return to_pairs(*index.search(queries[0], top_k))
+            
+            rows, scores = self._visual_scores(snapshot, backends, weights, queries, filters)
+            with span('top_k'):
+                selected = top_k_indices(scores, top_k)
+                return to_pairs(rows[selected] if rows is not None else selected, scores[selected])
         
-        # Trier et retourner les top K
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        results = [(idx, similarities[idx]) for idx in top_indices]
+        key = ('image', self._visual_key(backends, weights), digest, top_k,
+               self._results_signature(snapshot, filters, families[0][0].name if len(backends) == 1 else None))
+        return self._cached_results(key, compute)
+    
+    def _text_target(self, snapshot: CatalogSnapshot, encoder: str) -> Tuple:
+        """
+        Embeddings interrogés par une recherche par texte et nom de l'encodeur
         
-        return results
+        Args:
+            snapshot: Version du catalogue
+            encoder: "text" (titres, modèle textuel) ou "clip" (images, tour textuelle de CLIP)
+            
+        Returns:
+            Tuple (EmbeddingStore, index, nom du modèle de requête)
+        """
+        if encoder == 'clip':
+            # Le modèle textuel n'est jamais chargé dans ce mode
+            if snapshot is None:
+                raise ValueError("Embeddings visuels non disponibles")
+            return (*snapshot.visual_family('clip'), clip_text_model_name())
+        if self.text_model is None:
+            raise ValueError("Modèle textuel non disponible")
+        if snapshot is None or snapshot.textual_index is None:
+            raise ValueError("Aucun embedding textuel disponible")
+        return snapshot.textual_embeddings, snapshot.textual_index, self.text_model_name
     
-    def search_by_text(self, query_text: str, top_k: int = 10) -> List[Tuple[int, float]]:
+    @timed('search_text')
+    def search_by_text(self, query_text: str, top_k: int = 10,
+                       filters: SearchFilter = None, text_encoder: str = None) -> List[Tuple[int, float]]:
         """
         Recherche par similarité textuelle
         
+        Avec text_encoder="clip", la requête est encodée par la tour textuelle de
+        CLIP et comparée aux embeddings visuels (recherche texte -> image).
+        Sans filtre, une requête précalculée (tools/precompute_results) est lue
+        dans la version du catalogue sans encodage ni parcours.
+        
         Args:
             query_text: Texte de recherche
             top_k: Nombre de produits à retourner
+            filters: Catégories / fourchette de prix (seules ces lignes sont parcourues)
+            text_encoder: "text" ou "clip" (défaut: TEXT_SEARCH_CONFIG["encoder"])
             
         Returns:
             Liste de tuples (index_produit, score_similarité)
         """
-        # Vérifier que le modèle textuel est disponible
-        if self.text_model is None:
-            raise ValueError("Modèle textuel non disponible")
-        
-        # Extraire l'embedding du texte de recherche
-        query_embedding = self.extract_text_embedding(query_text)
-        
-        # Utiliser les embeddings textuels pré-calculés (version améliorée d'abord, puis basique)
-        if self.textual_embeddings and 'title_embeddings_improved' in self.textual_embeddings:
-            product_embeddings = self.textual_embeddings['title_embeddings_improved']
-        elif self.textual_embeddings and 'title_embeddings_basic' in self.textual_embeddings:
-            product_embeddings = self.textual_embeddings['title_embeddings_basic']
-            st.info("ℹ️ Utilisation des embeddings textuels basiques")
-        else:
-            raise ValueError("Aucun embedding textuel disponible")
-        
-        # Calculer les similarités
-        similarities = cosine_similarity([query_embedding], product_embeddings)[0]
+        count('queries_total', mode='text')
+        snapshot = self.snapshot
+        encoder = resolve_text_encoder(text_encoder)
+        store, index, model_name = self._text_target(snapshot, encoder)
         
-        # Trier et retourner les top K
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        results = [(idx, similarities[idx]) for idx in top_indices]
+        def compute():
+            if filters is None and snapshot.precomputed is not None:
+                found = snapshot.precomputed.lookup(model_name, query_text, top_k)
+                if found is not None:
+                    return to_pairs(*found)
+            if encoder == 'clip':
+                query_embedding = self.extract_clip_text_embedding(query_text)
+            else:
+                query_embedding = self.extract_text_embedding(query_text)
+            if filters is not None:
+                with span('filtered_search'):
+                    return to_pairs(*snapshot.filters.search(store, query_embedding, filters, top_k))
+            with span('index_search'):
+                return to_pairs(*index.search(query_embedding, top_k))
         
-        return results
+        key = ('text', model_name, normalize_text(query_text), top_k,
+               self._results_signature(snapshot, filters, store.name))
+        return self._cached_results(key, compute)
     
-    def combined_search(self, uploaded_image: Image.Image, query_text: str, 
+    @timed('search_combined')
+    def combined_search(self, uploaded_image: ImageInput, query_text: str, 
                        weight_image: float = 0.5, weight_text: float = 0.5, 
-                       top_k: int = 10) -> List[Tuple[int, float]]:
+                       top_k: int = 10, filters: SearchFilter = None, visual_backends=None,
+                       visual_weights=None, fusion: Optional[str] = None) -> List[Tuple[int, float]]:
         """
         Recherche combinée (image + texte)
         
+        Les scores de chaque modalité sont normalisés puis fusionnés (ScoreFusion) ;
+        par défaut, seule l'union des top-N de chaque modalité est rescorée.
+        
         Args:
             uploaded_image: Image uploadée
             query_text: Texte de recherche
             weight_image: Poids pour la similarité visuelle
             weight_text: Poids pour la similarité textuelle
             top_k: Nombre de produits à retourner
+            filters: Catégories / fourchette de prix (seules ces lignes sont parcourues)
+            visual_backends: Backend(s) visuel(s) de la partie image (défaut: VISUAL_SEARCH_CONFIG["default"])
+            visual_weights: Poids de fusion des backends visuels
+            fusion: "weighted", "zscore", "minmax" ou "rrf" (défaut: FUSION_CONFIG["strategy"])
             
         Returns:
             Liste de tuples (index_produit, score_combiné)
         """
-        # Recherche par image
-        image_results = self.search_by_image(uploaded_image, len(self.df))
-        image_scores = {idx: score for idx, score in image_results}
+        count('queries_total', mode='combined')
+        snapshot = self.snapshot
+        backends, weights = resolve_visual_backends(visual_backends, visual_weights)
+        score_fusion = ScoreFusion.create(fusion)
+        self._check_combined(snapshot, backends)
+        modalities = self._combined_modalities(snapshot, backends, weights, weight_image, weight_text)
+        uploaded_image = as_query_image(uploaded_image)
+        digest = uploaded_image.digest
+        
+        def compute():
+            queries = [self.extract_visual_embedding(uploaded_image, backend, digest) for backend in backends]
+            queries.append(self.extract_text_embedding(query_text))
+            return to_pairs(*score_fusion.search(modalities, queries, top_k, snapshot.filters, filters))
+        
+        key = ('combined', self._visual_key(backends, weights), digest,
+               self.text_model_name, normalize_text(query_text),
+               round(weight_image, 4), round(weight_text, 4), top_k, score_fusion.key(),
+               self._fusion_signature(snapshot, modalities, score_fusion, filters))
+        return self._cached_results(key, compute)
+    
+    @timed('search_images')
+    def search_by_images(self, images: List[ImageInput], top_k: int = 10, batch_size: int = None,
+                         filters: SearchFilter = None, visual_backends=None,
+                         visual_weights=None) -> List[List[Tuple[int, float]]]:
+        """
+        Recherche par similarité visuelle pour un lot d'images
+        
+        Résultats et embeddings de requête passent par le cache partagé (mêmes
+        clés que search_by_image) : seules les images absentes sont encodées, en un lot.
+        
+        Args:
+            images: Images de requête
+            top_k: Nombre de produits à retourner par image
+            batch_size: Images par passage dans l'encodeur
+            filters: Filtre appliqué à toutes les images
+            visual_backends: Backend(s) visuel(s) (défaut: VISUAL_SEARCH_CONFIG["default"])
+            visual_weights: Poids de fusion des backends
+            
+        Returns:
+            Une liste de tuples (index_produit, score_similarité) par image
+        """
+        count('queries_total', len(images), mode='image')
+        snapshot = self.snapshot
+        backends, weights = resolve_visual_backends(visual_backends, visual_weights)
+        if snapshot is None:
+            raise ValueError("Embeddings visuels non disponibles")
+        families = [snapshot.visual_family(backend) for backend in backends]
+        images = [as_query_image(image) for image in images]
+        
+        def compute(positions: List[int]) -> List[List[Tuple[int, float]]]:
+            batch = [images[i] for i in positions]
+            queries = [self._query_image_embeddings(batch, backend, batch_size) for backend in backends]
+            if len(backends) == 1:
+                (store, index), = families
+                if filters is not None:
+                    with span('filtered_search'):
+                        found = snapshot.filters.search_batch(store, queries[0], filters, top_k)
+                else:
+                    with span('index_search'):
+                        found = index.search_batch(queries[0], top_k)
+                return [to_pairs(*result) for result in found]
+            
+            results = []
+            block_size = BATCH_CONFIG["query_block_size"]
+            for start in range(0, len(batch), block_size):
+                block = slice(start, start + block_size)
+                rows, scores = self._visual_scores(snapshot, backends, weights,
+                                                   [query[block] for query in queries], filters)
+                with span('top_k'):
+                    selected = top_k_indices_batch(scores, top_k)
+                    results.extend(to_pairs(sel if rows is None else rows[sel], row_scores[sel])
+                                   for sel, row_scores in zip(selected, scores))
+            return results
+        
+        # Mêmes clés que search_by_image : l'interface et l'API partagent les résultats
+        visual_key = self._visual_key(backends, weights)
+        signature = self._results_signature(snapshot, filters, families[0][0].name if len(backends) == 1 else None)
+        return self._batch_results([('image', visual_key, image.digest, top_k, signature) for image in images],
+                                   compute)
+    
+    @timed('search_texts')
+    def search_by_texts(self, query_texts: List[str], top_k: int = 10, batch_size: int = None,
+                        filters: SearchFilter = None, text_encoder: str = None) -> List[List[Tuple[int, float]]]:
+        """
+        Recherche par similarité textuelle pour un lot de requêtes
+        
+        Résultats et embeddings de requête passent par le cache partagé (mêmes
+        clés que search_by_text) : seules les requêtes absentes sont encodées, en un lot.
+        
+        Args:
+            query_texts: Textes de recherche
+            top_k: Nombre de produits à retourner par requête
+            batch_size: Textes par passage dans le modèle textuel
+            filters: Filtre appliqué à toutes les requêtes
+            text_encoder: "text" ou "clip" (défaut: TEXT_SEARCH_CONFIG["encoder"])
+            
+        Returns:
+            Une liste de tuples (index_produit, score_similarité) par requête
+        """
+        count('queries_total', len(query_texts), mode='text')
+        snapshot = self.snapshot
+        encoder = resolve_text_encoder(text_encoder)
+        store, index, model_name = self._text_target(snapshot, encoder)
+        
+        def compute(positions: List[int]) -> List[List[Tuple[int, float]]]:
+            texts = [query_texts[i] for i in positions]
+            # Requêtes précalculées lues directement ; seules les autres sont encodées
+            results = [None] * len(texts)
+            if filters is None and snapshot.precomputed is not None:
+                results = snapshot.precomputed.lookup_batch(model_name, texts, top_k)
+            missing = [i for i, result in enumerate(results) if result is None]
+            if not missing:
+                return [to_pairs(*result) for result in results]
+            
+            query_embeddings = self._query_text_embeddings([texts[i] for i in missing], encoder, model_name,
+                                                           batch_size)
+            if filters is not None:
+                with span('filtered_search'):
+                    found = snapshot.filters.search_batch(store, query_embeddings, filters, top_k)
+            else:
+                with span('index_search'):
+                    found = index.search_batch(query_embeddings, top_k)
+            for i, result in zip(missing, found):
+                results[i] = result
+            return [to_pairs(*result) for result in results]
+        
+        # Mêmes clés que search_by_text
+        signature = self._results_signature(snapshot, filters, store.name)
+        return self._batch_results([('text', model_name, normalize_text(text), top_k, signature)
+                                    for text in query_texts], compute)
+    
+    @timed('search_combined_batch')
+    def combined_searches(self, images: List[ImageInput], query_texts: List[str],
+                          weight_image: float = 0.5, weight_text: float = 0.5,
+                          top_k: int = 10, batch_size: int = None,
+                          filters: SearchFilter = None, visual_backends=None, visual_weights=None,
+                          fusion: Optional[str] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Recherche combinée pour un lot de couples (image, texte)
+        
+        Résultats et embeddings de requête passent par le cache partagé (mêmes
+        clés que combined_search) : seules les absences sont encodées, en un lot.
+        
+        Args:
+            images: Images de requête
+            query_texts: Textes de recherche (un par image)
+            weight_image: Poids pour la similarité visuelle
+            weight_text: Poids pour la similarité textuelle
+            top_k: Nombre de produits à retourner par couple
+            batch_size: Taille des lots d'encodage
+            filters: Filtre appliqué à tous les couples
+            visual_backends: Backend(s) visuel(s) de la partie image (défaut: VISUAL_SEARCH_CONFIG["default"])
+            visual_weights: Poids de fusion des backends visuels
+            fusion: "weighted", "zscore", "minmax" ou "rrf" (défaut: FUSION_CONFIG["strategy"])
+            
+        Returns:
+            Une liste de tuples (index_produit, score_combiné) par couple
+        """
+        count('queries_total', len(images), mode='combined')
+        snapshot = self.snapshot
+        if len(images) != len(query_texts):
+            raise ValueError("Autant d'images que de textes sont attendus")
+        backends, weights = resolve_visual_backends(visual_backends, visual_weights)
+        score_fusion = ScoreFusion.create(fusion)
+        self._check_combined(snapshot, backends)
+        modalities = self._combined_modalities(snapshot, backends, weights, weight_image, weight_text)
+        images = [as_query_image(image) for image in images]
+        text_model_name = self.text_model_name
+        
+        def compute(positions: List[int]) -> List[List[Tuple[int, float]]]:
+            batch = [images[i] for i in positions]
+            queries = [self._query_image_embeddings(batch, backend, batch_size) for backend in backends]
+            queries.append(self._query_text_embeddings([query_texts[i] for i in positions], 'text',
+                                                       text_model_name, batch_size))
+            found = score_fusion.search_batch(modalities, queries, top_k, snapshot.filters, filters,
+                                              BATCH_CONFIG["query_block_size"])
+            return [to_pairs(*result) for result in found]
+        
+        # Mêmes clés que combined_search
+        visual_key = self._visual_key(backends, weights)
+        signature = self._fusion_signature(snapshot, modalities, score_fusion, filters)
+        return self._batch_results([
+            ('combined', visual_key, image.digest, text_model_name, normalize_text(text),
+             round(weight_image, 4), round(weight_text, 4), top_k, score_fusion.key(), signature)
+            for image, text in zip(images, query_texts)
+        ], compute)
+    
+    @timed('similar_products')
+    def similar_products(self, product_index: int, top_k: int = 10, mode: str = 'image',
+                         weight_image: float = 0.5, filters: SearchFilter = None) -> List[Tuple[int, float]]:
+        """
+        Produits similaires à un produit du catalogue
+        
+        Réutilise les embeddings stockés du produit : aucun passage dans CLIP ni
+        dans le modèle textuel. La table des voisins précalculée répond
+        directement ; sinon (table absente, filtre, k trop grand) la recherche
+        est faite à partir du vecteur stocké.
+        
+        Args:
+            product_index: Produit de référence
+            top_k: Nombre de produits à retourner
+            mode: 'image' (CLIP), 'text' (titres) ou 'combined' (fusion de FUSION_CONFIG)
+            weight_image: Poids visuel en mode combiné (le texte reçoit 1 - weight_image)
+            filters: Catégories / fourchette de prix
+            
+        Returns:
+            Liste de tuples (index_produit, score_similarité), produit de référence exclu
+        """
+        count('queries_total', mode='similar')
+        snapshot = self.snapshot
+        if snapshot is None or not 0 <= product_index < len(snapshot):
+            raise ValueError(f"Produit {product_index} hors catalogue")
+        
+        if mode == 'combined':
+            self._check_combined(snapshot)
+            # Même fusion que combined_search (FUSION_CONFIG) avec les vecteurs stockés du produit
+            modalities = self._combined_modalities(snapshot, ('clip',), (1.0,), weight_image, 1.0 - weight_image)
+            queries = [np.asarray(modality.store.matrix[product_index]) for modality in modalities]
+            result = ScoreFusion.create().search(modalities, queries, top_k + 1, snapshot.filters, filters)
+            return [pair for pair in to_pairs(*result) if pair[0] != product_index][:top_k]
+        
+        if mode == 'image':
+            store, index = snapshot.visual_embeddings, snapshot.visual_index
+        elif mode == 'text':
+            store, index = snapshot.textual_embeddings, snapshot.textual_index
+        else:
+            raise ValueError(f"Mode inconnu: {mode}")
+        if store is None:
+            raise ValueError(f"Embeddings indisponibles pour le mode {mode}")
+        
+        # Table précalculée : simple lecture de ligne
+        table = snapshot.neighbors.get(store.name)
+        if filters is None and table is not None and top_k <= table.n_neighbors:
+            return to_pairs(*table.neighbors(product_index, top_k))
+        
+        query = store.matrix[product_index]
+        if filters is not None:
+            result = snapshot.filters.search(store, query, filters, top_k + 1)
+        else:
+            result = index.search(query, top_k + 1)
+        return [pair for pair in to_pairs(*result) if pair[0] != product_index][:top_k]
+    
+    def _check_combined(self, snapshot: CatalogSnapshot, visual_backends: Tuple[str, ...] = ('clip',)):
+        """Vérifie que les embeddings visuels (de chaque backend) et textuels sont disponibles"""
+        if snapshot is None:
+            raise ValueError("Embeddings visuels non disponibles")
+        for backend in visual_backends:
+            snapshot.visual_family(backend)
+        if snapshot.textual_embeddings is None:
+            raise ValueError("Aucun embedding textuel disponible")
+    
+    def _combined_modalities(self, snapshot: CatalogSnapshot, backends: Tuple[str, ...],
+                             weights: Tuple[float, ...], weight_image: float, weight_text: float) -> List[Modality]:
+        """Modalités d'une recherche combinée : chaque backend visuel (part de weight_image), puis le texte"""
+        modalities = [Modality(*snapshot.visual_family(backend), weight_image * weight)
+                      for backend, weight in zip(backends, weights)]
+        modalities.append(Modality(snapshot.textual_embeddings, snapshot.textual_index, weight_text))
+        return modalities
+    
+    def _fusion_signature(self, snapshot: CatalogSnapshot, modalities: List[Modality],
+                          score_fusion: ScoreFusion, filters: SearchFilter = None) -> tuple:
+        """Signature des résultats d'une fusion (index interrogés seulement pour l'ensemble candidat)"""
+        return tuple(self._results_signature(snapshot, filters,
+                                             modality.store.name if score_fusion.candidates > 0 else None)
+                     for modality in modalities)
+    
+    def get_filter_options(self) -> Dict:
+        """
+        Valeurs proposées pour les filtres de recherche
+        
+        N'attend pas le chargement du catalogue : pas de filtre tant qu'il est en cours.
+        
+        Returns:
+            Dictionnaire {categories: liste, price_range: (min, max) ou None}
+        """
+        snapshot = self.catalog.peek() if self.catalog is not None else None
+        if snapshot is None or snapshot.filters is None:
+            return {'categories': [], 'price_range': None}
+        return {'categories': snapshot.filters.categories, 'price_range': snapshot.filters.price_range}
+    
+    def _results_signature(self, snapshot: CatalogSnapshot, filters: SearchFilter = None,
+                           family: Optional[str] = None) -> tuple:
+        """
+        Version du catalogue, backend et réglages de l'index, filtre (font partie des clés de cache des résultats)
+        
+        Args:
+            family: Famille d'embeddings interrogée via son index (None = similarités exactes, sans index)
+        """
+        if filters is not None:
+            # Recherche filtrée : exacte, indépendante du backend
+            return (snapshot.version, 'filtered') + filters.key()
+        if family is None:
+            return (snapshot.version, 'exact')
+        config = EMBEDDING_CONFIG["index"]
+        backend = index_backend(family)
+        return (snapshot.version, backend) + tuple(sorted(config.get(backend, {}).items()))
+    
+    def _cached_results(self, key: tuple, compute) -> List[Tuple[int, float]]:
+        """Résultats top-k depuis le cache partagé, calculés en cas d'absence"""
+        if self.query_cache is None:
+            return compute()
+        return self.query_cache.get_results(key, compute)
+    
+    def _batch_results(self, keys: List[tuple],
+                       compute: Callable[[List[int]], List[List[Tuple[int, float]]]]) -> List[List[Tuple[int, float]]]:
+        """
+        Résultats top-k d'un lot depuis le cache partagé
         
-        # Recherche par texte
-        text_results = self.search_by_text(query_text, len(self.df))
-        text_scores = {idx: score for idx, score in text_results}
+        Args:
+            keys: Clé de cache des résultats de chaque requête
+            compute: Calcule les résultats des positions absentes du cache (un seul appel par lot)
+            
+        Returns:
+            Une liste de tuples (index_produit, score) par requête
+        """
+        if self.query_cache is None:
+            return compute(list(range(len(keys))))
+        results = self.query_cache.lookup_results(keys)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            for i, result in zip(missing, compute(missing)):
+                self.query_cache.put_results(keys[i], result)
+                results[i] = list(result)
+        return results
+    
+    def _batch_embeddings(self, keys: List[tuple], encode: Callable[[List[int]], np.ndarray]) -> np.ndarray:
+        """
+        Embeddings de requête d'un lot depuis le cache partagé
         
-        # Combinaison des scores
-        combined_scores = {}
-        all_indices = set(image_scores.keys()).union(set(text_scores.keys()))
+        Seules les clés absentes sont encodées, en un seul lot et une fois par clé distincte.
         
-        for idx in all_indices:
-            img_score = image_scores.get(idx, 0)
-            txt_score = text_scores.get(idx, 0)
-            combined_score = (weight_image * img_score) + (weight_text * txt_score)
-            combined_scores[idx] = combined_score
+        Args:
+            keys: Clé de cache de l'embedding de chaque requête
+            encode: Encode les requêtes des positions données, matrice (len(positions), d)
+            
+        Returns:
+            Matrice (len(keys), d)
+        """
+        if self.query_cache is None:
+            return encode(list(range(len(keys))))
+        embeddings = self.query_cache.lookup_embeddings(keys)
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            encoded = {key: self.query_cache.put_embedding(key, embedding)
+                       for key, embedding in zip(missing, encode(list(missing.values())))}
+            embeddings = [encoded[key] if embedding is None else embedding
+                          for key, embedding in zip(keys, embeddings)]
+        return np.stack(embeddings)
+    
+    def _query_image_embeddings(self, images: List[QueryImage], backend: str,
+                                batch_size: int = None) -> np.ndarray:
+        """Embeddings d'un lot d'images pour un backend visuel (mêmes clés que extract_visual_embedding)"""
+        keys = [QueryCache.image_key(MODEL_CONFIG["visual_models"][backend], image.digest) for image in images]
+        return self._batch_embeddings(
+            keys, lambda positions: self.extract_visual_embeddings([images[i] for i in positions], backend, batch_size)
+        )
+    
+    def _query_text_embeddings(self, texts: List[str], encoder: str, model_name: str,
+                               batch_size: int = None) -> np.ndarray:
+        """Embeddings d'un lot de textes, "text" ou "clip" (mêmes clés que extract_text_embedding)"""
+        keys = [QueryCache.text_key(model_name, text) for text in texts]
+        extract = self.extract_clip_text_embeddings if encoder == 'clip' else self.extract_text_embeddings
+        return self._batch_embeddings(keys, lambda positions: extract([texts[i] for i in positions], batch_size))
+    
+    def get_metrics(self) -> Dict:
+        """
+        Durées par étape et compteurs des recherches du processus
         
-        # Trier et retourner les top K
-        sorted_results = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
-        return sorted_results[:top_k]
+        Returns:
+            Dictionnaire {stages: {étape: {count, total_s, mean_ms, p50_ms, p95_ms}},
+            counters: {métrique: {étiquettes: valeur}}}
+        """
+        metrics = get_metrics()
+        return {'stages': metrics.stages(), 'counters': metrics.counters()}
+    
+    def get_cache_stats(self) -> Dict:
+        """
+        Compteurs du cache des requêtes et des résultats précalculés de la version courante
+        
+        Returns:
+            Dictionnaire {cache: {entries, hits, disk_hits, misses, hit_rate}}
+        """
+        stats = self.query_cache.stats() if self.query_cache is not None else {}
+        snapshot = self.catalog.peek() if self.catalog is not None else None
+        if snapshot is not None and snapshot.precomputed is not None:
+            stats['precomputed'] = snapshot.precomputed.stats()
+        return stats
     
     def get_product_info(self, product_index: int) -> Dict:
         """
         Récupère les informations d'un produit
         
         Args:
-            product_index: Index du produit dans le DataFrame
+            product_index: Index du produit dans le catalogue
             
         Returns:
             Dictionnaire contenant les informations du produit
         """
-        if self.df is None or product_index >= len(self.df):
+        products = self.products
+        if products is None:
             return {}
+        with span('product_info'):
+            return products.get_product_info(product_index)
+    
+    def get_products_info(self, product_indices: List[int]) -> List[Dict]:
+        """
+        Récupère les informations d'un lot de produits
         
-        product = self.df.iloc[product_index]
-        return {
-            'title': product.get('title', 'N/A'),
-            'price': product.get('price', 'N/A'),
-            'category': product.get('category2_code', 'N/A'),
-            'image_url': product.get('imageurl', ''),
-            'product_code': product.get('product_code', 'N/A')
-        }
+        Args:
+            product_indices: Index des produits dans le catalogue
+            
+        Returns:
+            Un dictionnaire par produit (vide si l'index est hors catalogue)
+        """
+        products = self.products
+        if products is None:
+            return [{} for _ in product_indices]
+        with span('product_info'):
+            return products.get_products_info(product_indices)
@@ -0,0 +1,628 @@
+"""
+Registre partagé des modèles et embeddings
+
+Les ressources lourdes (CLIP, SentenceTransformer, dataset, embeddings) sont
+chargées une seule fois par processus puis partagées en lecture seule entre
+toutes les sessions Streamlit.
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..core.config import (
+    get_models_directory, MODEL_CONFIG, EMBEDDING_CONFIG, EMBEDDING_STORE_CONFIG, CACHE_CONFIG,
+    CATALOG_CONFIG, PRODUCT_STORE_CONFIG, LOADING_CONFIG, INFERENCE_CONFIG,
+    TEXT_SEARCH_CONFIG
+)
+from .metrics import cache_samples, count, get_metrics, span
+
+
+def get_rss_bytes() -> int:
+    """
+    Retourne la mémoire résidente (RSS) actuelle du processus
+
+    Returns:
+        RSS en octets (0 si la mesure est impossible)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss est en octets sous macOS, en kilo-octets sous Linux
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+@dataclass
+class ComponentStats:
+    """Statistiques de chargement d'un composant"""
+    name: str
+    load_time: float
+    rss_before: int
+    rss_after: int
+    # D'autres chargements ont eu lieu en même temps : le delta RSS leur est en partie dû
+    overlapped: bool = False
+
+    @property
+    def rss_delta(self) -> int:
+        """Mémoire résidente ajoutée par le chargement (octets)"""
+        return max(0, self.rss_after - self.rss_before)
+
+    def to_dict(self) -> Dict:
+        return {
+            'component': self.name,
+            'load_time_s': round(self.load_time, 3),
+            'rss_delta_mb': round(self.rss_delta / 1024 ** 2, 1),
+            'rss_total_mb': round(self.rss_after / 1024 ** 2, 1),
+            'rss_approximate': self.overlapped
+        }
+
+
+_MISSING = object()
+
+
+class ResourceRegistry:
+    """
+    Registre de ressources chargées une seule fois et partagées entre threads
+
+    Chaque ressource est identifiée par une clé. Le premier appelant exécute le
+    chargeur pendant que les autres attendent sur un verrou propre à la clé ;
+    les ressources distinctes peuvent donc se charger en parallèle, par
+    exemple en arrière-plan via submit().
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, Any] = {}
+        self._stats: Dict[str, ComponentStats] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, Future] = {}
+        self._task_times: Dict[str, List[float]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Chargements en cours et nombre de chargements commencés (chevauchements)
+        self._active_loads = 0
+        self._started_loads = 0
+
+    def _get_key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Retourne la ressource associée à la clé, en la chargeant si nécessaire
+
+        Args:
+            key: Identifiant de la ressource
+            loader: Fonction sans argument qui construit la ressource
+
+        Returns:
+            La ressource partagée
+        """
+        resource = self._resources.get(key, _MISSING)
+        if resource is not _MISSING:
+            return resource
+
+        with self._get_key_lock(key):
+            resource = self._resources.get(key, _MISSING)
+            if resource is not _MISSING:
+                return resource
+
+            with self._lock:
+                overlapped = self._active_loads > 0
+                self._active_loads += 1
+                self._started_loads += 1
+                started = self._started_loads
+            rss_before = get_rss_bytes()
+            start = time.perf_counter()
+            try:
+                resource = loader()
+            finally:
+                with self._lock:
+                    self._active_loads -= 1
+                    overlapped = overlapped or self._active_loads > 0 or self._started_loads != started
+            load_time = time.perf_counter() - start
+
+            self._stats[key] = ComponentStats(key, load_time, rss_before, get_rss_bytes(), overlapped)
+            self._resources[key] = resource
+            return resource
+
+    def submit(self, name: str, task: Callable[[], Any]) -> Future:
+        """
+        Lance un chargement en arrière-plan (une seule fois par nom)
+
+        Un chargement échoué est relancé au prochain appel.
+
+        Args:
+            name: Nom du composant (ex: "clip", "text_model")
+            task: Fonction de chargement, qui passe normalement par get_or_load
+
+        Returns:
+            Future du résultat
+        """
+        with self._lock:
+            future = self._tasks.get(name)
+            if future is not None and not (future.done() and future.exception() is not None):
+                return future
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=LOADING_CONFIG["workers"],
+                                                    thread_name_prefix="loader")
+            times = self._task_times[name] = [time.time()]
+
+            def run():
+                try:
+                    return task()
+                finally:
+                    times.append(time.time())
+
+            future = self._executor.submit(run)
+            self._tasks[name] = future
+            return future
+
+    def task_status(self) -> List[Dict]:
+        """
+        État des chargements lancés par submit()
+
+        Returns:
+            Liste de dictionnaires (composant, état, durée, erreur)
+        """
+        with self._lock:
+            tasks = list(self._tasks.items())
+        rows = []
+        for name, future in tasks:
+            times = self._task_times.get(name, [time.time()])
+            elapsed = (times[1] if len(times) > 1 else time.time()) - times[0]
+            error = future.exception() if future.done() else None
+            rows.append({
+                'component': name,
+                'state': 'loading' if not future.done() else ('failed' if error is not None else 'ready'),
+                'seconds': round(elapsed, 2),
+                'error': str(error) if error is not None else None
+            })
+        return rows
+
+    def is_loaded(self, key: str) -> bool:
+        """Indique si la ressource est déjà en mémoire"""
+        return key in self._resources
+
+    def stats(self) -> List[ComponentStats]:
+        """Statistiques de chargement, dans l'ordre de chargement"""
+        return list(self._stats.values())
+
+    def report(self) -> List[Dict]:
+        """Statistiques de chargement sous forme de dictionnaires"""
+        return [stats.to_dict() for stats in self.stats()]
+
+    def evict(self, predicate: Callable[[str], bool]) -> List[str]:
+        """
+        Oublie les ressources dont la clé satisfait le prédicat
+
+        Les objets restent vivants tant qu'ils sont référencés ailleurs
+        (par exemple par une recherche en cours).
+
+        Returns:
+            Clés oubliées
+        """
+        with self._lock:
+            keys = [key for key in self._resources if predicate(key)]
+            for key in keys:
+                self._resources.pop(key, None)
+                self._stats.pop(key, None)
+                self._key_locks.pop(key, None)
+        return keys
+
+    def clear(self):
+        """Oublie toutes les ressources (utile pour les tests et le rechargement)"""
+        with self._lock:
+            self._resources.clear()
+            self._stats.clear()
+            self._key_locks.clear()
+            self._tasks.clear()
+            self._task_times.clear()
+
+
+_registry: Optional[ResourceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ResourceRegistry:
+    """Retourne le registre unique du processus"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ResourceRegistry()
+    return _registry
+
+
+# ---------------------------------------------------------------------------
+# Chargeurs des ressources partagées
+# ---------------------------------------------------------------------------
+
+def load_product_store(artifact_dir: str):
+    """
+    Charge les informations produits du dataset (partagées)
+
+    Seules les colonnes affichées sont gardées en mémoire ; la sauvegarde
+    binaire évite de relire le CSV aux démarrages suivants.
+
+    Returns:
+        ProductStore, ou None si le dataset est absent
+    """
+    from .product_store import ProductStore
+
+    csv_path = os.path.join(artifact_dir, 'df_clean_indexed.csv')
+    if not os.path.exists(csv_path):
+        return None
+
+    def loader():
+        if PRODUCT_STORE_CONFIG["persist"]:
+            return ProductStore.from_csv_cached(csv_path, PRODUCT_STORE_CONFIG["cache_dir"],
+                                                PRODUCT_STORE_CONFIG["mmap"])
+        return ProductStore.from_csv(csv_path)
+
+    return get_registry().get_or_load(f"products:{csv_path}", loader)
+
+
+def load_embedding_store(npz_path: str, key: str):
+    """
+    Charge une matrice d'embeddings normalisée (partagée, lecture seule)
+
+    Args:
+        npz_path: Archive .npz contenant la matrice
+        key: Nom de la matrice dans l'archive
+
+    Returns:
+        EmbeddingStore, ou None si l'archive ou la matrice est absente
+    """
+    from .embedding_store import EmbeddingStore, list_npz_keys
+
+    if key not in list_npz_keys(npz_path):
+        return None
+
+    def loader():
+        with span('load_embeddings'):
+            return EmbeddingStore.from_npz(
+                npz_path, key,
+                mmap=EMBEDDING_STORE_CONFIG["mmap"],
+                sidecar_dir=EMBEDDING_STORE_CONFIG["sidecar_dir"],
+                block_memory_mb=EMBEDDING_STORE_CONFIG["block_memory_mb"]
+            )
+
+    return get_registry().get_or_load(f"embeddings:{npz_path}:{key}", loader)
+
+
+def index_backend(family: str) -> str:
+    """Backend d'index d'une famille d'embeddings (EMBEDDING_CONFIG["index"], propre à la famille ou global)"""
+    config = EMBEDDING_CONFIG["index"]
+    return config.get("family_backends", {}).get(family, config["backend"])
+
+
+def load_vector_index(store, npz_path: str):
+    """
+    Charge ou construit l'index de recherche d'une matrice d'embeddings (partagé)
+
+    Le backend et ses réglages viennent de EMBEDDING_CONFIG["index"]
+    (backend propre à la famille dans "family_backends", sinon "backend").
+
+    Args:
+        store: EmbeddingStore indexé
+        npz_path: Archive d'origine (sert à nommer et dater la sauvegarde)
+
+    Returns:
+        VectorIndex prêt à l'emploi
+    """
+    from .embedding_store import sidecar_path
+    from .index import build_or_load_index
+
+    config = EMBEDDING_CONFIG["index"]
+    backend = index_backend(store.name)
+
+    def loader():
+        base_path = None
+        if config["persist"]:
+            npy_path = sidecar_path(npz_path, store.name, EMBEDDING_STORE_CONFIG["sidecar_dir"])
+            base_path = os.path.splitext(npy_path)[0]
+        return build_or_load_index(
+            backend, store.matrix,
+            base_path=base_path,
+            source_mtime=os.path.getmtime(npz_path),
+            mmap=EMBEDDING_STORE_CONFIG["mmap"],
+            **config.get(backend, {})
+        )
+
+    return get_registry().get_or_load(f"index:{backend}:{npz_path}:{store.name}", loader)
+
+
+def load_neighbor_table(artifact_dir: str, key: str):
+    """
+    Table des voisins précalculée d'une famille d'embeddings (projetée en mémoire)
+
+    Returns:
+        NeighborTable, ou None si elle n'a pas été calculée pour cette version
+    """
+    from .neighbors import NeighborTable, neighbors_paths
+
+    if not all(os.path.exists(path) for path in neighbors_paths(artifact_dir, key)):
+        return None
+    return get_registry().get_or_load(f"neighbors:{os.path.join(artifact_dir, 'neighbors.')}{key}",
+                                       lambda: NeighborTable.load(artifact_dir, key))
+
+
+def load_precomputed_results(artifact_dir: str, version: Optional[str] = None):
+    """
+    Résultats précalculés des requêtes fréquentes d'une version (projetés en mémoire)
+
+    Returns:
+        PrecomputedResults, ou None s'ils n'ont pas été calculés pour cette version
+    """
+    from .precomputed import PRECOMPUTED_FILE, PrecomputedResults
+
+    path = os.path.join(artifact_dir, PRECOMPUTED_FILE)
+    if not os.path.exists(path):
+        return None
+
+    def loader():
+        results = PrecomputedResults.load(artifact_dir, version)
+        if results is not None:
+            # Compteurs de la dernière version chargée
+            get_metrics().add_collector('precomputed', lambda: cache_samples('precomputed', results.stats()))
+        return results
+
+    return get_registry().get_or_load(f"precomputed:{path}", loader)
+
+
+def load_query_cache():
+    """
+    Cache des requêtes partagé par toutes les sessions
+
+    Returns:
+        QueryCache, ou None si le cache est désactivé
+    """
+    from .cache import QueryCache
+
+    if not CACHE_CONFIG["enabled"]:
+        return None
+
+    def loader():
+        cache = QueryCache(
+            embedding_max_entries=CACHE_CONFIG["embedding_max_entries"],
+            result_max_entries=CACHE_CONFIG["result_max_entries"],
+            ttl_seconds=CACHE_CONFIG["ttl_seconds"],
+            disk_dir=CACHE_CONFIG["disk_dir"]
+        )
+        get_metrics().add_collector('query_cache', lambda: [
+            sample for name, stats in cache.stats().items() for sample in cache_samples(name, stats)
+        ])
+        return cache
+
+    return get_registry().get_or_load("query_cache", loader)
+
+
+def load_catalog_manager(models_dir: str):
+    """
+    Gestionnaire de la version courante du catalogue (partagé)
+
+    La surveillance des nouvelles versions démarre si CATALOG_CONFIG["watch"].
+
+    Returns:
+        CatalogManager
+    """
+    from .catalog import CatalogManager
+
+    def loader():
+        manager = CatalogManager(models_dir)
+        if CATALOG_CONFIG["watch"]:
+            manager.start_watcher(CATALOG_CONFIG["watch_interval"])
+        return manager
+
+    return get_registry().get_or_load(f"catalog_manager:{models_dir}", loader)
+
+
+def load_clip(device: str) -> Tuple[Any, Any]:
+    """
+    Charge le modèle CLIP (partagé, en mode évaluation)
+
+    Returns:
+        Tuple (modèle, fonction de préprocessing)
+    """
+    model_name = MODEL_CONFIG["visual_models"]["clip"]
+
+    def loader():
+        import clip
+
+        model, preprocess = clip.load(model_name, device=device)
+        model.eval()
+        for param in model.parameters():
+            param.requires_grad_(False)
+        return model, preprocess
+
+    return get_registry().get_or_load(f"clip:{model_name}:{device}", loader)
+
+
+def load_text_model() -> Tuple[Any, Optional[str], List[Tuple[str, str]]]:
+    """
+    Charge le premier modèle textuel disponible (partagé)
+
+    Returns:
+        Tuple (modèle ou None, nom du modèle, liste des échecs (nom, erreur))
+    """
+    def loader():
+        from sentence_transformers import SentenceTransformer
+
+        failures = []
+        for model_name in MODEL_CONFIG["text_models"]:
+            try:
+                model = SentenceTransformer(model_name)
+                model.eval()
+                return model, model_name, failures
+            except Exception as e:
+                failures.append((model_name, str(e)))
+                count('model_fallbacks_total', encoder='text', kind='model')
+        return None, None, failures
+
+    return get_registry().get_or_load("text_model", loader)
+
+
+def load_clip_encoder(device: str) -> Tuple[Any, Any]:
+    """
+    Encodeur d'images CLIP des requêtes, avec le backend de INFERENCE_CONFIG (partagé)
+
+    Le modèle d'origine (load_clip) reste la référence de validation et sert
+    à l'indexation hors ligne.
+
+    Returns:
+        Tuple (ImageEncoder, fonction de préprocessing)
+    """
+    model_name = MODEL_CONFIG["visual_models"]["clip"]
+    backend = INFERENCE_CONFIG["clip_backend"]
+
+    def loader():
+        from .inference import build_clip_encoder
+
+        model, preprocess = load_clip(device)
+        return build_clip_encoder(model, preprocess, device, model_name), preprocess
+
+    return get_registry().get_or_load(f"clip_encoder:{model_name}:{device}:{backend}", loader)
+
+
+def load_text_encoder() -> Tuple[Any, Optional[str], List[Tuple[str, str]]]:
+    """
+    Modèle textuel des requêtes, avec le backend de INFERENCE_CONFIG (partagé)
+
+    Returns:
+        Tuple (modèle ou None, nom du modèle, liste des échecs (nom, erreur)), comme load_text_model
+    """
+    backend = INFERENCE_CONFIG["text_backend"]
+
+    def loader():
+        from .inference import optimize_text_model
+
+        model, model_name, failures = load_text_model()
+        if model is None:
+            return model, model_name, failures
+        return optimize_text_model(model, model_name), model_name, failures
+
+    return get_registry().get_or_load(f"text_encoder:{backend}", loader)
+
+
+def load_clip_text_encoder(device: str):
+    """
+    Tour textuelle de CLIP pour la recherche texte -> image (partagée)
+
+    Réutilise le modèle CLIP de load_clip (déjà résident pour la recherche
+    par image) : aucun second modèle chargé.
+
+    Returns:
+        ClipTextEncoder
+    """
+    def loader():
+        from .text_encoders import ClipTextEncoder
+
+        model, _ = load_clip(device)
+        return ClipTextEncoder(model, device)
+
+    return get_registry().get_or_load(f"clip_text_encoder:{MODEL_CONFIG['visual_models']['clip']}:{device}", loader)
+
+
+def load_visual_encoder(backend: str, device: str, models_dir: str = None):
+    """
+    Encodeur d'images de requête d'un backend visuel autre que CLIP (partagé, chargé au premier usage)
+
+    CLIP garde son chargeur (load_clip_encoder) et ses backends d'inférence optimisés.
+
+    Args:
+        backend: "resnet", "vit" ou "cnn" (VISUAL_SEARCH_CONFIG["families"])
+        device: Device PyTorch
+        models_dir: Répertoire des modèles (modèle Keras du backend "cnn")
+
+    Returns:
+        VisualEncoder
+    """
+    from .visual_encoders import build_visual_encoder
+
+    model_name = MODEL_CONFIG["visual_models"][backend]
+    return get_registry().get_or_load(
+        f"visual_encoder:{backend}:{model_name}:{device}",
+        lambda: build_visual_encoder(backend, device, models_dir or get_models_directory())
+    )
+
+
+def start_warmup(models_dir: str = None, device: str = None) -> List[Future]:
+    """
+    Lance en arrière-plan le chargement des composants de LOADING_CONFIG["preload"]
+
+    Appelé dans le processus qui sert les requêtes (application Streamlit, API) :
+    les ressources chargées sont celles que les recherches utiliseront.
+    Chaque composant n'est lancé qu'une fois par processus (submit).
+
+    Args:
+        models_dir: Répertoire des modèles
+        device: Device PyTorch ("cpu" ou "cuda")
+
+    Returns:
+        Futures des chargements lancés
+    """
+    models_dir = models_dir or get_models_directory()
+    if device is None:
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    # Les composants indépendants se chargent en parallèle
+    registry = get_registry()
+    preload = LOADING_CONFIG["preload"]
+    futures = []
+    if 'catalog' in preload:
+        futures.append(registry.submit('catalog', lambda: load_catalog_manager(models_dir).current))
+    # Sans "text" dans PRELOAD_MODELS (recherche par texte via CLIP), le modèle textuel
+    # n'est chargé qu'à la première recherche qui en a besoin
+    if 'text' in preload:
+        futures.append(registry.submit('text_model', load_text_encoder))
+    if 'clip' in preload:
+        futures.append(registry.submit('clip', lambda: load_clip_encoder(device)))
+    if 'clip_text' in preload or TEXT_SEARCH_CONFIG["encoder"] == 'clip':
+        futures.append(registry.submit('clip_text', lambda: load_clip_text_encoder(device)))
+    # Autres backends visuels demandés au démarrage (PRELOAD_MODELS)
+    for backend in preload:
+        if backend in MODEL_CONFIG["visual_models"] and backend != "clip":
+            futures.append(registry.submit(f'visual:{backend}',
+                                           lambda backend=backend: load_visual_encoder(backend, device, models_dir)))
+    return futures
+
+
+def warmup(models_dir: str = None, device: str = None) -> List[Dict]:
+    """
+    Précharge les ressources partagées et attend la fin des chargements
+
+    Args:
+        models_dir: Répertoire des modèles
+        device: Device PyTorch ("cpu" ou "cuda")
+
+    Returns:
+        Statistiques de chargement de chaque composant
+    """
+    for future in start_warmup(models_dir, device):
+        future.result()
+    return get_registry().report()
+
+
+if __name__ == "__main__":
+    # Vérification des artefacts et téléchargement des poids : python -m src.models.registry
+    for row in warmup():
+        approximate = '~' if row['rss_approximate'] else ' '
+        print(f"{row['component']:<60} {row['load_time_s']:>8.3f}s "
+              f"{approximate}+{row['rss_delta_mb']:>8.1f} MB (total {row['rss_total_mb']:.1f} MB)")
@@ -0,0 +1,197 @@
+"""
+Similarités en flux sur une matrice d'embeddings projetée en mémoire
+
+La matrice est parcourue par blocs de lignes de taille fixe. Pour un .npy
+projeté en mémoire, chaque bloc est lu dans une projection propre au parcours
+puis ses pages sont rendues au noyau (madvise) : la mémoire résidente reste
+bornée par la taille des blocs en cours, quelle que soit la taille du catalogue.
+Un top-k courant est fusionné bloc après bloc ; les blocs peuvent être répartis
+sur un pool de threads (le produit matriciel NumPy libère le GIL).
+"""
+
+import mmap
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .ranking import top_k_indices_batch
+
+
+def block_rows_for(dim: int, block_memory_mb: float, itemsize: int = 4) -> int:
+    """Lignes par bloc pour qu'un bloc occupe au plus block_memory_mb"""
+    return max(1, int(block_memory_mb * 1024 ** 2 // (dim * itemsize)))
+
+
+def _read_npy_header(path: str) -> Optional[Tuple[Tuple[int, ...], np.dtype, int]]:
+    """Forme, type et position des données d'un .npy (None si ordre Fortran ou version non gérée)"""
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        else:
+            return None
+        return (None if fortran_order else (shape, dtype, f.tell()))
+
+
+class RowBlocks:
+    """
+    Accès par blocs de lignes à une matrice (n, d)
+
+    Si la matrice est un .npy entier projeté en mémoire (EmbeddingStore.from_npy),
+    les blocs sont lus dans une projection dédiée dont les pages sont libérées
+    après usage ; sinon les blocs sont de simples vues de la matrice.
+    """
+
+    def __init__(self, matrix: np.ndarray, block_rows: int):
+        """
+        Args:
+            matrix: Matrice (n, d), en mémoire ou np.memmap
+            block_rows: Lignes par bloc
+        """
+        self.matrix = matrix
+        self.block_rows = max(1, block_rows)
+        self._buffer: Optional[mmap.mmap] = None
+        self._offset = 0
+
+        filename = getattr(matrix, 'filename', None)
+        if isinstance(matrix, np.memmap) and filename and matrix.flags.c_contiguous:
+            header = _read_npy_header(filename)
+            # Seule une projection du fichier entier (pas une vue partielle) est relue directement
+            if header is not None and header == (matrix.shape, matrix.dtype, matrix.offset):
+                with open(filename, 'rb') as f:
+                    self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._offset = matrix.offset
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    self._buffer.madvise(mmap.MADV_SEQUENTIAL)
+
+    @property
+    def streamed(self) -> bool:
+        """True si les pages lues sont rendues au noyau après chaque bloc"""
+        return self._buffer is not None
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def ranges(self) -> Iterator[Tuple[int, int]]:
+        """Bornes (début, fin) de chaque bloc"""
+        n = len(self)
+        for start in range(0, n, self.block_rows):
+            yield start, min(start + self.block_rows, n)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Bloc de lignes [start, end) (vue, sans copie)"""
+        if self._buffer is None:
+            return self.matrix[start:end]
+        dim = self.matrix.shape[1]
+        return np.frombuffer(self._buffer, dtype=self.matrix.dtype, count=(end - start) * dim,
+                             offset=self._offset + start * dim * self.matrix.itemsize).reshape(end - start, dim)
+
+    def release(self, start: int, end: int):
+        """Rend au noyau les pages du bloc [start, end) (relues depuis le cache de pages si besoin)"""
+        if self._buffer is None or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        row_bytes = self.matrix.shape[1] * self.matrix.itemsize
+        first = (self._offset + start * row_bytes) // mmap.PAGESIZE * mmap.PAGESIZE
+        last = self._offset + end * row_bytes
+        self._buffer.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+
+class RunningTopK:
+    """
+    Top-k courant d'un lot de requêtes, fusionné bloc après bloc
+
+    Joue le rôle d'un tas borné à k éléments par requête, mais fusionne tout
+    un bloc de candidats à la fois (sélection vectorisée au lieu d'insertions).
+    """
+
+    def __init__(self, n_queries: int, top_k: int):
+        self.top_k = top_k
+        self.indices = np.empty((n_queries, 0), dtype=np.int64)
+        self.scores = np.empty((n_queries, 0), dtype=np.float32)
+
+    def push(self, indices: np.ndarray, scores: np.ndarray):
+        """
+        Ajoute des candidats
+
+        Args:
+            indices: Matrice (q, m) d'indices produits
+            scores: Matrice (q, m) de scores correspondants
+        """
+        indices = np.concatenate([self.indices, indices], axis=1)
+        scores = np.concatenate([self.scores, scores], axis=1)
+        selected = top_k_indices_batch(scores, self.top_k)
+        self.indices = np.take_along_axis(indices, selected, axis=1)
+        self.scores = np.take_along_axis(scores, selected, axis=1)
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Tuple (indices (q, k), scores (q, k)) triés par score décroissant"""
+        return self.indices, self.scores
+
+
+def _map_blocks(blocks: RowBlocks, process: Callable, executor: Optional[Executor],
+                max_in_flight: int) -> Iterator:
+    """Applique process à chaque bloc ; au plus max_in_flight blocs en cours avec un pool"""
+    if executor is None:
+        for bounds in blocks.ranges():
+            yield process(bounds)
+        return
+
+    pending = deque()
+    for bounds in blocks.ranges():
+        pending.append(executor.submit(process, bounds))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def streaming_top_k(blocks: RowBlocks, queries: np.ndarray, top_k: int,
+                    executor: Optional[Executor] = None, max_in_flight: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k exact d'un lot de requêtes, la matrice étant lue par blocs
+
+    Args:
+        blocks: Matrice découpée en blocs de lignes
+        queries: Matrice (q, d) de requêtes normalisées
+        top_k: Nombre de voisins par requête
+        executor: Pool de threads (None = blocs traités un à un)
+        max_in_flight: Blocs traités simultanément avec un pool (borne la mémoire)
+
+    Returns:
+        Tuple (indices (q, k), scores (q, k)) triés par score décroissant
+    """
+    def process(bounds):
+        start, end = bounds
+        scores = queries @ blocks.read(start, end).T
+        blocks.release(start, end)
+        selected = top_k_indices_batch(scores, top_k)
+        return start + selected, np.take_along_axis(scores, selected, axis=1)
+
+    running = RunningTopK(queries.shape[0], top_k)
+    for indices, scores in _map_blocks(blocks, process, executor, max_in_flight):
+        running.push(indices, scores)
+    return running.result()
+
+
+def streaming_scores(blocks: RowBlocks, queries: np.ndarray, executor: Optional[Executor] = None,
+                     max_in_flight: int = 1) -> np.ndarray:
+    """
+    Similarités (q, n) de requêtes normalisées avec toutes les lignes, calculées par blocs
+
+    Seul le résultat (q x n float32) est alloué en entier, jamais la matrice.
+    """
+    output = np.empty((queries.shape[0], len(blocks)), dtype=np.float32)
+
+    def process(bounds):
+        start, end = bounds
+        output[:, start:end] = queries @ blocks.read(start, end).T
+        blocks.release(start, end)
+
+    for _ in _map_blocks(blocks, process, executor, max_in_flight):
+        pass
+    return output
+
@@ -0,0 +1,90 @@
+"""
+Encodeurs des requêtes textuelles : modèle textuel ou tour textuelle de CLIP
+
+- "text" : SentenceTransformer (MODEL_CONFIG["text_models"]), comparé aux
+  embeddings des titres des produits
+- "clip" : tour textuelle de CLIP (model.encode_text), comparée directement
+  aux embeddings visuels clip_embeddings : une description ("sac matelassé
+  noir chaîne dorée") retrouve les produits dont l'image lui ressemble
+
+Le modèle CLIP est celui déjà chargé pour la recherche par image : le mode
+"clip" n'a pas besoin du SentenceTransformer (ni de sa mémoire, ni de son
+temps de chargement) si "text" est retiré de PRELOAD_MODELS.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+
+from ..core.config import BATCH_CONFIG, EMBEDDING_CONFIG, MODEL_CONFIG, TEXT_SEARCH_CONFIG
+from .metrics import span
+
+TEXT_ENCODERS = ("text", "clip")
+
+
+def resolve_text_encoder(encoder: Optional[str] = None) -> str:
+    """
+    Encodeur d'une recherche par texte
+
+    Args:
+        encoder: "text" ou "clip" (défaut: TEXT_SEARCH_CONFIG["encoder"])
+
+    Raises:
+        ValueError: encodeur inconnu
+    """
+    encoder = encoder or TEXT_SEARCH_CONFIG["encoder"]
+    if encoder not in TEXT_ENCODERS:
+        raise ValueError(f"Encodeur de texte inconnu: {encoder} (disponibles: {list(TEXT_ENCODERS)})")
+    return encoder
+
+
+def clip_text_model_name() -> str:
+    """Nom de la tour textuelle de CLIP (clé du cache des embeddings de requête)"""
+    return f"clip-text:{MODEL_CONFIG['visual_models']['clip']}"
+
+
+class ClipTextEncoder:
+    """
+    Tour textuelle de CLIP : textes -> embeddings dans l'espace des images
+    """
+
+    def __init__(self, model, device: str):
+        """
+        Args:
+            model: Modèle CLIP chargé (registry.load_clip, partagé avec la recherche par image)
+            device: Device PyTorch du modèle
+        """
+        self.model = model
+        self.device = device
+        self.model_name = clip_text_model_name()
+
+    @property
+    def dim(self) -> int:
+        return EMBEDDING_CONFIG["visual_embeddings"]["clip_embeddings"]
+
+    def encode(self, texts: Sequence[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Embeddings d'une liste de textes, par lots
+
+        Les textes au-delà de la fenêtre de CLIP (77 tokens) sont tronqués.
+
+        Args:
+            texts: Textes à encoder
+            batch_size: Textes par passage dans le modèle (défaut: BATCH_CONFIG)
+
+        Returns:
+            Matrice (n_textes, 512) float32
+        """
+        import clip
+        import torch
+
+        texts = list(texts)
+        batch_size = batch_size or BATCH_CONFIG["text_batch_size"]
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            tokens = clip.tokenize(texts[start:start + batch_size], truncate=True).to(self.device)
+            with span('encode_text_clip'), torch.no_grad():
+                embeddings.append(self.model.encode_text(tokens).float().cpu().numpy())
+        if not embeddings:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.concatenate(embeddings).astype(np.float32, copy=False)
@@ -0,0 +1,201 @@
+"""
+Encodeurs d'images des backends visuels (CLIP, ResNet, ViT, CNN maison)
+
+Chaque backend associe un encodeur de requête à sa matrice d'embeddings
+précalculée (VISUAL_SEARCH_CONFIG["families"]). Les encodeurs sont chargés à
+la première recherche qui les utilise (registry.load_visual_encoder, ou
+registry.load_clip_encoder pour CLIP), jamais tous au démarrage. Plusieurs
+backends peuvent être fusionnés (fusion tardive : somme pondérée des
+similarités cosinus de chaque famille).
+
+Dépendances par backend :
+- "clip"   : clip (modèle de référence de l'application)
+- "resnet" : torchvision
+- "vit"    : timm (optionnel)
+- "cnn"    : keras / tensorflow (optionnel), modèle cnn_embedding_model.h5
+"""
+
+import os
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from ..core.config import BATCH_CONFIG, EMBEDDING_CONFIG, MODEL_CONFIG, VISUAL_SEARCH_CONFIG
+from .images import ImageInput, as_query_image
+from .metrics import span
+
+CNN_INPUT_SIZE = 224
+
+
+def visual_family(backend: str) -> str:
+    """
+    Matrice d'embeddings d'un backend visuel
+
+    Raises:
+        ValueError: backend inconnu
+    """
+    families = VISUAL_SEARCH_CONFIG["families"]
+    if backend not in families:
+        raise ValueError(f"Backend visuel inconnu: {backend} (disponibles: {list(families)})")
+    return families[backend]
+
+
+def resolve_visual_backends(backends: Union[None, str, Sequence[str]] = None,
+                            weights: Optional[Sequence[float]] = None) -> Tuple[Tuple[str, ...], Tuple[float, ...]]:
+    """
+    Backends visuels d'une recherche et leurs poids de fusion normalisés
+
+    Args:
+        backends: Nom ou liste de noms (défaut: VISUAL_SEARCH_CONFIG["default"])
+        weights: Poids relatifs, un par backend (défaut: VISUAL_SEARCH_CONFIG["fusion_weights"])
+
+    Returns:
+        Tuple (backends, poids de somme 1)
+    """
+    if not backends:
+        backends = (VISUAL_SEARCH_CONFIG["default"],)
+    elif isinstance(backends, str):
+        backends = (backends,)
+    backends = tuple(backends)
+    for backend in backends:
+        visual_family(backend)
+    if len(set(backends)) != len(backends):
+        raise ValueError(f"Backend visuel en double: {list(backends)}")
+
+    if weights is None:
+        weights = [VISUAL_SEARCH_CONFIG["fusion_weights"].get(backend, 1.0) for backend in backends]
+    if len(weights) != len(backends):
+        raise ValueError("Autant de poids que de backends visuels sont attendus")
+    total = float(sum(weights))
+    if total <= 0 or min(weights) < 0:
+        raise ValueError("Les poids visuels doivent être positifs, de somme non nulle")
+    return backends, tuple(round(weight / total, 4) for weight in weights)
+
+
+def cnn_preprocess(image: Image.Image) -> np.ndarray:
+    """Entrée du CNN maison : image (224, 224, 3) float32 dans [0, 1]"""
+    image = image.resize((CNN_INPUT_SIZE, CNN_INPUT_SIZE))
+    return np.asarray(image, dtype=np.float32) * np.float32(1 / 255)
+
+
+class VisualEncoder:
+    """
+    Encodeur d'images de requête d'un backend visuel
+    """
+
+    def __init__(self, backend: str, model_name: str, preprocess: Callable, forward: Callable,
+                 stack: Callable[[List[Any]], Any]):
+        """
+        Args:
+            backend: Nom du backend ("clip", "resnet", "vit", "cnn")
+            model_name: Nom du modèle (clé du cache des embeddings de requête)
+            preprocess: Image PIL -> entrée du modèle (mise en cache dans chaque QueryImage)
+            forward: Lot d'entrées -> embeddings (b, d)
+            stack: Assemble les entrées préprocessées en lot (torch.stack, np.stack)
+        """
+        self.backend = backend
+        self.model_name = model_name
+        self.preprocess = preprocess
+        self.forward = forward
+        self.stack = stack
+
+    @property
+    def dim(self) -> int:
+        return EMBEDDING_CONFIG["visual_embeddings"][visual_family(self.backend)]
+
+    def encode(self, images: Sequence[ImageInput], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Embeddings d'une liste d'images, par lots
+
+        Args:
+            images: Images PIL ou QueryImage (préprocessing réutilisé)
+            batch_size: Images par passage dans le modèle (défaut: BATCH_CONFIG)
+
+        Returns:
+            Matrice (n_images, dimension) float32
+        """
+        batch_size = batch_size or BATCH_CONFIG["image_batch_size"]
+        embeddings = []
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            batch = self.stack([as_query_image(image).tensor(self.preprocess) for image in chunk])
+            with span(f'encode_image_{self.backend}'):
+                embeddings.append(np.asarray(self.forward(batch), dtype=np.float32).reshape(len(chunk), -1))
+        if not embeddings:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.concatenate(embeddings)
+
+
+def _torch_encoder(backend: str, model_name: str, model, preprocess, device: str) -> VisualEncoder:
+    """VisualEncoder d'un modèle PyTorch figé en mode évaluation"""
+    import torch
+    from .inference import ImageEncoder
+
+    model.eval().to(device)
+    for param in model.parameters():
+        param.requires_grad_(False)
+    return VisualEncoder(backend, model_name, preprocess, ImageEncoder(model, "eager", device).encode, torch.stack)
+
+
+def build_resnet_encoder(device: str, model_name: Optional[str] = None) -> VisualEncoder:
+    """ResNet torchvision pré-entraîné sur ImageNet, sans la couche de classification (2048 dimensions)"""
+    import torch
+    import torchvision
+
+    model_name = model_name or MODEL_CONFIG["visual_models"]["resnet"]
+    weights = torchvision.models.get_model_weights(model_name).DEFAULT
+    model = torchvision.models.get_model(model_name, weights=weights)
+    model.fc = torch.nn.Identity()
+    return _torch_encoder("resnet", model_name, model, weights.transforms(), device)
+
+
+def build_vit_encoder(device: str, model_name: Optional[str] = None) -> VisualEncoder:
+    """Vision Transformer timm, jeton de classe sans tête de classification (768 dimensions)"""
+    try:
+        import timm
+        import timm.data
+    except ImportError as e:
+        raise ImportError("Le backend visuel 'vit' nécessite timm (pip install timm)") from e
+
+    model_name = model_name or MODEL_CONFIG["visual_models"]["vit"]
+    model = timm.create_model(model_name, pretrained=True, num_classes=0)
+    preprocess = timm.data.create_transform(**timm.data.resolve_data_config({}, model=model))
+    return _torch_encoder("vit", model_name, model, preprocess, device)
+
+
+def build_cnn_encoder(models_dir: str, model_name: Optional[str] = None) -> VisualEncoder:
+    """CNN maison Keras du répertoire des modèles (carte de caractéristiques aplatie)"""
+    try:
+        import keras
+    except ImportError:
+        try:
+            from tensorflow import keras
+        except ImportError as e:
+            raise ImportError("Le backend visuel 'cnn' nécessite keras / tensorflow") from e
+
+    model_name = model_name or MODEL_CONFIG["visual_models"]["cnn"]
+    path = os.path.join(models_dir, model_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Modèle CNN non trouvé: {path}")
+    model = keras.models.load_model(path, compile=False)
+
+    def forward(batch: np.ndarray) -> np.ndarray:
+        return np.asarray(model(batch, training=False))
+
+    return VisualEncoder("cnn", model_name, cnn_preprocess, forward, np.stack)
+
+
+def build_visual_encoder(backend: str, device: str, models_dir: str) -> VisualEncoder:
+    """
+    Construit l'encodeur d'un backend visuel autre que CLIP
+
+    CLIP passe par registry.load_clip_encoder (backends d'inférence optimisés).
+    """
+    if backend == "resnet":
+        return build_resnet_encoder(device)
+    if backend == "vit":
+        return build_vit_encoder(device)
+    if backend == "cnn":
+        return build_cnn_encoder(models_dir)
+    raise ValueError(f"Backend visuel sans encodeur: {backend}")
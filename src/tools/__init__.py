@@ -0,0 +1,3 @@
+"""
+Outils hors ligne (indexation, benchmarks...)
+"""
@@ -0,0 +1,451 @@
+"""
+Benchmark des chemins de recherche sur un catalogue synthétique
+
+Aucun modèle ni accès réseau : les matrices d'embeddings et les requêtes sont
+aléatoires, aux dimensions de EMBEDDING_CONFIG. Chaque chemin reproduit ce que
+font search_by_image, search_by_text et combined_search une fois l'embedding
+de la requête calculé.
+
+Le mode API (--api-workers) mesure au contraire l'API réelle (modèles et
+artefacts de MODELS_DIR) : des clients concurrents interrogent un serveur
+lancé avec 1 puis N processus, pour vérifier que le débit croît avec les
+processus et que la mémoire des artefacts projetés est partagée (PSS).
+
+Usage :
+    python -m src.tools.benchmark --sizes 1000 10000 100000 --output bench.json
+    python -m src.tools.benchmark --compare ancien.json nouveau.json
+    python -m src.tools.benchmark --api-workers 1 4 --clients 16 --duration 30 --output bench_api.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from ..core.config import EMBEDDING_CONFIG
+from ..models.embedding_store import EmbeddingStore, l2_normalize
+from ..models.fusion import Modality, ScoreFusion
+from ..models.index import create_index
+from ..models.ranking import rank, fuse_scores
+from ..models.registry import get_rss_bytes
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def synthetic_matrix(n: int, dim: int, seed: int, block_rows: int = 100_000) -> np.ndarray:
+    """
+    Matrice (n, dim) float32 aléatoire normalisée, générée par blocs
+
+    Les lignes sont tirées autour de centres communs pour imiter la structure
+    en groupes d'un vrai catalogue (utile pour les index approximatifs).
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 100), dim), dtype=np.float32)
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, block_rows):
+        rows = min(block_rows, n - start)
+        block = centers[rng.integers(0, len(centers), rows)]
+        block += 0.5 * rng.standard_normal((rows, dim), dtype=np.float32)
+        matrix[start:start + rows] = l2_normalize(block)
+    return matrix
+
+
+def measure(path: Callable[[int], object], n_queries: int, warmup: int = 5, memory_queries: int = 20) -> Dict:
+    """
+    Mesure un chemin de recherche
+
+    Les latences sont mesurées sans tracemalloc (qui ralentit chaque
+    allocation) ; le pic mémoire est mesuré dans un passage séparé.
+
+    Args:
+        path: Fonction exécutant la requête numéro i
+        n_queries: Nombre de requêtes mesurées
+        warmup: Requêtes de chauffe non mesurées
+        memory_queries: Requêtes du passage de mesure mémoire
+
+    Returns:
+        Latences p50/p95/p99 (ms), requêtes par seconde et pic mémoire alloué (Mo)
+    """
+    for i in range(warmup):
+        path(i)
+
+    latencies = np.empty(n_queries)
+    start_total = time.perf_counter()
+    for i in range(n_queries):
+        start = time.perf_counter()
+        path(i)
+        latencies[i] = time.perf_counter() - start
+    total = time.perf_counter() - start_total
+
+    tracemalloc.start()
+    for i in range(min(n_queries, memory_queries)):
+        path(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'mean_ms': float(latencies.mean() * 1000),
+        'qps': n_queries / total if total > 0 else float('inf'),
+        'peak_alloc_mb': peak / 1024 ** 2
+    }
+
+
+def benchmark_size(n: int, n_queries: int, top_k: int, backend: str, seed: int = 0) -> Dict:
+    """
+    Benchmark des chemins de recherche pour un catalogue de n produits
+
+    Returns:
+        Dictionnaire {chemin: mesures} avec la taille des matrices
+    """
+    visual_dim = EMBEDDING_CONFIG["visual_embeddings"]["clip_embeddings"]
+    textual_dim = EMBEDDING_CONFIG["textual_embeddings"]["title_embeddings_improved"]
+
+    visual = EmbeddingStore(synthetic_matrix(n, visual_dim, seed), 'clip_embeddings', normalized=True)
+    textual = EmbeddingStore(synthetic_matrix(n, textual_dim, seed + 1), 'title_embeddings_improved',
+                             normalized=True)
+
+    start = time.perf_counter()
+    visual_index = create_index(backend, visual.matrix, **EMBEDDING_CONFIG["index"].get(backend, {})).build()
+    textual_index = create_index(backend, textual.matrix, **EMBEDDING_CONFIG["index"].get(backend, {})).build()
+    build_time = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed + 2)
+    n_distinct = min(n_queries, 256)
+    image_queries = rng.standard_normal((n_distinct, visual_dim), dtype=np.float32)
+    text_queries = rng.standard_normal((n_distinct, textual_dim), dtype=np.float32)
+
+    fusion = ScoreFusion.create()
+    modalities = [Modality(visual, visual_index, 0.5), Modality(textual, textual_index, 0.5)]
+
+    paths = {
+        'search_by_image': lambda i: visual_index.search(image_queries[i % n_distinct], top_k),
+        'search_by_text': lambda i: textual_index.search(text_queries[i % n_distinct], top_k),
+        # Fusion de FUSION_CONFIG (ensemble candidat par défaut)
+        'combined_search': lambda i: fusion.search(
+            modalities, [image_queries[i % n_distinct], text_queries[i % n_distinct]], top_k),
+        # Somme brute sur tout le catalogue (sans ensemble candidat)
+        'combined_exhaustive': lambda i: rank(fuse_scores(
+            [visual.similarities(image_queries[i % n_distinct]),
+             textual.similarities(text_queries[i % n_distinct])],
+            [0.5, 0.5]
+        ), top_k)
+    }
+
+    return {
+        'n_products': n,
+        'matrix_mb': (visual.nbytes + textual.nbytes) / 1024 ** 2,
+        'index_build_s': build_time,
+        'paths': {name: measure(path, n_queries) for name, path in paths.items()}
+    }
+
+
+def process_tree(pid: int) -> List[int]:
+    """Processus pid et ses descendants (Linux, /proc)"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Le nom du processus (2e champ) peut contenir des espaces : ppid après le dernier ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def tree_memory_mb(pid: int) -> Dict:
+    """
+    Mémoire d'un arbre de processus
+
+    Returns:
+        RSS cumulée (pages partagées comptées dans chaque processus) et PSS
+        (pages partagées divisées entre les processus qui les projettent), en Mo
+    """
+    totals = {'rss_mb': 0.0, 'pss_mb': 0.0, 'processes': 0}
+    for process in process_tree(pid):
+        try:
+            with open(f'/proc/{process}/smaps_rollup') as f:
+                fields = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            continue
+        totals['rss_mb'] += int(fields.get('Rss', '0 kB').split()[0]) / 1024
+        totals['pss_mb'] += int(fields.get('Pss', '0 kB').split()[0]) / 1024
+        totals['processes'] += 1
+    return totals
+
+
+def wait_for_api(session, base_url: str, workers: int, timeout: float) -> None:
+    """Attend que les processus de l'API aient chargé leurs composants (/health)"""
+    deadline = time.time() + timeout
+    # Les connexions sont réparties entre processus : plusieurs réponses prêtes de suite
+    ready = 0
+    while ready < 3 * workers:
+        if time.time() > deadline:
+            raise TimeoutError(f"API non prête après {timeout:.0f}s")
+        try:
+            health = session.get(f"{base_url}/health", timeout=5).json()
+            loading = any(row['state'] == 'loading' for row in health.get('loading', []))
+            ready = ready + 1 if health.get('status') == 'ok' and not loading else 0
+        except Exception:
+            ready = 0
+        if ready < 3 * workers:
+            time.sleep(0.5)
+
+
+def load_clients(request: Callable[[object, int], None], clients: int, duration: float) -> Dict:
+    """
+    Clients concurrents (un thread et une session HTTP chacun) pendant duration secondes
+
+    Args:
+        request: Fonction (session, numéro de requête) qui lève une exception en cas d'erreur
+    """
+    import requests
+
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset: int):
+        session = requests.Session()
+        local, failed, i = [], 0, offset
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                request(session, i)
+                local.append(time.perf_counter() - start)
+            except Exception:
+                failed += 1
+            i += clients
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    start_total = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start_total
+
+    values = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'qps': len(latencies) / total if total > 0 else 0.0,
+        'p50_ms': float(np.percentile(values, 50) * 1000),
+        'p95_ms': float(np.percentile(values, 95) * 1000),
+        'p99_ms': float(np.percentile(values, 99) * 1000)
+    }
+
+
+def benchmark_api(workers: int, clients: int, duration: float, mode: str, top_k: int, port: int,
+                  queries: Optional[List[str]] = None, cache: bool = False,
+                  startup_timeout: float = 900.0) -> Dict:
+    """
+    Débit de l'API lancée avec un nombre de processus donné (python -m src.api --workers)
+
+    Args:
+        workers: Processus de l'API
+        clients: Clients concurrents
+        duration: Durée de la mesure (s)
+        mode: "text" (POST /search/text) ou "similar" (GET /products/{i}/similar)
+        top_k: Résultats par requête
+        port: Port du serveur lancé pour la mesure
+        queries: Requêtes textuelles (défaut: titres des premiers produits du catalogue)
+        cache: Garder le cache des requêtes (désactivé par défaut : chaque requête est calculée)
+        startup_timeout: Attente maximale du chargement des processus (s)
+
+    Returns:
+        Débit, latences, erreurs et mémoire (RSS cumulée, PSS) des processus de l'API
+    """
+    import requests
+
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, API_WORKERS=str(workers), QUERY_CACHE='1' if cache else '0')
+    server = subprocess.Popen([sys.executable, '-m', 'src.api', '--workers', str(workers), '--host', '127.0.0.1',
+                               '--port', str(port)], cwd=str(Path(__file__).resolve().parents[2]), env=env)
+    try:
+        session = requests.Session()
+        start = time.perf_counter()
+        wait_for_api(session, base_url, workers, startup_timeout)
+        startup = time.perf_counter() - start
+
+        if mode == 'text':
+            if not queries:
+                titles = (session.get(f"{base_url}/products/{i}", timeout=10) for i in range(200))
+                queries = [response.json().get('title') for response in titles if response.ok]
+                queries = [title for title in queries if title] or ["sac noir"]
+
+            def request(client_session, i):
+                response = client_session.post(f"{base_url}/search/text", timeout=60,
+                                               json={'query': queries[i % len(queries)], 'top_k': top_k})
+                response.raise_for_status()
+        else:
+            n_products = session.get(f"{base_url}/health", timeout=10).json()['catalog'].get('n_products') or 1000
+
+            def request(client_session, i):
+                response = client_session.get(f"{base_url}/products/{i % n_products}/similar",
+                                              params={'top_k': top_k}, timeout=60)
+                response.raise_for_status()
+
+        load_clients(request, clients, min(duration, 5.0))  # chauffe de chaque processus
+        result = load_clients(request, clients, duration)
+        return {'workers': workers, 'clients': clients, 'mode': mode, 'startup_s': startup,
+                **result, **tree_memory_mb(server.pid)}
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def run_api(workers_list: List[int], clients: int, duration: float, mode: str, top_k: int, port: int,
+            queries: Optional[List[str]] = None, cache: bool = False) -> Dict:
+    """Benchmark de l'API pour chaque nombre de processus et rapport JSON"""
+    results = []
+    for workers in workers_list:
+        print(f"API avec {workers} processus, {clients} clients, {duration:.0f}s ({mode})...", flush=True)
+        result = benchmark_api(workers, clients, duration, mode, top_k, port, queries, cache)
+        speedup = result['qps'] / results[0]['qps'] if results and results[0]['qps'] else 1.0
+        print(f"  {result['qps']:9.1f} req/s (x{speedup:.2f})  p50 {result['p50_ms']:8.1f} ms  "
+              f"p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  {result['errors']} erreurs  "
+              f"RSS {result['rss_mb']:8.0f} Mo  PSS {result['pss_mb']:8.0f} Mo")
+        results.append(result)
+
+    return {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'top_k': top_k,
+        'results': [],
+        'api_results': results
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Commit courant du dépôt (pour comparer les résultats entre commits)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: List[int], n_queries: int, top_k: int, backend: str) -> Dict:
+    """Exécute le benchmark complet et retourne le rapport"""
+    results = []
+    for n in sizes:
+        print(f"Catalogue de {n} produits...", flush=True)
+        result = benchmark_size(n, n_queries, top_k, backend)
+        for name, metrics in result['paths'].items():
+            print(f"  {name:<20} p50 {metrics['p50_ms']:8.3f} ms  p95 {metrics['p95_ms']:8.3f} ms  "
+                  f"p99 {metrics['p99_ms']:8.3f} ms  {metrics['qps']:9.1f} req/s  "
+                  f"pic {metrics['peak_alloc_mb']:8.1f} Mo")
+        results.append(result)
+
+    return {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'backend': backend,
+        'top_k': top_k,
+        'n_queries': n_queries,
+        'max_rss_mb': get_rss_bytes() / 1024 ** 2,
+        'results': results
+    }
+
+
+def compare(baseline_path: str, candidate_path: str, threshold: float = 0.10) -> int:
+    """
+    Compare deux rapports JSON et signale les régressions de latence p95
+
+    Returns:
+        Code de sortie : 1 si une régression dépasse le seuil, 0 sinon
+    """
+    with open(baseline_path) as f:
+        baseline = {r['n_products']: r for r in json.load(f)['results']}
+    with open(candidate_path) as f:
+        candidate = {r['n_products']: r for r in json.load(f)['results']}
+
+    regressions = 0
+    for n in sorted(set(baseline) & set(candidate)):
+        for name, metrics in candidate[n]['paths'].items():
+            reference = baseline[n]['paths'].get(name)
+            if reference is None:
+                continue
+            ratio = metrics['p95_ms'] / reference['p95_ms'] if reference['p95_ms'] else 1.0
+            flag = "⚠️ " if ratio > 1 + threshold else "   "
+            regressions += ratio > 1 + threshold
+            print(f"{flag}{n:>9} {name:<20} p95 {reference['p95_ms']:8.3f} -> {metrics['p95_ms']:8.3f} ms "
+                  f"({(ratio - 1) * 100:+.1f} %)")
+    return 1 if regressions else 0
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark des chemins de recherche")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Tailles de catalogue")
+    parser.add_argument('--queries', type=int, default=200, help="Requêtes mesurées par chemin")
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--backend', default=EMBEDDING_CONFIG["index"]["backend"],
+                        help="flat, stream, ivf, hnsw, fp16, int8, pq ou pca")
+    parser.add_argument('--output', default='bench_output.json', help="Fichier JSON de résultats")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help="Compare deux rapports au lieu de lancer le benchmark")
+    parser.add_argument('--api-workers', type=int, nargs='+', default=None,
+                        help="Mode API : nombres de processus mesurés (ex: 1 4)")
+    parser.add_argument('--clients', type=int, default=16, help="Mode API : clients concurrents")
+    parser.add_argument('--duration', type=float, default=30.0, help="Mode API : durée de chaque mesure (s)")
+    parser.add_argument('--api-mode', choices=['text', 'similar'], default='text')
+    parser.add_argument('--api-queries', default=None,
+                        help="Mode API : requêtes textuelles, une par ligne (défaut: titres du catalogue)")
+    parser.add_argument('--api-port', type=int, default=8765)
+    parser.add_argument('--api-cache', action='store_true', help="Mode API : garder le cache des requêtes")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        sys.exit(compare(*args.compare))
+
+    if args.api_workers:
+        queries = None
+        if args.api_queries:
+            with open(args.api_queries, encoding='utf-8') as f:
+                queries = [line.strip() for line in f if line.strip()]
+        report = run_api(args.api_workers, args.clients, args.duration, args.api_mode, args.top_k,
+                         args.api_port, queries, args.api_cache)
+    else:
+        report = run(args.sizes, args.queries, args.top_k, args.backend)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
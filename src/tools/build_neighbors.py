@@ -0,0 +1,79 @@
+"""
+Précalcul de la table des produits similaires
+
+Calcule, pour chaque produit d'une version du catalogue, ses plus proches
+voisins dans chaque famille d'embeddings (CLIP, titres) et les écrit à côté
+des embeddings de la version. L'application les charge au prochain
+chargement / rechargement de cette version.
+
+Usage :
+    python -m src.tools.build_neighbors --neighbors 50
+"""
+
+import argparse
+import os
+import time
+from typing import List, Optional
+
+from ..core.config import get_models_directory, EMBEDDING_CONFIG, NEIGHBOR_CONFIG
+from ..models.artifacts import VISUAL_FILE, TEXTUAL_FILE, resolve_artifact_dir
+from ..models.embedding_store import EmbeddingStore, list_npz_keys
+from ..models.neighbors import NeighborTable, compute_neighbors
+
+
+def build_neighbor_tables(artifact_dir: str, n_neighbors: int = None, block_memory_mb: float = None,
+                          workers: Optional[int] = None) -> List[str]:
+    """
+    Calcule et écrit les tables des voisins des embeddings d'un répertoire d'artefacts
+
+    Args:
+        artifact_dir: Répertoire de la version (embeddings_visuels.npz, embeddings_textuels.npz)
+        n_neighbors: Voisins par produit (défaut: NEIGHBOR_CONFIG)
+        block_memory_mb: Mémoire des scores d'un bloc, par thread
+        workers: Threads de calcul
+
+    Returns:
+        Familles d'embeddings traitées
+    """
+    n_neighbors = n_neighbors or NEIGHBOR_CONFIG["n_neighbors"]
+    block_memory_mb = block_memory_mb or NEIGHBOR_CONFIG["block_memory_mb"]
+    workers = workers or NEIGHBOR_CONFIG["workers"]
+
+    families = [(VISUAL_FILE, 'clip_embeddings')]
+    textual_path = os.path.join(artifact_dir, TEXTUAL_FILE)
+    textual_key = next((key for key in EMBEDDING_CONFIG["textual_embeddings"]
+                        if key in list_npz_keys(textual_path)), None)
+    if textual_key is not None:
+        families.append((TEXTUAL_FILE, textual_key))
+
+    built = []
+    for filename, key in families:
+        npz_path = os.path.join(artifact_dir, filename)
+        if key not in list_npz_keys(npz_path):
+            continue
+        store = EmbeddingStore.from_npz(npz_path, key)
+        print(f"{key}: {len(store)} produits, {n_neighbors} voisins", flush=True)
+        start_time = time.perf_counter()
+        indices, scores = compute_neighbors(store.matrix, n_neighbors, block_memory_mb, workers, progress=True)
+        table = NeighborTable(indices, scores, name=key)
+        table.save(artifact_dir)
+        print(f"  {table.nbytes / 1024 ** 2:.1f} Mo écrits en {time.perf_counter() - start_time:.1f}s")
+        built.append(key)
+    return built
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Précalcul des produits similaires")
+    parser.add_argument('--models-dir', default=get_models_directory(), help="Répertoire des modèles")
+    parser.add_argument('--version', default=None, help="Version du catalogue (défaut: version active)")
+    parser.add_argument('--neighbors', type=int, default=NEIGHBOR_CONFIG["n_neighbors"])
+    parser.add_argument('--block-memory-mb', type=float, default=NEIGHBOR_CONFIG["block_memory_mb"])
+    parser.add_argument('--workers', type=int, default=NEIGHBOR_CONFIG["workers"])
+    args = parser.parse_args(argv)
+
+    artifact_dir = resolve_artifact_dir(args.models_dir, args.version)
+    build_neighbor_tables(artifact_dir, args.neighbors, args.block_memory_mb, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Indexation hors ligne du catalogue
+
+Recalcule les embeddings visuels (CLIP et les autres backends visuels de la
+version active ou demandés) et textuels (titres) du catalogue et publie une
+nouvelle version des artefacts. Seuls les produits nouveaux ou modifiés sont
+encodés ; les vecteurs des produits inchangés sont repris de la version active.
+
+Usage :
+    python -m src.tools.index_catalog --catalog nouveau_catalogue.csv
+    python -m src.tools.index_catalog --full --visual-backends clip resnet vit
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+from PIL import Image
+
+from ..core.config import get_models_directory, EMBEDDING_CONFIG, BATCH_CONFIG, MODEL_CONFIG, VISUAL_SEARCH_CONFIG
+from ..models.artifacts import (
+    CATALOG_FILE, VISUAL_FILE, TEXTUAL_FILE,
+    resolve_artifact_dir, read_manifest, publish_version, prune_versions
+)
+from ..models.images import QueryImage, decode_image
+from ..models.product_store import ProductStore, products_path
+from ..models.registry import load_clip, load_text_model, load_visual_encoder
+from ..models.visual_encoders import VisualEncoder, visual_family
+from .build_neighbors import build_neighbor_tables
+
+VISUAL_KEY = 'clip_embeddings'
+
+
+def product_keys(df: pd.DataFrame) -> List[str]:
+    """Identifiant stable de chaque produit (product_code, sinon numéro de ligne)"""
+    if 'product_code' in df.columns:
+        codes = df['product_code'].astype(str)
+        if codes.is_unique:
+            return codes.tolist()
+    return [f"row-{i}" for i in range(len(df))]
+
+
+def product_text(row: pd.Series) -> str:
+    """Texte encodé pour un produit : titre enrichi de la catégorie et du prix"""
+    parts = [row.get('title'), row.get('category2_code'), row.get('price')]
+    return ' '.join(str(part) for part in parts if pd.notna(part) and str(part).strip())
+
+
+def content_hashes(df: pd.DataFrame) -> List[str]:
+    """Empreinte de ce qui détermine les embeddings d'un produit (URL d'image et texte)"""
+    hashes = []
+    for _, row in df.iterrows():
+        payload = json.dumps([str(row.get('imageurl', '')), product_text(row)], ensure_ascii=False)
+        hashes.append(hashlib.sha256(payload.encode()).hexdigest()[:16])
+    return hashes
+
+
+def fetch_image(session: requests.Session, url: str, timeout: float) -> Optional[Image.Image]:
+    """Télécharge et décode une image (None en cas d'échec)"""
+    if not isinstance(url, str) or not url:
+        return None
+    try:
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        # Même décodage que les images de requête (orientation EXIF, transparence)
+        return decode_image(response.content)
+    except Exception:
+        return None
+
+
+def image_encoders(backends: Sequence[str], device: str, models_dir: str) -> Dict[str, VisualEncoder]:
+    """
+    Encodeurs d'images de l'indexation, par famille d'embeddings
+
+    CLIP utilise le modèle d'origine (pas de backend d'inférence optimisé).
+    """
+    encoders = {}
+    for backend in backends:
+        if backend == 'clip':
+            import torch
+
+            clip_model, clip_preprocess = load_clip(device)
+
+            def forward(batch):
+                with torch.no_grad():
+                    return clip_model.encode_image(batch.to(device)).float().cpu().numpy()
+
+            encoders[VISUAL_KEY] = VisualEncoder('clip', MODEL_CONFIG["visual_models"]["clip"], clip_preprocess,
+                                                 forward, torch.stack)
+        else:
+            encoders[visual_family(backend)] = load_visual_encoder(backend, device, models_dir)
+    return encoders
+
+
+def encode_images(urls: Sequence[str], device: str, batch_size: int, workers: int,
+                  timeout: float = 10.0, backends: Sequence[str] = ('clip',),
+                  models_dir: Optional[str] = None) -> Tuple[Dict[str, np.ndarray], List[int]]:
+    """
+    Encode des images avec chaque backend visuel, téléchargées et préprocessées en parallèle
+
+    Chaque image est téléchargée et décodée une seule fois pour tous les backends.
+    Les images indisponibles reçoivent un vecteur nul (score toujours nul).
+
+    Returns:
+        Tuple (dictionnaire {famille d'embeddings: matrice (len(urls), dimension) float32},
+        positions des images indisponibles)
+    """
+    encoders = image_encoders(backends, device, models_dir or get_models_directory())
+    embeddings = {key: np.zeros((len(urls), EMBEDDING_CONFIG["visual_embeddings"][key]), dtype=np.float32)
+                  for key in encoders}
+    session = requests.Session()
+    failed = []
+
+    def prepare(url):
+        image = fetch_image(session, url, timeout)
+        if image is None:
+            return None
+        query = QueryImage(image)
+        for encoder in encoders.values():
+            query.tensor(encoder.preprocess)  # préprocessing dans les threads de téléchargement
+        return query
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(urls), batch_size):
+            images = list(pool.map(prepare, urls[start:start + batch_size]))
+            rows = [i for i, image in enumerate(images) if image is not None]
+            failed.extend(start + i for i, image in enumerate(images) if image is None)
+            if not rows:
+                continue
+            for key, encoder in encoders.items():
+                encoded = encoder.encode([images[i] for i in rows], batch_size=len(rows))
+                embeddings[key][[start + i for i in rows]] = encoded
+            print(f"  images {min(start + batch_size, len(urls))}/{len(urls)}", flush=True)
+
+    return embeddings, failed
+
+
+def encode_texts(texts: Sequence[str], batch_size: int):
+    """
+    Encode des textes avec le modèle textuel de l'application
+
+    Returns:
+        Tuple (matrice float32, nom de la clé d'embeddings selon la dimension du modèle)
+    """
+    text_model, model_name, _ = load_text_model()
+    if text_model is None:
+        raise RuntimeError("Aucun modèle textuel n'a pu être chargé")
+
+    embeddings = np.asarray(
+        text_model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True, show_progress_bar=True),
+        dtype=np.float32
+    ).reshape(len(texts), -1)
+
+    dims = EMBEDDING_CONFIG["textual_embeddings"]
+    key = next((name for name, dim in dims.items() if dim == embeddings.shape[1]), 'title_embeddings_improved')
+    return embeddings, key, model_name
+
+
+def load_previous(artifact_dir: str) -> Dict:
+    """Embeddings et empreintes de la version active, indexés par identifiant produit"""
+    manifest = read_manifest(artifact_dir)
+    catalog_path = os.path.join(artifact_dir, CATALOG_FILE)
+    if manifest is None or not os.path.exists(catalog_path):
+        return {}
+
+    previous_df = pd.read_csv(catalog_path)
+    previous = {'rows': {key: i for i, key in enumerate(product_keys(previous_df))},
+                'hashes': manifest.get('product_hashes', {}),
+                'text_model': manifest.get('models', {}).get('text'),
+                'failed_images': manifest.get('failed_images', []),
+                'arrays': {}}
+    for filename in (VISUAL_FILE, TEXTUAL_FILE):
+        path = os.path.join(artifact_dir, filename)
+        if os.path.exists(path):
+            with np.load(path) as npz:
+                previous['arrays'].update({name: npz[name] for name in npz.files})
+    return previous
+
+
+def index_catalog(catalog_path: str, models_dir: str, batch_size: int, workers: int,
+                  full: bool = False, device: Optional[str] = None, keep: int = 3,
+                  neighbors: int = 0, visual_backends: Optional[Sequence[str]] = None) -> str:
+    """
+    Indexe un catalogue et publie une nouvelle version des artefacts
+
+    Args:
+        catalog_path: CSV du catalogue (colonnes title, imageurl, product_code...)
+        models_dir: Répertoire des modèles
+        batch_size: Taille des lots d'encodage
+        workers: Threads de téléchargement / préprocessing des images
+        full: Ignorer la version active et tout réencoder
+        device: Device PyTorch (par défaut cuda si disponible)
+        keep: Nombre de versions conservées
+        neighbors: Voisins précalculés par produit (0 = pas de table des produits similaires)
+        visual_backends: Backends visuels encodés (défaut: CLIP et les familles de la version active)
+
+    Returns:
+        Nom de la version publiée
+    """
+    if device is None:
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    df = pd.read_csv(catalog_path)
+    keys = product_keys(df)
+    hashes = content_hashes(df)
+    previous = {} if full else load_previous(resolve_artifact_dir(models_dir))
+
+    previous_rows = previous.get('rows', {})
+    previous_hashes = previous.get('hashes', {})
+    to_encode = [i for i, (key, digest) in enumerate(zip(keys, hashes))
+                 if previous_hashes.get(key) != digest or key not in previous_rows]
+    removed = len(set(previous_rows) - set(keys))
+    print(f"{len(df)} produits : {len(to_encode)} à encoder, "
+          f"{len(df) - len(to_encode)} inchangés, {removed} supprimés")
+
+    if visual_backends is None:
+        # Toutes les familles visuelles de la version active restent à jour
+        visual_backends = [backend for backend, key in VISUAL_SEARCH_CONFIG["families"].items()
+                           if backend == 'clip' or key in previous.get('arrays', {})]
+    previous_arrays = previous.get('arrays', {})
+    all_rows = list(range(len(df)))
+
+    # Images indisponibles à la version précédente (vecteur nul) : nouvel essai
+    previous_failed = set(previous.get('failed_images', []))
+    changed = set(to_encode)
+    retried = [i for i, key in enumerate(keys) if key in previous_failed and i not in changed]
+    if retried:
+        print(f"{len(retried)} images indisponibles à la version précédente : nouvel essai")
+
+    # Lignes à encoder par famille visuelle : une famille absente de la version
+    # active (nouveau backend) est encodée pour tout le catalogue
+    visual_rows = {}
+    for backend in visual_backends:
+        key = visual_family(backend)
+        visual_rows[backend] = all_rows if key not in previous_arrays else sorted(changed.union(retried))
+        if key not in previous_arrays and previous_arrays:
+            print(f"{key} absent de la version active : encodage de tous les produits")
+    visual_keys = [visual_family(backend) for backend in visual_backends]
+
+    start_time = time.perf_counter()
+    visual_new = {}
+    failed_images = set()
+    # Un passage de téléchargement par ensemble de lignes (familles incrémentales / familles complètes)
+    for rows in {tuple(rows) for rows in visual_rows.values() if rows}:
+        backends = [backend for backend in visual_backends if tuple(visual_rows[backend]) == rows]
+        vectors_by_key, failed = encode_images(df['imageurl'].iloc[list(rows)].tolist(), device, batch_size,
+                                               workers, backends=backends, models_dir=models_dir)
+        visual_new.update({key: (list(rows), vectors) for key, vectors in vectors_by_key.items()})
+        failed_images.update(keys[rows[i]] for i in failed)
+
+    # Textes : tout le catalogue si le modèle textuel a changé depuis la version
+    # active (les vecteurs des deux modèles ne sont pas comparables)
+    previous_textual_key = next((k for k in EMBEDDING_CONFIG["textual_embeddings"] if k in previous_arrays), None)
+    text_rows = to_encode
+    if previous_textual_key is None:
+        text_rows = all_rows
+    else:
+        _, current_text_model, _ = load_text_model()
+        if current_text_model != previous.get('text_model'):
+            print(f"Modèle textuel changé ({previous.get('text_model')} -> {current_text_model}) : "
+                  f"encodage de tous les textes")
+            text_rows = all_rows
+
+    if text_rows:
+        textual_new, textual_key, text_model_name = encode_texts(
+            [product_text(df.iloc[i]) for i in text_rows], batch_size
+        )
+    else:
+        textual_key = previous_textual_key
+        text_model_name = previous.get('text_model')
+        textual_new = None
+
+    def assemble(key: str, rows: List[int], new_vectors: Optional[np.ndarray]) -> np.ndarray:
+        """Vecteurs repris de la version active + vecteurs nouvellement encodés (lignes rows)"""
+        old = previous_arrays.get(key)
+        if old is None and len(rows) != len(df):
+            raise ValueError(f"{key} absent de la version active (relancer avec --full)")
+        dim = new_vectors.shape[1] if old is None else old.shape[1]
+        matrix = np.zeros((len(df), dim), dtype=np.float32)
+        if old is not None:
+            encoded = set(rows)
+            reused = [(i, previous_rows[k]) for i, k in enumerate(keys) if i not in encoded]
+            if reused:
+                new_rows, old_rows = map(list, zip(*reused))
+                matrix[new_rows] = old[old_rows]
+        if rows:
+            if new_vectors.shape[1] != dim:
+                raise ValueError(f"{key}: dimension {new_vectors.shape[1]} != version active {dim} "
+                                 f"(relancer avec --full)")
+            matrix[rows] = new_vectors
+        return matrix
+
+    visual = {key: assemble(key, *visual_new.get(key, ([], None))) for key in visual_keys}
+    textual = assemble(textual_key, text_rows, textual_new)
+
+    def write_artifacts(directory: str) -> Dict:
+        df.to_csv(os.path.join(directory, CATALOG_FILE), index=False)
+        # Informations produits au format binaire : l'application ne relit pas le CSV
+        ProductStore.from_dataframe(df).save(products_path(os.path.join(directory, CATALOG_FILE)))
+        np.savez_compressed(os.path.join(directory, VISUAL_FILE), **visual)
+        np.savez_compressed(os.path.join(directory, TEXTUAL_FILE), **{textual_key: textual})
+        if neighbors > 0:
+            build_neighbor_tables(directory, neighbors)
+        return {
+            'n_products': len(df),
+            'source_catalog': os.path.abspath(catalog_path),
+            'encoded': len(to_encode),
+            'retried_images': len(retried),
+            'removed': removed,
+            'embeddings': {**{key: list(matrix.shape) for key, matrix in visual.items()},
+                           textual_key: list(textual.shape)},
+            'models': {'visual': visual_keys, 'text': text_model_name},
+            'product_hashes': dict(zip(keys, hashes)),
+            # Images à retélécharger à la prochaine indexation
+            'failed_images': sorted(failed_images)
+        }
+
+    version = publish_version(models_dir, write_artifacts)
+    pruned = prune_versions(models_dir, keep)
+    print(f"Version {version} publiée en {time.perf_counter() - start_time:.1f}s"
+          + (f" ({len(pruned)} anciennes versions supprimées)" if pruned else ""))
+    return version
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Indexation incrémentale du catalogue Chanel")
+    parser.add_argument('--catalog', help="CSV du catalogue (défaut: catalogue de la version active)")
+    parser.add_argument('--models-dir', default=get_models_directory(), help="Répertoire des modèles")
+    parser.add_argument('--batch-size', type=int, default=BATCH_CONFIG["image_batch_size"])
+    parser.add_argument('--workers', type=int, default=8, help="Threads de téléchargement des images")
+    parser.add_argument('--full', action='store_true', help="Tout réencoder")
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--keep', type=int, default=3, help="Versions conservées")
+    parser.add_argument('--neighbors', type=int, default=0,
+                        help="Voisins précalculés par produit (0 = aucun, voir build_neighbors)")
+    parser.add_argument('--visual-backends', nargs='+', default=None, choices=list(VISUAL_SEARCH_CONFIG["families"]),
+                        help="Backends visuels encodés (défaut: clip et les familles de la version active)")
+    args = parser.parse_args(argv)
+
+    catalog = args.catalog or os.path.join(resolve_artifact_dir(args.models_dir), CATALOG_FILE)
+    index_catalog(catalog, args.models_dir, args.batch_size, args.workers,
+                  full=args.full, device=args.device, keep=args.keep, neighbors=args.neighbors,
+                  visual_backends=args.visual_backends)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Précalcul des résultats des requêtes fréquentes
+
+Lit un journal de recherche (une requête par ligne), garde les requêtes les
+plus fréquentes (regroupées comme dans le cache des requêtes), les encode par
+lots et calcule leurs top-k par recherche exacte sur les embeddings de la
+version. Les résultats sont écrits dans la version (precomputed_results.npz)
+et servis sans encodage ni parcours au prochain chargement de cette version.
+
+Les produits similaires de chaque produit du catalogue (recherche par
+produit) sont écrits par la même tâche dans la table des voisins.
+
+Usage :
+    python -m src.tools.precompute_results --queries recherches.log
+    python -m src.tools.precompute_results --queries recherches.log --encoders text clip --top-k 100
+"""
+
+import argparse
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..core.config import get_models_directory, BATCH_CONFIG, PRECOMPUTED_CONFIG
+from ..models.artifacts import resolve_artifact_dir
+from ..models.cache import normalize_text
+from ..models.catalog import load_snapshot
+from ..models.index import FlatIndex
+from ..models.precomputed import PrecomputedResults, artifact_fingerprint, query_key
+from ..models.registry import load_clip_text_encoder, load_text_encoder
+from ..models.text_encoders import TEXT_ENCODERS
+from .build_neighbors import build_neighbor_tables
+
+
+def frequent_queries(path: str, max_queries: int) -> List[str]:
+    """
+    Requêtes les plus fréquentes d'un journal
+
+    Args:
+        path: Fichier texte, une requête par ligne
+        max_queries: Nombre de requêtes gardées
+
+    Returns:
+        Une requête par groupe (même texte normalisé), de la plus fréquente à la moins fréquente
+    """
+    counts = Counter()
+    first_seen: Dict[str, str] = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            text = line.strip()
+            if not text:
+                continue
+            key = normalize_text(text)
+            counts[key] += 1
+            first_seen.setdefault(key, text)
+    return [first_seen[key] for key, _ in counts.most_common(max_queries)]
+
+
+def _query_encoder(encoder: str, device: str):
+    """Encodeur des requêtes (fonction textes -> embeddings) et nom du modèle"""
+    if encoder == 'clip':
+        clip_encoder = load_clip_text_encoder(device)
+        return clip_encoder.encode, clip_encoder.model_name
+    model, model_name, failures = load_text_encoder()
+    if model is None:
+        raise RuntimeError(f"Modèle textuel non disponible: {failures}")
+    return (lambda texts, batch_size: np.atleast_2d(
+        model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True))), model_name
+
+
+def precompute_results(models_dir: str, queries: Sequence[str], encoders: Sequence[str],
+                       version: Optional[str] = None, top_k: int = None,
+                       batch_size: int = None, device: str = 'cpu') -> PrecomputedResults:
+    """
+    Calcule et écrit les résultats précalculés d'une version
+
+    Args:
+        models_dir: Répertoire des modèles
+        queries: Requêtes à précalculer
+        encoders: Encodeurs de requête ("text", "clip")
+        version: Version du catalogue (défaut: version active)
+        top_k: Produits stockés par requête (défaut: PRECOMPUTED_CONFIG)
+        batch_size: Textes par passage dans le modèle
+        device: Device PyTorch des modèles
+
+    Returns:
+        PrecomputedResults écrit dans la version
+    """
+    top_k = top_k or PRECOMPUTED_CONFIG["top_k"]
+    batch_size = batch_size or BATCH_CONFIG["text_batch_size"]
+    snapshot = load_snapshot(models_dir, version)
+
+    entries = []
+    counts = {}
+    for encoder in encoders:
+        store = snapshot.visual_embeddings if encoder == 'clip' else snapshot.textual_embeddings
+        if store is None:
+            print(f"{encoder}: embeddings absents de la version {snapshot.version}, ignoré")
+            continue
+        encode, model_name = _query_encoder(encoder, device)
+        print(f"{encoder} ({model_name}): {len(queries)} requêtes sur {len(store)} produits", flush=True)
+        start_time = time.perf_counter()
+        # Recherche exacte, quel que soit l'index de la version
+        index = FlatIndex(store.matrix)
+        for start in range(0, len(queries), batch_size):
+            texts = queries[start:start + batch_size]
+            found = index.search_batch(encode(texts, batch_size), top_k)
+            entries.extend((query_key(model_name, text), indices, scores)
+                           for text, (indices, scores) in zip(texts, found))
+        counts[model_name] = len(queries)
+        print(f"  {time.perf_counter() - start_time:.1f}s")
+
+    results = PrecomputedResults.build(entries, top_k, {
+        'version': snapshot.version,
+        'fingerprint': artifact_fingerprint(snapshot.artifact_dir),
+        'queries': counts
+    })
+    results.save(snapshot.artifact_dir)
+    print(f"{len(results)} requêtes, {results.nbytes / 1024 ** 2:.1f} Mo écrits dans {snapshot.artifact_dir}")
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Précalcul des résultats des requêtes fréquentes")
+    parser.add_argument('--queries', required=True, help="Journal des requêtes (une par ligne)")
+    parser.add_argument('--models-dir', default=get_models_directory(), help="Répertoire des modèles")
+    parser.add_argument('--version', default=None, help="Version du catalogue (défaut: version active)")
+    parser.add_argument('--top-k', type=int, default=PRECOMPUTED_CONFIG["top_k"])
+    parser.add_argument('--max-queries', type=int, default=PRECOMPUTED_CONFIG["max_queries"])
+    parser.add_argument('--encoders', nargs='+', choices=TEXT_ENCODERS, default=PRECOMPUTED_CONFIG["encoders"])
+    parser.add_argument('--batch-size', type=int, default=BATCH_CONFIG["text_batch_size"])
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--no-neighbors', action='store_true',
+                        help="Ne pas recalculer les produits similaires de chaque produit")
+    args = parser.parse_args(argv)
+
+    queries = frequent_queries(args.queries, args.max_queries)
+    results = precompute_results(args.models_dir, queries, args.encoders, args.version,
+                                 args.top_k, args.batch_size, args.device)
+    if not args.no_neighbors:
+        build_neighbor_tables(resolve_artifact_dir(args.models_dir, args.version))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Mémoire économisée et rappel perdu par les représentations compactes
+
+Pour chaque famille d'embeddings de EMBEDDING_CONFIG et chaque codec
+(fp16, int8, pq, pca), construit l'index compact avec les réglages de
+EMBEDDING_CONFIG["index"] et le compare à la recherche exacte : mémoire des
+codes face à la matrice float32, rappel@k avec et sans re-classement, latence
+requête par requête et par lot (search_batch : les codes fp16 / int8 de chaque
+bloc sont décodés une fois pour tout le lot).
+Les matrices de la version active sont utilisées quand elles existent, sinon
+une matrice synthétique aux dimensions configurées.
+
+Usage :
+    python -m src.tools.quantization_report --n 20000 --output quantization.json
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import get_models_directory, EMBEDDING_CONFIG
+from ..models.artifacts import VISUAL_FILE, TEXTUAL_FILE, resolve_artifact_dir
+from ..models.embedding_store import EmbeddingStore, list_npz_keys
+from ..models.index import FlatIndex, create_index, recall_at_k, sample_queries
+from ..models.quantization import CODECS
+from .benchmark import synthetic_matrix
+
+
+def family_matrix(artifact_dir: Optional[str], key: str, dim: int, n: int, max_memory_mb: float,
+                  seed: int = 0):
+    """
+    Matrice d'une famille d'embeddings : archive de la version si elle la contient, sinon synthétique
+
+    Args:
+        artifact_dir: Répertoire de la version (None = toujours synthétique)
+        key: Famille d'embeddings (ex: "clip_embeddings")
+        dim: Dimension configurée
+        n: Nombre de produits (tronque aussi les matrices réelles)
+        max_memory_mb: Borne de la matrice float32 (réduit n pour les grandes dimensions)
+        seed: Graine de la matrice synthétique
+
+    Returns:
+        Tuple (matrice (n, d) normalisée, source "artifacts" ou "synthetic")
+    """
+    n = max(1, min(n, int(max_memory_mb * 1024 ** 2 // (4 * dim))))
+    if artifact_dir is not None:
+        for filename in (VISUAL_FILE, TEXTUAL_FILE):
+            npz_path = os.path.join(artifact_dir, filename)
+            if key in list_npz_keys(npz_path):
+                store = EmbeddingStore.from_npz(npz_path, key)
+                return np.ascontiguousarray(store.matrix[:n]), "artifacts"
+    return synthetic_matrix(n, dim, seed), "synthetic"
+
+
+def batch_latency_ms(index, exact: FlatIndex, queries: np.ndarray, top_k: int) -> Tuple[float, float]:
+    """Latence moyenne par requête (ms) d'une recherche par lot, index évalué et recherche exacte"""
+    n_queries = max(1, len(queries))
+    start = time.perf_counter()
+    index.search_batch(queries, top_k)
+    index_time = time.perf_counter() - start
+    start = time.perf_counter()
+    exact.search_batch(queries, top_k)
+    exact_time = time.perf_counter() - start
+    return 1000 * index_time / n_queries, 1000 * exact_time / n_queries
+
+
+def evaluate_codec(matrix: np.ndarray, codec: str, queries: np.ndarray, top_k: int) -> Dict:
+    """
+    Construit l'index compact d'un codec et mesure mémoire et rappel
+
+    Returns:
+        Dictionnaire : octets par produit, mémoire (Mo), ratio économisé,
+        rappel@k avec re-classement et sans (codes seuls), latences (ms)
+        requête par requête et par lot
+    """
+    params = EMBEDDING_CONFIG["index"].get(codec, {})
+    exact = FlatIndex(matrix)
+
+    start = time.perf_counter()
+    index = create_index(codec, matrix, **params).build()
+    build_time = time.perf_counter() - start
+
+    reranked = recall_at_k(index, exact, queries, top_k)
+    rerank = index.rerank
+    index.rerank = 0
+    codes_only = recall_at_k(index, exact, queries, top_k)
+    index.rerank = rerank
+    batch_latency, exact_batch_latency = batch_latency_ms(index, exact, queries, top_k)
+
+    full_bytes = matrix.shape[0] * matrix.shape[1] * 4
+    return {
+        'params': index.params(),
+        'bytes_per_product': index.codes.nbytes // max(1, len(index)),
+        'memory_mb': index.nbytes / 1024 ** 2,
+        'memory_saved_ratio': 1 - index.nbytes / full_bytes,
+        'recall_at_k': reranked['recall_at_k'],
+        'recall_lost': 1 - reranked['recall_at_k'],
+        'recall_at_k_codes_only': codes_only['recall_at_k'],
+        'latency_ms': reranked['latency_ms'],
+        'latency_ms_codes_only': codes_only['latency_ms'],
+        'exact_latency_ms': reranked['exact_latency_ms'],
+        'batch_latency_ms': batch_latency,
+        'exact_batch_latency_ms': exact_batch_latency,
+        'build_time_s': build_time
+    }
+
+
+def run(artifact_dir: Optional[str], n: int, n_queries: int, top_k: int, codecs: List[str],
+        max_memory_mb: float) -> Dict:
+    """Évalue tous les codecs sur toutes les familles d'embeddings configurées"""
+    families = {**EMBEDDING_CONFIG["visual_embeddings"], **EMBEDDING_CONFIG["textual_embeddings"]}
+    results = []
+    for key, dim in families.items():
+        matrix, source = family_matrix(artifact_dir, key, dim, n, max_memory_mb)
+        queries = sample_queries(matrix, n_queries)
+        full_mb = matrix.nbytes / 1024 ** 2
+        print(f"{key}: {matrix.shape[0]} x {matrix.shape[1]} ({source}), float32 {full_mb:.1f} Mo", flush=True)
+
+        family = {'family': key, 'dim': matrix.shape[1], 'n_products': matrix.shape[0], 'source': source,
+                  'float32_mb': full_mb, 'float64_mb': 2 * full_mb, 'codecs': {}}
+        for codec in codecs:
+            metrics = evaluate_codec(matrix, codec, queries, top_k)
+            family['codecs'][codec] = metrics
+            # Variation de la mémoire : négative quand les codes sont plus petits que la matrice float32
+            print(f"  {codec:<5} {metrics['bytes_per_product']:>8} o/produit  "
+                  f"{-metrics['memory_saved_ratio'] * 100:+6.1f} %  "
+                  f"rappel@{top_k} {metrics['recall_at_k']:.3f} (codes seuls {metrics['recall_at_k_codes_only']:.3f})  "
+                  f"{metrics['latency_ms']:7.2f} ms (exact {metrics['exact_latency_ms']:.2f} ms)  "
+                  f"lot {metrics['batch_latency_ms']:.2f} ms/requête (exact {metrics['exact_batch_latency_ms']:.2f})",
+                  flush=True)
+        results.append(family)
+
+    return {'top_k': top_k, 'n_queries': n_queries, 'results': results}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Mémoire et rappel des représentations compactes")
+    parser.add_argument('--models-dir', default=get_models_directory(), help="Répertoire des modèles")
+    parser.add_argument('--version', default=None, help="Version du catalogue (défaut: version active)")
+    parser.add_argument('--synthetic', action='store_true', help="Ignorer les embeddings de la version")
+    parser.add_argument('--n', type=int, default=20000, help="Produits évalués par famille")
+    parser.add_argument('--max-memory-mb', type=float, default=1024,
+                        help="Taille maximale d'une matrice float32 (limite n pour cnn_embeddings)")
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--codecs', nargs='+', default=list(CODECS), choices=list(CODECS))
+    parser.add_argument('--output', default='quantization_report.json', help="Fichier JSON de résultats")
+    args = parser.parse_args(argv)
+
+    artifact_dir = None if args.synthetic else resolve_artifact_dir(args.models_dir, args.version)
+    report = run(artifact_dir, args.n, args.queries, args.top_k, args.codecs, args.max_memory_mb)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
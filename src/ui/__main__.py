@@ -0,0 +1,31 @@
+"""
+Lancement de l'application Streamlit : python -m src.ui [options de streamlit run]
+
+Le serveur Streamlit exécute main.py dans ce même processus : le préchargement
+(registry.start_warmup) est lancé en arrière-plan avant l'ouverture du port,
+et la première session trouve les modèles et le catalogue déjà chargés (ou en
+cours de chargement) dans le registre du processus, au lieu de les charger
+elle-même. WARMUP_ON_START=0 désactive le préchargement.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+MAIN_SCRIPT = str(Path(__file__).resolve().parents[2] / "main.py")
+
+
+def main():
+    if os.environ.get('WARMUP_ON_START', '1') == '1':
+        from ..models.registry import start_warmup
+
+        start_warmup()
+
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", MAIN_SCRIPT, *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,25 @@ Composants UI pour l'affichage des résultats de recommandation
 """
 
 import streamlit as st
-import requests
-from PIL import Image
-from io import BytesIO
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 
+from ..core.config import THUMBNAIL_CONFIG, CATALOG_CONFIG, VISUAL_SEARCH_CONFIG, FUSION_CONFIG, TEXT_SEARCH_CONFIG
+from ..models.filters import SearchFilter
+from ..models.fusion import FUSION_STRATEGIES
+from ..models.text_encoders import TEXT_ENCODERS
+from ..models.images import QueryImage
+from ..models.metrics import span
+from .thumbnails import get_thumbnail_service
 
-def display_product_card(product_info: Dict, similarity_score: float):
+
+def display_product_card(product_info: Dict, similarity_score: float, thumbnail: Optional[bytes] = None):
     """
     Affiche une carte produit avec les informations et le score de similarité
     
     Args:
         product_info: Dictionnaire contenant les informations du produit
         similarity_score: Score de similarité (0-1)
+        thumbnail: Vignette déjà téléchargée (sinon récupérée via le service de vignettes)
     """
     with st.container():
         col1, col2 = st.columns([1, 2])
@@ -23,14 +29,11 @@ def display_product_card(product_info: Dict, similarity_score: float):
         with col1:
             # Afficher l'image du produit
             if product_info.get('image_url'):
-                try:
-                    response = requests.get(product_info['image_url'], timeout=5)
-                    if response.status_code == 200:
-                        img = Image.open(BytesIO(response.content))
-                        st.image(img, width=150)
-                    else:
-                        st.write("🖼️ Image non disponible")
-                except Exception:
+                if thumbnail is None:
+                    thumbnail = get_thumbnail_service().get(product_info['image_url'])
+                if thumbnail is not None:
+                    st.image(thumbnail, width=THUMBNAIL_CONFIG["size"])
+                else:
                     st.write("🖼️ Image non disponible")
             else:
                 st.write("🖼️ Pas d'image")
@@ -65,7 +68,8 @@ def display_product_card(product_info: Dict, similarity_score: float):
         st.divider()
 
 
-def display_search_results(results: List[Tuple[int, float]], recommendation_system, title: str):
+def display_search_results(results: List[Tuple[int, float]], recommendation_system, title: str,
+                           key_prefix: str = "results"):
     """
     Affiche les résultats de recherche
     
@@ -73,6 +77,7 @@ def display_search_results(results: List[Tuple[int, float]], recommendation_syst
         results: Liste de tuples (index_produit, score_similarité)
         recommendation_system: Instance du système de recommandation
         title: Titre de la section
+        key_prefix: Préfixe des clés des boutons (plusieurs listes sur une même page)
     """
     if not results:
         st.warning("Aucun résultat trouvé.")
@@ -81,18 +86,106 @@ def display_search_results(results: List[Tuple[int, float]], recommendation_syst
     st.subheader(f"🎯 {title}")
     st.write(f"**{len(results)} produits trouvés**")
     
+    products_info = recommendation_system.get_products_info([product_idx for product_idx, _ in results])
+    
+    # Télécharger toutes les vignettes en parallèle avant l'affichage
+    thumbnails = get_thumbnail_service().get_many(info.get('image_url') for info in products_info)
+    
     # Afficher les résultats
-    for i, (product_idx, score) in enumerate(results):
-        product_info = recommendation_system.get_product_info(product_idx)
+    with span('render_results'):
+        for i, ((product_idx, score), product_info) in enumerate(zip(results, products_info)):
+            with st.expander(f"#{i+1} - {product_info.get('title', 'Produit')} ({int(score*100)}%)",
+                             expanded=(i < 3)):
+                display_product_card(product_info, score, thumbnails.get(product_info.get('image_url')))
+                # Callback : exécuté avant la réexécution du script, même si cette liste n'est plus affichée
+                st.button("🔁 Produits similaires", key=f"{key_prefix}-similar-{i}-{product_idx}",
+                          on_click=_select_similar, args=(int(product_idx),))
+
+
+def _select_similar(product_idx: int):
+    """Mémorise le produit dont on veut les produits similaires"""
+    st.session_state.similar_to = product_idx
+
+
+def create_search_filters(filter_options: Optional[Dict]) -> Optional[SearchFilter]:
+    """
+    Filtres de catégorie et de prix dans la barre latérale
+    
+    Args:
+        filter_options: Catégories et fourchette de prix du catalogue (get_filter_options)
         
-        with st.expander(f"#{i+1} - {product_info.get('title', 'Produit')} ({int(score*100)}%)", expanded=(i < 3)):
-            display_product_card(product_info, score)
+    Returns:
+        SearchFilter, ou None si aucun filtre n'est actif
+    """
+    if not filter_options:
+        return None
+    
+    st.sidebar.subheader("🔎 Filtres")
+    categories = []
+    if filter_options.get('categories'):
+        categories = st.sidebar.multiselect("🏷️ Catégories", filter_options['categories'])
+    
+    min_price = max_price = None
+    price_range = filter_options.get('price_range')
+    if price_range and price_range[0] < price_range[1]:
+        low, high = float(price_range[0]), float(price_range[1])
+        selected = st.sidebar.slider("💰 Prix", min_value=low, max_value=high, value=(low, high))
+        # Bornes du catalogue = pas de contrainte de prix
+        min_price = selected[0] if selected[0] > low else None
+        max_price = selected[1] if selected[1] < high else None
+    
+    return SearchFilter.create(categories, min_price, max_price)
 
 
-def create_search_interface():
+def create_visual_backend_selector() -> List[str]:
+    """
+    Choix des modèles visuels dans la barre latérale (plusieurs = fusion tardive)
+    
+    Returns:
+        Backends visuels sélectionnés (backend par défaut si aucun)
+    """
+    default = VISUAL_SEARCH_CONFIG["default"]
+    backends = st.sidebar.multiselect(
+        "🧠 Modèles visuels",
+        list(VISUAL_SEARCH_CONFIG["families"]),
+        default=[default],
+        help="Un modèle : index de sa famille d'embeddings. Plusieurs : similarités fusionnées "
+             "(chaque modèle est chargé à sa première utilisation)"
+    )
+    return backends or [default]
+
+
+def load_query_image(uploaded_file) -> Optional[QueryImage]:
+    """
+    Image uploadée décodée une seule fois par upload (conservée entre les reruns de la session)
+    
+    Args:
+        uploaded_file: Fichier retourné par st.file_uploader
+        
+    Returns:
+        QueryImage, ou None si le fichier n'est pas une image lisible
+    """
+    file_key = (getattr(uploaded_file, 'file_id', None), uploaded_file.name, uploaded_file.size)
+    cached = st.session_state.get('query_image')
+    if cached is not None and cached[0] == file_key:
+        return cached[1]
+    
+    try:
+        query_image = QueryImage.from_bytes(uploaded_file.getvalue())
+    except Exception as e:
+        st.error(f"❌ Image illisible: {e}")
+        return None
+    st.session_state.query_image = (file_key, query_image)
+    return query_image
+
+
+def create_search_interface(filter_options: Optional[Dict] = None):
     """
     Crée l'interface de recherche principale
     
+    Args:
+        filter_options: Valeurs proposées pour les filtres (catégories, fourchette de prix)
+    
     Returns:
         Tuple contenant les paramètres de recherche sélectionnés
     """
@@ -108,12 +201,19 @@ def create_search_interface():
     
     # Paramètres communs
     top_k = st.sidebar.slider("📊 Nombre de résultats", min_value=5, max_value=20, value=10)
+    visual_backends = None
+    if search_mode != "Recherche par texte":
+        visual_backends = create_visual_backend_selector()
+    filters = create_search_filters(filter_options)
     
     # Interface selon le mode
     uploaded_image = None
+    query_image = None
     query_text = ""
     weight_image = 0.5
     weight_text = 0.5
+    fusion = None
+    text_encoder = None
     
     if search_mode == "Recherche par image":
         st.header("🖼️ Recherche par image")
@@ -126,11 +226,12 @@ def create_search_interface():
         )
         
         if uploaded_image:
+            query_image = load_query_image(uploaded_image)
             col1, col2 = st.columns([1, 1])
             with col1:
-                st.write("**Image uploadée:**")
-                image = Image.open(uploaded_image)
-                st.image(image, width=300)
+                if query_image is not None:
+                    st.write("**Image uploadée:**")
+                    st.image(query_image.preview(300), width=300)
     
     elif search_mode == "Recherche par texte":
         st.header("📝 Recherche par texte")
@@ -141,6 +242,13 @@ def create_search_interface():
             placeholder="Ex: Rouge à lèvres rouge mat, parfum floral, sac à main noir...",
             help="Soyez aussi précis que possible dans votre description"
         )
+        text_encoder = st.selectbox(
+            "Comparer la description aux",
+            TEXT_ENCODERS,
+            index=TEXT_ENCODERS.index(TEXT_SEARCH_CONFIG["encoder"]),
+            format_func=lambda encoder: "images (CLIP)" if encoder == 'clip' else "titres des produits",
+            help="images : la description est encodée par CLIP et comparée aux photos des produits"
+        )
     
     else:  # Recherche combinée
         st.header("🎯 Recherche combinée")
@@ -156,8 +264,9 @@ def create_search_interface():
             )
             
             if uploaded_image:
-                image = Image.open(uploaded_image)
-                st.image(image, width=250)
+                query_image = load_query_image(uploaded_image)
+                if query_image is not None:
+                    st.image(query_image.preview(250), width=250)
         
         with col2:
             st.subheader("📝 Description")
@@ -175,14 +284,26 @@ def create_search_interface():
         )
         weight_text = 1.0 - weight_image
         st.write(f"Poids du texte: {weight_text}")
+        fusion = st.selectbox(
+            "Fusion des scores",
+            FUSION_STRATEGIES,
+            index=FUSION_STRATEGIES.index(FUSION_CONFIG["strategy"]),
+            help="minmax / zscore : scores de chaque modalité normalisés avant pondération ; "
+                 "rrf : fusion des rangs ; weighted : somme brute des similarités"
+        )
     
     return {
         'search_mode': search_mode,
         'uploaded_image': uploaded_image,
+        'query_image': query_image,
         'query_text': query_text,
         'top_k': top_k,
         'weight_image': weight_image,
-        'weight_text': weight_text
+        'weight_text': weight_text,
+        'filters': filters,
+        'visual_backends': visual_backends,
+        'fusion': fusion,
+        'text_encoder': text_encoder
     }
 
 
@@ -230,3 +351,113 @@ def create_sidebar_info():
     - Sentence Transformers (Texte)
     - Streamlit (Interface)
     """)
+
+
+def display_loading_status(status: List[Dict]):
+    """
+    Affiche dans la barre latérale l'état du chargement des composants
+    
+    Args:
+        status: Liste de dictionnaires (component, state, seconds, error)
+    """
+    if not status:
+        return
+    
+    icons = {'loading': '⏳', 'ready': '✅', 'failed': '❌'}
+    pending = any(row['state'] == 'loading' for row in status)
+    with st.sidebar.expander("🚀 Chargement des composants", expanded=pending):
+        for row in status:
+            st.write(f"{icons.get(row['state'], '•')} **{row['component']}** · {row['seconds']:.1f}s")
+            if row['error']:
+                st.caption(f"⚠️ {row['error']}")
+        if pending:
+            st.caption("Les recherches n'attendent que les composants dont elles ont besoin.")
+            st.button("🔄 Actualiser", key="refresh-loading")
+
+
+def display_resource_stats(stats: List[Dict]):
+    """
+    Affiche dans la barre latérale le coût de chargement des composants partagés
+    
+    Args:
+        stats: Liste de dictionnaires (component, load_time_s, rss_delta_mb, rss_total_mb, rss_approximate)
+    """
+    if not stats:
+        return
+    
+    with st.sidebar.expander("⚙️ Ressources chargées"):
+        for row in stats:
+            st.write(f"**{row['component']}**")
+            # Chargements simultanés : le delta inclut la mémoire des autres composants
+            approximate = "≈ " if row.get('rss_approximate') else ""
+            st.caption(f"⏱️ {row['load_time_s']:.2f}s · 🧠 {approximate}+{row['rss_delta_mb']:.0f} MB "
+                       f"(total {row['rss_total_mb']:.0f} MB)")
+        if any(row.get('rss_approximate') for row in stats):
+            st.caption("≈ : chargé en parallèle d'autres composants, mémoire approximative")
+
+
+def display_cache_stats(stats: Dict):
+    """
+    Affiche dans la barre latérale les compteurs du cache des requêtes
+    
+    Args:
+        stats: Dictionnaire {cache: {entries, hits, disk_hits, misses, hit_rate}}
+    """
+    if not stats:
+        return
+    
+    with st.sidebar.expander("🗃️ Cache des requêtes"):
+        for name, counters in stats.items():
+            st.write(f"**{name}** · {counters['entries']} entrées")
+            st.caption(f"✅ {counters['hits']} (+{counters['disk_hits']} disque) · "
+                       f"❌ {counters['misses']} · taux {counters['hit_rate']:.0%}")
+
+
+def display_metrics_panel(metrics: Dict):
+    """
+    Affiche dans la barre latérale les durées par étape et les compteurs (débogage, METRICS_PANEL=1)
+    
+    Args:
+        metrics: Dictionnaire {stages: {étape: {count, total_s, mean_ms, p50_ms, p95_ms}},
+            counters: {métrique: {étiquettes: valeur}}}
+    """
+    if not metrics or not (metrics['stages'] or metrics['counters']):
+        return
+    
+    with st.sidebar.expander("⏱️ Mesures des recherches"):
+        for stage, row in metrics['stages'].items():
+            st.write(f"**{stage}** · {row['count']} appels")
+            st.caption(f"moyenne {row['mean_ms']:.1f} ms · p50 {row['p50_ms']:.1f} ms · "
+                       f"p95 {row['p95_ms']:.1f} ms · total {row['total_s']:.2f}s")
+        for name, samples in metrics['counters'].items():
+            st.write(f"**{name}**")
+            st.caption(" · ".join(f"{labels or 'total'}: {value:g}" for labels, value in samples.items()))
+        st.button("🔄 Actualiser", key="refresh-metrics")
+
+
+def display_catalog_admin(recommendation_system):
+    """
+    Affiche la version du catalogue et, en mode admin, un bouton de rechargement à chaud
+    
+    Args:
+        recommendation_system: Instance du système de recommandation
+    """
+    status = recommendation_system.get_catalog_status()
+    if not status:
+        return
+    
+    with st.sidebar.expander("📦 Catalogue"):
+        st.write(f"**Version:** {status['version']} ({status['n_products']} produits)")
+        if status['available_version'] != status['version']:
+            st.caption(f"🆕 Version disponible: {status['available_version']}")
+        if status['last_error']:
+            st.caption(f"⚠️ Dernier rechargement refusé: {status['last_error']}")
+        
+        if CATALOG_CONFIG["admin"] and st.button("🔄 Recharger le catalogue"):
+            try:
+                if recommendation_system.reload_catalog():
+                    show_success(f"Catalogue rechargé: {recommendation_system.snapshot.version}")
+                else:
+                    show_info("Le catalogue est déjà à jour")
+            except Exception as e:
+                show_error(f"Rechargement impossible: {e}")
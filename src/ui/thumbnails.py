@@ -0,0 +1,248 @@
+"""
+Service de vignettes pour les cartes produits
+
+Les images des résultats sont téléchargées en parallèle via une session HTTP
+partagée, réduites à la taille des cartes puis mises en cache en mémoire et
+sur disque (stockage adressé par contenu, avec éviction).
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+from ..core.config import THUMBNAIL_CONFIG
+from ..models.cache import LRUCache
+from ..models.metrics import cache_samples, get_metrics, span
+
+
+def make_thumbnail(content: bytes, size: int, quality: int = 85) -> bytes:
+    """
+    Réduit une image à la taille d'une carte
+
+    Args:
+        content: Image encodée (JPEG, PNG...)
+        size: Côté maximal de la vignette en pixels
+        quality: Qualité JPEG de la vignette
+
+    Returns:
+        Vignette encodée (JPEG, ou PNG si l'image a de la transparence)
+    """
+    image = Image.open(BytesIO(content))
+    # Décodage JPEG à résolution réduite quand c'est possible
+    image.draft('RGB', (size, size))
+    image.thumbnail((size, size))
+
+    output = BytesIO()
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image.save(output, format='PNG', optimize=True)
+    else:
+        image.convert('RGB').save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+class ThumbnailService:
+    """
+    Téléchargement concurrent et cache des vignettes produits
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, size: int = 150,
+                 max_workers: int = 8, timeout: float = 5.0,
+                 memory_entries: int = 512, max_disk_bytes: int = 200 * 1024 ** 2,
+                 failure_ttl: float = 300.0, session: Optional[requests.Session] = None):
+        """
+        Args:
+            cache_dir: Répertoire du cache disque (None = mémoire seule)
+            size: Côté maximal des vignettes en pixels
+            max_workers: Téléchargements simultanés
+            timeout: Délai maximal d'une requête HTTP (secondes)
+            memory_entries: Nombre de vignettes gardées en mémoire
+            max_disk_bytes: Taille maximale du cache disque
+            failure_ttl: Durée pendant laquelle une URL en échec n'est pas retentée
+            session: Session HTTP (par défaut, une session avec pool de connexions)
+        """
+        self.cache_dir = cache_dir
+        self.size = size
+        self.timeout = timeout
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = LRUCache(memory_entries)
+        self._failures = LRUCache(memory_entries, ttl_seconds=failure_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnails")
+        self._disk_lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+        if cache_dir:
+            os.makedirs(os.path.join(cache_dir, 'blobs'), exist_ok=True)
+            os.makedirs(os.path.join(cache_dir, 'urls'), exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Cache disque : urls/<sha(url)> -> sha du contenu, blobs/<sha> -> vignette
+    # ------------------------------------------------------------------
+
+    def _url_ref_path(self, url: str) -> str:
+        name = hashlib.sha256(f"{self.size}:{url}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, 'urls', name)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, 'blobs', digest[:2], digest)
+
+    def _disk_get(self, url: str) -> Optional[bytes]:
+        try:
+            with open(self._url_ref_path(url)) as f:
+                blob_path = self._blob_path(f.read().strip())
+            with open(blob_path, 'rb') as f:
+                content = f.read()
+            os.utime(blob_path)  # marque la vignette comme récemment utilisée
+            return content
+        except OSError:
+            return None
+
+    def _write_atomic(self, path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _disk_put(self, url: str, thumbnail: bytes):
+        digest = hashlib.sha256(thumbnail).hexdigest()
+        blob_path = self._blob_path(digest)
+        try:
+            if not os.path.exists(blob_path):
+                self._write_atomic(blob_path, thumbnail)
+                with self._disk_lock:
+                    if self._disk_bytes is not None:
+                        self._disk_bytes += len(thumbnail)
+            self._write_atomic(self._url_ref_path(url), digest.encode())
+        except OSError:
+            return
+        self._evict_if_needed()
+
+    def _evict_if_needed(self):
+        """Supprime les vignettes les moins récemment utilisées au-delà de max_disk_bytes"""
+        with self._disk_lock:
+            blobs_dir = os.path.join(self.cache_dir, 'blobs')
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(
+                    entry.stat().st_size
+                    for sub in os.scandir(blobs_dir) if sub.is_dir()
+                    for entry in os.scandir(sub.path)
+                )
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+
+            blobs = sorted(
+                (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                for sub in os.scandir(blobs_dir) if sub.is_dir()
+                for entry in os.scandir(sub.path)
+            )
+            # Libérer jusqu'à 90 % de la limite pour ne pas évincer à chaque écriture
+            target = int(self.max_disk_bytes * 0.9)
+            for _, size, path in blobs:
+                if self._disk_bytes <= target:
+                    break
+                try:
+                    os.remove(path)
+                    self._disk_bytes -= size
+                except OSError:
+                    pass
+            # Les références d'URL vers un blob supprimé deviennent de simples échecs de cache
+
+    # ------------------------------------------------------------------
+    # Téléchargement
+    # ------------------------------------------------------------------
+
+    def _download(self, url: str) -> Optional[bytes]:
+        try:
+            with span('thumbnail_download'):
+                response = self.session.get(url, timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            with span('thumbnail_resize'):
+                return make_thumbnail(response.content, self.size)
+        except Exception:
+            return None
+
+    def get(self, url: str) -> Optional[bytes]:
+        """
+        Vignette d'une URL (cache mémoire, puis disque, puis téléchargement)
+
+        Returns:
+            Vignette encodée, ou None si l'image est indisponible
+        """
+        if not url:
+            return None
+
+        thumbnail = self._memory.get(url)
+        if thumbnail is not None:
+            return thumbnail
+        if self._failures.get(url) is not None:
+            return None
+
+        if self.cache_dir:
+            thumbnail = self._disk_get(url)
+            if thumbnail is not None:
+                self._memory.put(url, thumbnail)
+                return thumbnail
+
+        thumbnail = self._download(url)
+        if thumbnail is None:
+            self._failures.put(url, True)
+            return None
+
+        self._memory.put(url, thumbnail)
+        if self.cache_dir:
+            self._disk_put(url, thumbnail)
+        return thumbnail
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, Optional[bytes]]:
+        """
+        Vignettes de plusieurs URLs, téléchargées en parallèle
+
+        Args:
+            urls: URLs des images (les doublons et valeurs vides sont ignorés)
+
+        Returns:
+            Dictionnaire {url: vignette ou None}
+        """
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        with span('thumbnails'):
+            return dict(zip(unique_urls, self._executor.map(self.get, unique_urls)))
+
+    def stats(self) -> Dict:
+        """Compteurs du cache mémoire"""
+        return self._memory.stats()
+
+
+def get_thumbnail_service() -> ThumbnailService:
+    """Service de vignettes partagé par toutes les sessions"""
+    from ..models.registry import get_registry
+
+    def loader():
+        service = ThumbnailService(
+            cache_dir=THUMBNAIL_CONFIG["cache_dir"],
+            size=THUMBNAIL_CONFIG["size"],
+            max_workers=THUMBNAIL_CONFIG["max_workers"],
+            timeout=THUMBNAIL_CONFIG["timeout"],
+            memory_entries=THUMBNAIL_CONFIG["memory_entries"],
+            max_disk_bytes=THUMBNAIL_CONFIG["max_disk_mb"] * 1024 ** 2
+        )
+        get_metrics().add_collector('thumbnails', lambda: cache_samples('thumbnails', service.stats()))
+        return service
+
+    return get_registry().get_or_load("thumbnail_service", loader)